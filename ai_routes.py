@@ -1,193 +1,359 @@
-from flask import Blueprint, render_template, request, jsonify, g
+from flask import Blueprint, render_template, request, jsonify, g, session, Response, stream_with_context
 import os
+import json
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
 from dotenv import load_dotenv
-from groq import Groq
-from models import db, items, cart 
-from functions import calculate_total_price 
+from models import db, cart 
+import catalog
+import chat_cache
+import chat_context
+import chat_intents
+import item_names
+import pricing
+from year_keys import YearKeyResolver
 
 load_dotenv()
 
 ai_bp = Blueprint('ai', __name__)
 
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
+# Seconds before a Groq call counts as failed (and towards opening the circuit breaker)
+GROQ_TIMEOUT = float(os.getenv('GROQ_TIMEOUT', '20'))
 
-if GROQ_API_KEY:
-    client = Groq(api_key=GROQ_API_KEY)
-else:
+if not GROQ_API_KEY:
     print("WARNING: GROQ_API_KEY not set in environment variables.")
-    client = None
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Groq client, created on the first chat call (the groq SDK is slow to import); None without a key."""
+    global _client
+    if _client is None and GROQ_API_KEY:
+        with _client_lock:
+            if _client is None:
+                from groq import Groq
+                _client = Groq(api_key=GROQ_API_KEY, timeout=GROQ_TIMEOUT, max_retries=1)
+    return _client
+
+@lru_cache(maxsize=256)
+def _resolver_for(valid_keys):
+    # Catalog items share a handful of year lists, so each resolver is built once
+    return YearKeyResolver(valid_keys)
 
 def resolve_year_key(input_val, valid_keys):
-    if not input_val:
-        return None
-    
-    clean_input = input_val.strip().lower()
-    
-    month_map = {
-        "january": "jan", "february": "feb", "march": "mar", "april": "apr",
-        "may": "may", "june": "jun", "july": "jul", "august": "aug",
-        "september": "sep", "october": "oct", "november": "nov", "december": "dec"
-    }
-
-    for key in valid_keys:
-        clean_key = key.lower()
-        
-        if clean_input == clean_key:
-            return key
-            
-        for full_month, short_month in month_map.items():
-            if full_month in clean_input:
-                normalized_input = clean_input.replace(full_month, short_month)
-                if normalized_input == clean_key:
-                    return key
-                    
-        parts = clean_key.split() 
-        if len(parts) > 1:
-            db_year = parts[0]
-            db_month = parts[1] 
-            if db_year in clean_input and db_month in clean_input:
-                return key
-
-    return None
+    """Matches a spelling like 'January 2019' to one of valid_keys (see year_keys.YearKeyResolver).
+
+    Callers holding a pricing table should use its .resolver, which lives as
+    long as the catalog version.
+    """
+    return _resolver_for(tuple(valid_keys)).resolve(input_val)
 
 @ai_bp.route("/AI")
 def ai_interface():
     return render_template("ai.html")
 
+CHAT_MODEL = "llama-3.3-70b-versatile"
+ADD_CART_TAG = "||ADD_CART:"
+
+def build_chat_prompt(user_message):
+    """Returns (messages, item_map, is_logged_in) for one chat turn."""
+    user_context_name = "Guest"
+    is_logged_in = False
+    if g.user:
+        user_context_name = g.user.name
+        is_logged_in = True
+
+    item_map = {}
+
+    try:
+        # Only the items relevant to this message go into the prompt
+        item_map = catalog.get_catalog().by_name
+        system_instruction = chat_context.get_retriever().system_instruction(
+            user_message, user_context_name, is_logged_in
+        )
+    except Exception as db_e:
+        print(f"DB Error in AI: {db_e}")
+        system_instruction = (
+            f"You are 'Genius AI', speaking to: {user_context_name}.\n"
+            "Inventory database is offline.\n\n"
+            f"{chat_context.PRICING_CONTEXT}\n"
+        )
+
+    messages = [
+        {"role": "system", "content": system_instruction},
+        {"role": "user", "content": user_message}
+    ]
+    return messages, item_map, is_logged_in
+
+def local_reply(user_message):
+    """Answers price/availability/add-to-cart questions straight from the catalog, or returns None."""
+    is_logged_in = bool(g.user)
+    ai_text = chat_intents.fast_reply(user_message, is_logged_in)
+    if ai_text is None:
+        return None
+    return apply_cart_command(ai_text, catalog.get_catalog().by_name, is_logged_in).strip()
+
+def cached_reply(user_message):
+    """Returns (cached_text or None, catalog_fingerprint) for this message and user (or guest)."""
+    try:
+        fingerprint = catalog.get_catalog().fingerprint
+    except Exception as db_e:
+        print(f"DB Error in AI cache: {db_e}")
+        return None, None
+    return chat_cache.get_cache().get(user_message, g.user.id if g.user else None, fingerprint), fingerprint
+
+def remember_reply(user_message, fingerprint, ai_text):
+    """Caches the raw model answer; ADD_CART answers are refused by the cache itself."""
+    if fingerprint is None:
+        return
+    chat_cache.get_cache().put(user_message, g.user.id if g.user else None, fingerprint, ai_text)
+
+def apply_cart_command(ai_text, item_map, is_logged_in):
+    """Runs a ||ADD_CART:...|| command found in the model output and replaces it with the result."""
+    if ADD_CART_TAG not in ai_text or not is_logged_in:
+        return ai_text
+    try:
+        start_tag = ADD_CART_TAG
+        end_tag = "||"
+        command_str = ai_text.split(start_tag)[1].split(end_tag)[0]
+        
+        parts = command_str.split('|')
+        if len(parts) >= 4:
+            raw_name = parts[0].strip()
+            raw_start = parts[1].strip()
+            raw_end = parts[2].strip()
+            design = parts[3].strip()
+
+            print(f"AI RAW: Name: {raw_name}, Start: {raw_start}, End: {raw_end}")
+
+            target = item_map.get(raw_name.lower())
+            if target is None:
+                # Near misses like "Pure Math 1" or "Physics U2"
+                target = item_names.get_matcher().match(raw_name)
+            target_id = target.id if target else None
+
+            table = pricing.get_table(target_id) if target_id else None
+
+            if table:
+                item_obj = catalog.get_catalog().get(target_id)
+                years_list = table.years
+
+                # O(1) lookups against the item's precomputed spelling index
+                resolved = table.resolver.resolve_range(raw_start, raw_end)
+
+                if resolved:
+                    start_year, end_year, s_idx, e_idx = resolved
+                    new_cart_item = cart.for_range(g.user.id, table, s_idx, e_idx, design)
+                    db.session.add(new_cart_item)
+                    db.session.commit()
+
+                    ai_text = ai_text.split("||ADD_CART")[0] 
+                    ai_text += f"\n\n[SYSTEM]: ✅ Added **{item_obj.name}** ({start_year} - {end_year}) to cart."
+                else:
+                    print(f"MATCH FAILED. DB: {years_list}, AI Sent: {raw_start}, {raw_end}")
+                    ai_text = ai_text.split("||ADD_CART")[0]
+                    ai_text += f"\n\n[SYSTEM ERROR]: Could not match years '{raw_start}' or '{raw_end}' to database."
+            else:
+                ai_text = ai_text.split("||ADD_CART")[0]
+                ai_text += "\n\n[SYSTEM ERROR]: Item not found."
+
+    except Exception as e:
+        print(f"Cart Add Error: {e}")
+        ai_text = ai_text.split("||ADD_CART")[0]
+        ai_text += "\n\n[SYSTEM ERROR]: Processing failed."
+
+    return ai_text
+
+# Everything a model call needs, carried from prepare_chat to finish_chat
+ChatTurn = namedtuple('ChatTurn', 'message messages item_map is_logged_in fingerprint prompt_ms')
+
+def prepare_chat(user_message):
+    """
+    Runs every step before the model call; shared by the Flask views and asgi.py.
+
+    Returns (reply, None) when the message was answered locally, from the cache
+    or by the open circuit breaker, otherwise (None, ChatTurn) for the model.
+    """
+    started = time.perf_counter()
+    ai_text = local_reply(user_message)
+    if ai_text is not None:
+        return {'response': ai_text, 'source': 'local'}, None
+
+    ai_text, fingerprint = cached_reply(user_message)
+    if ai_text is not None:
+        return {'response': ai_text, 'cached': True}, None
+
+    if not chat_intents.groq_breaker.allow():
+        return {'response': chat_intents.UNAVAILABLE_REPLY, 'source': 'fallback'}, None
+
+    messages, item_map, is_logged_in = build_chat_prompt(user_message)
+    prompt_ms = (time.perf_counter() - started) * 1000
+    return None, ChatTurn(user_message, messages, item_map, is_logged_in, fingerprint, prompt_ms)
+
+def finish_chat(turn, ai_text):
+    """After a successful model call: caches the raw answer and runs any cart command."""
+    chat_intents.groq_breaker.record_success()
+    remember_reply(turn.message, turn.fingerprint, ai_text)
+    return apply_cart_command(ai_text, turn.item_map, turn.is_logged_in)
+
+def model_failed(error):
+    """Counts a failed Groq call against the breaker and returns the canned reply."""
+    print(f"Groq call failed: {error}")
+    chat_intents.groq_breaker.record_failure()
+    return {'response': chat_intents.UNAVAILABLE_REPLY, 'source': 'fallback'}
+
 @ai_bp.route("/api/chat", methods=["POST"])
 def chat_api():
     try:
-        if not client:
-            return jsonify({'error': 'AI API Key missing on server.'}), 500
-
         data = request.json
         user_message = data.get('message')
         
         if not user_message:
             return jsonify({'error': 'No message provided'}), 400
 
-        user_context_name = "Guest"
-        is_logged_in = False
-        if g.user:
-            user_context_name = g.user.name
-            is_logged_in = True
+        reply, turn = prepare_chat(user_message)
+        if reply is not None:
+            return jsonify(reply)
+
+        client = get_client()
+        if not client:
+            return jsonify({'error': 'AI API Key missing on server.'}), 500
 
-        item_map = {} 
-        inventory_context = "CURRENT SHOP INVENTORY:\n"
-        
         try:
-            all_items = db.session.execute(db.select(items)).scalars().all()
-            
-            for item in all_items:
-                item_map[item.name.lower()] = item.id
-                
-                if item.years_available:
-                    exact_years = list(item.years_available.keys())
-                    exact_years.sort()
-                    
-                    inventory_context += (
-                        f"- Item: '{item.name}'\n"
-                        f"  * Years: {exact_years}\n"
-                    )
-                else:
-                    inventory_context += f"- Item: '{item.name}' (Out of Stock)\n"
+            completion = client.chat.completions.create(
+                model=CHAT_MODEL,
+                messages=turn.messages,
+                temperature=0.5,
+            )
+        except Exception as e:
+            return jsonify(model_failed(e))
 
-        except Exception as db_e:
-            print(f"DB Error in AI: {db_e}")
-            inventory_context = "Inventory database is offline."
+        ai_text = finish_chat(turn, completion.choices[0].message.content)
+        return jsonify({'response': ai_text})
 
-        system_instruction = (
-            f"You are 'Genius AI', speaking to: {user_context_name}.\n"
-            "SCOPE: Selling Edexcel papers. You cannot checkout, only add to cart.\n\n"
-            
-            f"{inventory_context}\n\n"
-            
-            "--- PRICING ---\n"
-            "Formula: (Total Pages * 5) + 400 + CoverCost\n"
-            "Cover Costs: Normal(200), Custom(500), Minimalistic(80)\n\n"
-
-            "--- ADD TO CART PROTOCOL ---\n"
-            f"User Logged In: {is_logged_in}\n"
-            "1. IF NOT LOGGED IN: Refuse to add to cart.\n"
-            "2. IF LOGGED IN: If user confirms to buy, output a HIDDEN COMMAND.\n"
-            "   Format: ||ADD_CART:ItemName|StartYear|EndYear|CoverType||\n\n"
-            "   Example: ||ADD_CART:Pure Maths 1|2019 Jan|2020 Oct|Normal||\n"
-        )
-        
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": system_instruction},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.5,
-        )
+    except Exception as e:
+        print(f"AI CRITICAL ERROR: {e}")
+        return jsonify({'error': f'System Error: {e}'}), 500
 
-        ai_text = completion.choices[0].message.content
+def sse_event(data, event=None):
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n" if event else f"data: {payload}\n\n"
 
-        if "||ADD_CART:" in ai_text and is_logged_in:
-            try:
-                start_tag = "||ADD_CART:"
-                end_tag = "||"
-                command_str = ai_text.split(start_tag)[1].split(end_tag)[0]
-                
-                parts = command_str.split('|')
-                if len(parts) >= 4:
-                    raw_name = parts[0].strip()
-                    raw_start = parts[1].strip()
-                    raw_end = parts[2].strip()
-                    design = parts[3].strip()
-
-                    print(f"AI RAW: Name: {raw_name}, Start: {raw_start}, End: {raw_end}")
-
-                    target_id = item_map.get(raw_name.lower())
-
-                    if target_id:
-                        item_obj = db.session.get(items, target_id)
-                        years_list = sorted(list(item_obj.years_available.keys()))
-                        
-                        start_year = resolve_year_key(raw_start, years_list)
-                        end_year = resolve_year_key(raw_end, years_list)
-
-                        if start_year and end_year:
-                            s_idx = years_list.index(start_year)
-                            e_idx = years_list.index(end_year)
-                            
-                            if s_idx > e_idx: s_idx, e_idx = e_idx, s_idx
-                            
-                            selected_years = years_list[s_idx : e_idx+1]
-                            final_price = calculate_total_price(item_obj, design, selected_years)
-
-                            new_cart_item = cart(
-                                user_id=g.user.id,
-                                original_item_id=item_obj.id,
-                                name=item_obj.name,
-                                img=item_obj.img,
-                                years_available=item_obj.years_available,
-                                selected_years=selected_years,
-                                design_type=design,
-                                price=final_price
-                            )
-                            db.session.add(new_cart_item)
-                            db.session.commit()
-
-                            ai_text = ai_text.split("||ADD_CART")[0] 
-                            ai_text += f"\n\n[SYSTEM]: ✅ Added **{item_obj.name}** ({start_year} - {end_year}) to cart."
-                        else:
-                            print(f"MATCH FAILED. DB: {years_list}, AI Sent: {raw_start}, {raw_end}")
-                            ai_text = ai_text.split("||ADD_CART")[0]
-                            ai_text += f"\n\n[SYSTEM ERROR]: Could not match years '{raw_start}' or '{raw_end}' to database."
-                    else:
-                        ai_text = ai_text.split("||ADD_CART")[0]
-                        ai_text += "\n\n[SYSTEM ERROR]: Item not found."
+def _held_back(text):
+    """Length of the tail of `text` that could be the start of an ADD_CART command."""
+    command_at = text.find("||ADD_CART")
+    if command_at != -1:
+        return len(text) - command_at
+    for size in range(min(len(ADD_CART_TAG), len(text)), 0, -1):
+        if ADD_CART_TAG.startswith(text[-size:]):
+            return size
+    return 0
+
+class StreamRelay:
+    """Turns model deltas into SSE token events without ever showing the hidden cart command."""
+
+    def __init__(self):
+        self.text = ""
+        self.sent = 0
+
+    def feed(self, delta):
+        """Returns the token event for the part of the text that is now safe to show, or None."""
+        self.text += delta
+        safe_end = len(self.text) - _held_back(self.text)
+        if safe_end <= self.sent:
+            return None
+        event = sse_event({'token': self.text[self.sent:safe_end]})
+        self.sent = safe_end
+        return event
+
+    def finish(self, final_text, timings_ms):
+        """The rest of the processed answer plus the done event."""
+        rest = sse_event({'token': final_text[self.sent:]}) if final_text[self.sent:] else ""
+        return rest + sse_event({'response': final_text, 'timings_ms': timings_ms}, event='done')
+
+def sse_reply_body(reply, started):
+    """A complete answer (local, cached or fallback) as one token event plus the done event."""
+    lookup_ms = (time.perf_counter() - started) * 1000
+    return sse_event({'token': reply['response']}) + sse_event({
+        **reply,
+        'timings_ms': {'prompt': 0.0, 'first_token': round(lookup_ms, 1), 'model': 0.0},
+    }, event='done')
+
+@ai_bp.route("/api/chat/stream", methods=["POST"])
+def chat_stream_api():
+    """Same as /api/chat, but relays tokens as Server-Sent Events while Groq generates them."""
+    data = request.get_json(silent=True) or {}
+    user_message = data.get('message')
+    if not user_message:
+        return jsonify({'error': 'No message provided'}), 400
+
+    started = time.perf_counter()
+    reply, turn = prepare_chat(user_message)
+    if reply is not None:
+        response = Response(sse_reply_body(reply, started), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    client = get_client()
+    if not client:
+        return jsonify({'error': 'AI API Key missing on server.'}), 500
 
+    def generate():
+        relay = StreamRelay()
+        first_token_ms = None
+        try:
+            model_started = time.perf_counter()
+            try:
+                stream = client.chat.completions.create(
+                    model=CHAT_MODEL,
+                    messages=turn.messages,
+                    temperature=0.5,
+                    stream=True,
+                )
+                for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if not delta:
+                        continue
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - model_started) * 1000
+                    event = relay.feed(delta)
+                    if event:
+                        yield event
             except Exception as e:
-                print(f"Cart Add Error: {e}")
-                ai_text = ai_text.split("||ADD_CART")[0]
-                ai_text += "\n\n[SYSTEM ERROR]: Processing failed."
+                fallback = model_failed(e)
+                # Nothing shown yet: degrade to the canned reply instead of an error
+                if relay.sent:
+                    yield sse_event({'error': f'System Error: {e}'}, event='error')
+                else:
+                    yield sse_reply_body(fallback, started)
+                return
+            model_ms = (time.perf_counter() - model_started) * 1000
 
-        return jsonify({'response': ai_text})
+            final_text = finish_chat(turn, relay.text)
+            yield relay.finish(final_text, {
+                'prompt': round(turn.prompt_ms, 1),
+                'first_token': round(first_token_ms or model_ms, 1),
+                'model': round(model_ms, 1),
+            })
+        except Exception as e:
+            print(f"AI STREAM ERROR: {e}")
+            yield sse_event({'error': f'System Error: {e}'}, event='error')
 
-    except Exception as e:
-        print(f"AI CRITICAL ERROR: {e}")
-        return jsonify({'error': f'System Error: {e}'}), 500
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@ai_bp.route("/api/chat/cache", methods=["GET", "DELETE"])
+def chat_cache_api():
+    """Hit/miss counters for the chat response cache; DELETE empties it."""
+    if session.get('is_admin') is not True:
+        return jsonify({'error': 'Unauthorized access'}), 401
+    cache = chat_cache.get_cache()
+    if request.method == "DELETE":
+        cache.clear()
+    return jsonify(cache.stats())
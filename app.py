@@ -1,34 +1,35 @@
 import os
-import re
+import uuid
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, redirect, url_for, session, g, make_response, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, g, make_response, jsonify, Response
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
-from flask_migrate import Migrate
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
 from sqlalchemy import or_
 
-from functions import calculate_total_price
+from functions import slugify, CATEGORIES
+import catalog
+import images
+import sitemaps
+import pricing
+import pagecache
+import pagination
+import sales
+import search
+import startup
+import uploads
 from auth import authenticate
 from ai_routes import ai_bp
-from models import db, items, users, cart, orders
-from wa_api import send_admin_order_alert, send_customer_order_confirmation, send_contact_message
+from models import db, items, users, cart, orders, order_lines
+from inventory_sync import InventorySync, SyncError, iter_entries
+import wa_api
+import current_user
+from wa_api import queue_admin_order_alert, queue_customer_order_confirmation, queue_contact_message
 
 load_dotenv()
 
 app = Flask(__name__)
 app.register_blueprint(ai_bp)
 
-# --- SEO HELPER: SLUGIFY ---
-def slugify(text):
-    """Converts 'Pure Maths 1' into 'pure-maths-1' for SEO URLs"""
-    text = text.lower().strip()
-    text = re.sub(r'[^a-z0-9\s-]', '', text)
-    text = re.sub(r'[\s-]+', '-', text)
-    return text
-
 # Register filter so we can use {{ item.name|slugify }} in HTML
 app.jinja_env.filters['slugify'] = slugify
 
@@ -41,9 +42,16 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.secret_key = os.getenv('SECRET_KEY')
 
 db.init_app(app)
-migrate = Migrate(app, db)
-
-cloudinary.config(secure=True)
+# Alembic is the slowest import in the app and only `flask db ...` needs it
+if os.getenv('FLASK_RUN_FROM_CLI'):
+    from flask_migrate import Migrate
+    migrate = Migrate(app, db)
+wa_api.init_app(app)
+current_user.init_app(app)
+images.init_app(app)
+sales.init_app(app)
+uploads.init_app(app)
+startup.init_app(app)
 
 def admin_required(f):
     @wraps(f)
@@ -53,53 +61,62 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-@app.before_request
-def load_logged_in_user():
-    user_id = session.get('user_id')
-    if user_id is None:
-        g.user = None
-    else:
-        g.user = db.session.get(users, user_id)
-
 @app.route('/robots.txt')
 def robots():
     response = make_response("User-agent: *\nAllow: /\n\nSitemap: https://papergenius.vercel.app/sitemap.xml")
     response.headers["Content-Type"] = "text/plain"
     return response
 @app.route("/Resources")
+@pagecache.cached(catalog_bound=False)
 def resources():
     return render_template("resources.html")
+def _accepts_gzip():
+    return 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+
 @app.route('/sitemap.xml')
 def sitemap():
     try:
-        base_url = "https://papergenius.vercel.app"
-        xml_content = '<?xml version="1.0" encoding="UTF-8"?>'
-        xml_content += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
-        
-        static_pages = [
-            {"loc": f"{base_url}/", "pri": "1.0"},
-            {"loc": f"{base_url}/Shop", "pri": "0.9"},
-            {"loc": f"{base_url}/About", "pri": "0.8"},
-            {"loc": f"{base_url}/Contact", "pri": "0.7"}
-        ]
-        
-        for page in static_pages:
-            xml_content += f"<url><loc>{page['loc']}</loc><priority>{page['pri']}</priority></url>"
-        
-        all_shop_items = db.session.execute(db.select(items)).scalars().all()
-        for item in all_shop_items:
-            # SEO UPDATE: Include the name in the URL
-            slug = slugify(item.name)
-            xml_content += f"<url><loc>{base_url}/Product/{item.id}/{slug}</loc><priority>0.8</priority></url>"
-            
-        xml_content += '</urlset>'
-        response = make_response(xml_content.strip())
+        rendered = sitemaps.get_sitemap()
+        use_gzip = _accepts_gzip()
+        response = make_response(rendered.gzipped if use_gzip else rendered.body)
         response.headers["Content-Type"] = "application/xml; charset=utf-8"
-        return response
+        response.headers["Vary"] = "Accept-Encoding"
+        if use_gzip:
+            response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(rendered.etag + ("-gz" if use_gzip else ""))
+        response.last_modified = rendered.last_modified
+        response.cache_control.public = True
+        response.cache_control.max_age = 3600
+        return response.make_conditional(request)
     except Exception as e:
         return make_response(str(e), 500)
 
+@app.route('/sitemap-<int:page>.xml')
+def sitemap_page(page):
+    snapshot = catalog.get_catalog()
+    rendered = sitemaps.get_sitemap(snapshot)
+    if rendered.page_count <= 1 or not 1 <= page <= rendered.page_count:
+        return page_not_found(None)
+    use_gzip = _accepts_gzip()
+    etag = rendered.page_etag(page) + ("-gz" if use_gzip else "")
+    if request.if_none_match.contains(etag):
+        response = make_response("", 304)
+        response.set_etag(etag)
+        return response
+    chunks = sitemaps.iter_page(snapshot, page)
+    response = Response(sitemaps.iter_gzip(chunks) if use_gzip else chunks, mimetype="application/xml")
+    response.headers["Content-Type"] = "application/xml; charset=utf-8"
+    response.headers["Vary"] = "Accept-Encoding"
+    if use_gzip:
+        response.headers["Content-Encoding"] = "gzip"
+    response.set_etag(etag)
+    response.last_modified = rendered.last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    return response
+
 @app.route("/")
+@pagecache.cached(catalog_bound=False)
 def home():
     return render_template("index.html")
 
@@ -113,7 +130,7 @@ def login():
         if user_check is None or not check_password_hash(user_check.password, password):
             error = "Invalid email or password."
         if error is None:
-            session['user_id'] = user_check.id
+            current_user.remember_login(user_check)
             return redirect(url_for('home'))
         return render_template("log_in.html", error=error)
     return render_template("log_in.html")
@@ -148,16 +165,19 @@ def sign_up():
 def profile():
     if g.user is None: return redirect(url_for('login'))
     if request.method == "POST":
-        g.user.name = request.form.get('name')
-        g.user.number = request.form.get('number')
-        g.user.school = request.form.get('school')
-        g.user.address = request.form.get('address')
-        g.user.town = request.form.get('town')
+        # g.user is a read-only cached copy; edit the row itself
+        user = db.session.get(users, g.user.id)
+        user.name = request.form.get('name')
+        user.number = request.form.get('number')
+        user.school = request.form.get('school')
+        user.address = request.form.get('address')
+        user.town = request.form.get('town')
         new_pass = request.form.get('new_password')
         if new_pass:
-            g.user.password = generate_password_hash(new_pass)
+            user.password = generate_password_hash(new_pass)
         try:
             db.session.commit()
+            current_user.refresh(user.id)
             return render_template("profile.html", success="Profile Updated Successfully!")
         except Exception:
             db.session.rollback()
@@ -167,44 +187,50 @@ def profile():
 @app.route("/MyOrders")
 def my_orders():
     if g.user is None: return redirect(url_for('login'))
-    user_orders = db.session.execute(db.select(orders).filter_by(user_id=g.user.id).order_by(orders.order_date.desc())).scalars().all()
+    user_orders = db.session.execute(orders.for_user(g.user.id)).scalars().all()
     return render_template("my_orders.html", orders=user_orders)
 
 @app.route("/Shop", methods=["POST", "GET"])
+@pagecache.cached()
 def shop():
-    all_items = db.session.execute(db.select(items)).scalars().all()
     if request.method == "POST":
         if g.user is None: return redirect(url_for('login'))
         item_id = request.form.get('item_id')
         design_type = request.form.get('cover_type')
         start_year = request.form.get('selected_year_from')
         end_year = request.form.get('selected_year_to')
-        item_obj = db.session.get(items, int(item_id))
-        if item_obj and item_obj.years_available:
-            years_list = sorted(list(item_obj.years_available.keys()))
-            try:
-                s_idx = years_list.index(start_year)
-                e_idx = years_list.index(end_year)
-                if s_idx > e_idx: s_idx, e_idx = e_idx, s_idx
-                selected_years = years_list[s_idx : e_idx+1]
-                price = calculate_total_price(item_obj, design_type, selected_years)
-                new_cart = cart(
-                    user_id=g.user.id, original_item_id=item_obj.id, name=item_obj.name,
-                    img=item_obj.img, years_available=item_obj.years_available,
-                    selected_years=selected_years, design_type=design_type, price=price
-                )
-                db.session.add(new_cart)
-                db.session.commit()
-                return redirect(url_for('carts'))
-            except ValueError:
+        snapshot = catalog.get_catalog()
+        item_obj = snapshot.get(int(item_id))
+        table = pricing.get_table(int(item_id))
+        if item_obj and table and item_obj.years:
+            span = table.resolve_range(start_year, end_year)
+            if span is None:
                 return redirect(url_for('shop'))
-    return render_template("shop.html", items=all_items)
+            s_idx, e_idx = span
+            new_cart = cart.for_range(g.user.id, table, s_idx, e_idx, design_type)
+            db.session.add(new_cart)
+            db.session.commit()
+            return redirect(url_for('carts'))
+    # Search, category filter and pagination all happen on the server
+    q = request.args.get('q', '').strip()
+    category = request.args.get('category', 'all')
+    if category not in CATEGORIES: category = 'all'
+    results = search.get_index().search(q, category)
+    page_items, page, pages = search.paginate(results, request.args.get('page', 1, type=int))
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'items': [{'id': i.id, 'name': i.name, 'slug': i.slug, 'img': i.img, 'category': i.category} for i in page_items],
+            'page': page, 'pages': pages, 'total': len(results)
+        })
+    template = "shop_results.html" if request.args.get('partial') else "shop.html"
+    return render_template(template, items=page_items, q=q, category=category, page=page, pages=pages,
+                           total=len(results), categories=CATEGORIES)
 
 @app.route("/Cart")
 def carts():
     if g.user is None: return redirect(url_for('login'))
-    user_carts = db.session.execute(db.select(cart).filter_by(user_id=g.user.id)).scalars().all()
-    return render_template("cart.html", cart=user_carts)
+    user_carts = db.session.execute(cart.for_user(g.user.id)).scalars().all()
+    return render_template("cart.html", cart=user_carts, checkout_key=uuid.uuid4().hex)
 
 @app.route("/Cart/Edit/<int:cart_id>", methods=["GET", "POST"])
 def edit_cart_item(cart_id):
@@ -212,26 +238,20 @@ def edit_cart_item(cart_id):
     cart_item = db.session.get(cart, cart_id)
     if not cart_item or cart_item.user_id != g.user.id:
         return redirect(url_for('carts'))
+    table = pricing.get_table(cart_item.original_item_id)
     if request.method == "POST":
         design_type = request.form.get('cover_type')
         start_year = request.form.get('selected_year_from')
         end_year = request.form.get('selected_year_to')
-        item_obj = db.session.get(items, cart_item.original_item_id)
-        if item_obj:
-            years_list = sorted(list(item_obj.years_available.keys()))
-            try:
-                s_idx = years_list.index(start_year)
-                e_idx = years_list.index(end_year)
-                if s_idx > e_idx: s_idx, e_idx = e_idx, s_idx
-                selected_years = years_list[s_idx : e_idx+1]
-                cart_item.design_type = design_type
-                cart_item.selected_years = selected_years
-                cart_item.price = calculate_total_price(item_obj, design_type, selected_years)
-                db.session.commit()
-                return redirect(url_for('carts'))
-            except Exception:
-                pass
-    return render_template("edit_cart.html", cart_item=cart_item)
+        span = table.resolve_range(start_year, end_year) if table else None
+        if span:
+            s_idx, e_idx = span
+            cart_item.set_range(table, s_idx, e_idx, design_type)
+            db.session.commit()
+            return redirect(url_for('carts'))
+    # Same order as the pricing table, so the options match its indices
+    years = table.years if table else sorted(cart_item.years_available)
+    return render_template("edit_cart.html", cart_item=cart_item, years=years)
 
 @app.route("/Cart/Delete/<int:cart_id>")
 def delete_cart_item(cart_id):
@@ -247,27 +267,56 @@ def checkout():
     if g.user is None: return redirect(url_for('login'))
     selected_ids = request.form.getlist('selected_cart_ids')
     user_comments = request.form.get('user_comments', '')
+    # One key per rendered cart page: a double-click or retry finds the order the first submit made
+    checkout_key = request.form.get('checkout_key', '').strip()[:64] or None
+    placed = placed_order_page(checkout_key)
+    if placed: return placed
     if not selected_ids: return redirect(url_for('carts'))
-    cart_items = db.session.execute(db.select(cart).filter(cart.user_id == g.user.id, cart.id.in_(selected_ids))).scalars().all()
-    if not cart_items: return redirect(url_for('carts'))
+    cart_items = db.session.execute(cart.for_user(g.user.id, selected_ids)).scalars().all()
+    if not cart_items: return placed_order_page(checkout_key) or redirect(url_for('carts'))
+    cart_ids = [item.id for item in cart_items]
     total_price = sum(item.price for item in cart_items if item.price)
     items_summary = [f"{item.name} [{item.design_type}] ({item.selected_years[0]}-{item.selected_years[-1]})" for item in cart_items]
     items_text = ", ".join(items_summary)
     new_order = orders(
         user_id=g.user.id, customer_name=g.user.name, contact_number=g.user.number,
-        order_items=items_text, total_price=total_price, status="Pending", additional_info=user_comments
+        order_items=items_text, total_price=total_price, status="Pending", additional_info=user_comments,
+        checkout_key=checkout_key
     )
+    # Order, lines, rollups, outbox rows and the cart delete commit together; nothing here waits on the network
     try:
         db.session.add(new_order)
+        db.session.flush()
+        order_id = new_order.id
+        db.session.execute(db.insert(order_lines), order_lines.rows_for(order_id, cart_items))
+        sales.record_order(new_order, [item.original_item_id for item in cart_items])
+        outbox_ids = [
+            queue_admin_order_alert(order_id, g.user.name, g.user.number, cart_items, total_price, user_comments),
+            queue_customer_order_confirmation(g.user.number, cart_items, total_price),
+        ]
+        deleted = db.session.execute(
+            db.delete(cart).where(cart.id.in_(cart_ids), cart.user_id == g.user.id)
+        ).rowcount
+        if deleted != len(cart_ids):
+            # A parallel checkout already ordered some of these rows
+            db.session.rollback()
+            return placed_order_page(checkout_key) or redirect(url_for('carts'))
         db.session.commit()
-        send_admin_order_alert(new_order.id, g.user.name, g.user.number, cart_items, total_price, user_comments)
-        send_customer_order_confirmation(g.user.number, cart_items, total_price)
-        for item in cart_items: db.session.delete(item)
-        db.session.commit()
-        return render_template("index.html", order_success=True, order_id=new_order.id, total_price=total_price)
     except Exception as e:
+        # IntegrityError here means a submit with the same checkout_key won the race
         db.session.rollback()
-        return redirect(url_for('carts'))
+        return placed_order_page(checkout_key) or redirect(url_for('carts'))
+    wa_api.dispatch(*outbox_ids)
+    return render_template("index.html", order_success=True, order_id=order_id, total_price=total_price)
+
+def placed_order_page(checkout_key):
+    """The success page for the order this checkout_key already placed, or None."""
+    if not checkout_key:
+        return None
+    placed = db.session.execute(orders.by_checkout_key(g.user.id, checkout_key)).scalar_one_or_none()
+    if placed is None:
+        return None
+    return render_template("index.html", order_success=True, order_id=placed.id, total_price=placed.total_price)
 
 @app.route("/admin", methods=["GET", "POST"])
 def admin():
@@ -293,20 +342,65 @@ def admin():
 @app.route("/admin/dashboard")
 @admin_required
 def admin_dashboard():
-    all_items = db.session.execute(db.select(items)).scalars().all()
-    return render_template('/admin/admin_dashboard.html', items=all_items)
+    return render_template('/admin/admin_dashboard.html', items=catalog.get_catalog())
+
+@app.route("/admin/analytics")
+@admin_required
+def admin_analytics():
+    days = request.args.get('days', 30, type=int)
+    if days not in (7, 30, 90, 365):
+        days = 30
+    return render_template('/admin/analytics.html', report=sales.summary(days))
 
 @app.route("/admin/users")
 @admin_required
 def admin_users():
-    all_users = db.session.execute(db.select(users)).scalars().all()
-    return render_template('/admin/users.html', users=all_users)
+    search = request.args.get('q', '').strip()
+    page = pagination.keyset_page(users.matching(search), (users.id,), request.args.get('cursor'),
+                                  pagination.page_size(request.args.get('limit')))
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'users': [admin_user_json(user) for user in page.rows],
+            'html': render_template('/admin/_user_cards.html', users=page.rows),
+            'next_cursor': page.next_cursor,
+        })
+    return render_template('/admin/users.html', users=page.rows, next_cursor=page.next_cursor, search=search)
 
 @app.route("/admin/orders")
 @admin_required
 def admin_orders():
-    all_orders = db.session.execute(db.select(orders).order_by(orders.order_date.desc())).scalars().all()
-    return render_template('/admin/orders.html', orders=all_orders)
+    filters = {
+        'status': request.args.get('status', '').strip(),
+        'from': pagination.parse_date(request.args.get('from')),
+        'to': pagination.parse_date(request.args.get('to')),
+        'customer': request.args.get('customer', '').strip(),
+    }
+    query = orders.matching(filters['status'], pagination.date_bounds(orders.order_date, filters['from'], filters['to']),
+                            filters['customer'])
+    page = pagination.keyset_page(query, (orders.order_date, orders.id), request.args.get('cursor'),
+                                  pagination.page_size(request.args.get('limit')))
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'orders': [admin_order_json(order) for order in page.rows],
+            'html': render_template('/admin/_order_rows.html', orders=page.rows),
+            'next_cursor': page.next_cursor,
+        })
+    return render_template('/admin/orders.html', orders=page.rows, next_cursor=page.next_cursor, filters=filters)
+
+def admin_order_json(order):
+    return {
+        'id': order.id, 'user_id': order.user_id, 'customer_name': order.customer_name,
+        'contact_number': order.contact_number, 'order_items': order.order_items,
+        'total_price': order.total_price, 'status': order.status, 'additional_info': order.additional_info,
+        'order_date': order.order_date.isoformat() if order.order_date else None,
+    }
+
+def admin_user_json(user):
+    return {
+        'id': user.id, 'name': user.name, 'email': user.email, 'school': user.school, 'level': user.level,
+        'number': user.number, 'address': user.address, 'town': user.town,
+        'date_joined': user.date_joined.isoformat() if user.date_joined else None,
+    }
 
 @app.route("/admin/update_order/<int:order_id>", methods=["POST"])
 @admin_required
@@ -315,7 +409,9 @@ def update_order_status(order_id):
     if order:
         new_status = request.form.get('status')
         if new_status:
+            old_status = order.status
             order.status = new_status
+            sales.move_order(order, old_status)
             db.session.commit()
     return redirect(url_for('admin_orders'))
 
@@ -326,6 +422,7 @@ def delete_item(item_id):
     if item_to_delete:
         db.session.delete(item_to_delete)
         db.session.commit()
+        catalog.invalidate()
     return redirect(url_for('admin_dashboard'))
 
 @app.route("/admin/delete_user/<int:user_id>", methods=["POST"])
@@ -336,6 +433,7 @@ def delete_user(user_id):
         db.session.execute(db.delete(cart).where(cart.user_id == user_id))
         db.session.delete(user_to_delete)
         db.session.commit()
+        current_user.invalidate(user_id)
     return redirect(url_for('admin_users'))
 
 @app.route("/admin/add_item", methods=["GET", "POST"])
@@ -343,28 +441,76 @@ def delete_user(user_id):
 def add_item():
     if request.method == "POST":
         item_name = request.form.get('item_name')
-        img_url = ""
+        img_url = request.form.get('img_url')
         file = request.files.get('img_file')
-        if file:
+        chunked_id = request.form.get('spooled_upload')
+        spooled = None
+        error = None
+        if uploads.UPLOAD_MODE == 'background' and (file or chunked_id):
+            # Keep the file on disk and let the uploads worker push it to Cloudinary after we respond
+            try:
+                if chunked_id:
+                    spooled = uploads.claim_chunked(chunked_id, request.form.get('spooled_name'))
+                else:
+                    spooled = uploads.spool_file(file)
+                img_url = uploads.UPLOADING_IMG
+            except (uploads.UploadError, OSError) as e:
+                print(f"Cover spool failed: {e}")
+                error = f"Cover upload failed: {e}"
+        elif file:
             try:
-                upload_result = cloudinary.uploader.upload(file)
-                img_url = upload_result['secure_url']
+                img_url = uploads.get_uploader().upload(file)
             except Exception as e:
-                img_url = request.form.get('img_url') 
-        else:
-            img_url = request.form.get('img_url')
+                print(f"Cover upload failed: {e}")
+                if not img_url:
+                    error = f"Cover upload failed: {e}"
         year_months = request.form.getlist('year_month[]')
         page_counts = request.form.getlist('page_count[]')
         years_available = {}
         for year, pages in zip(year_months, page_counts):
             if year.strip() and pages.isdigit():
                 years_available[year.strip()] = int(pages)
-        if item_name and img_url and years_available:
+        if not error and item_name and img_url and years_available:
             new_item = items(name=item_name, img=img_url, years_available=years_available)
             db.session.add(new_item)
+            job_id = None
+            if spooled:
+                db.session.flush()
+                job_id = uploads.queue_upload(new_item.id, *spooled)
             db.session.commit()
+            catalog.invalidate()
+            if job_id:
+                uploads.dispatch(job_id)
             return redirect(url_for('admin_dashboard'))
-    return render_template('/admin/add_item.html')
+        if spooled:
+            uploads.discard(spooled[0])
+        return render_template('/admin/add_item.html',
+                               error=error or "Item name, cover image and at least one year are required.",
+                               chunked_uploads=uploads.UPLOAD_MODE == 'background',
+                               chunk_threshold=uploads.BROWSER_CHUNK_THRESHOLD,
+                               chunk_bytes=uploads.BROWSER_CHUNK_BYTES)
+    return render_template('/admin/add_item.html',
+                           chunked_uploads=uploads.UPLOAD_MODE == 'background',
+                           chunk_threshold=uploads.BROWSER_CHUNK_THRESHOLD,
+                           chunk_bytes=uploads.BROWSER_CHUNK_BYTES)
+
+@app.route("/admin/upload_chunk", methods=["POST"])
+@admin_required
+def upload_chunk():
+    """Receives one piece of a large cover; the browser sends them in order and retries on failure."""
+    try:
+        offset = int(request.args.get('offset', '0'))
+    except ValueError:
+        return jsonify({"error": "Invalid offset"}), 400
+    if request.content_length and request.content_length > 2 * uploads.BROWSER_CHUNK_BYTES:
+        return jsonify({"error": "Chunk too large"}), 413
+    try:
+        received, written = uploads.append_chunk(request.args.get('upload_id'), offset, request.stream)
+    except uploads.UploadError as e:
+        return jsonify({"error": str(e)}), 400
+    if not written:
+        return jsonify({"received": received}), 409
+    return jsonify({"received": received})
 
 @app.route("/admin/reset_password/<int:user_id>", methods=["POST"])
 @admin_required
@@ -374,6 +520,7 @@ def reset_user_password(user_id):
     if user and new_password:
         user.password = generate_password_hash(new_password)
         db.session.commit()
+        current_user.invalidate(user_id)
     return redirect(url_for('admin_users'))
 
 @app.route("/admin/edit_item/<int:item_id>", methods=["GET", "POST"])
@@ -392,10 +539,20 @@ def edit_item(item_id):
                 updated_years[year.strip()] = int(pages)
         if updated_years: item.years_available = updated_years
         db.session.commit()
+        catalog.invalidate()
         return redirect(url_for('admin_dashboard'))
     years_list = list(item.years_available.items())
     return render_template('/admin/edit_item.html', item=item, years_list=years_list)
 
+@app.route('/api/cron/outbox')
+def outbox_cron():
+    """Vercel cron (every minute): sends queued WhatsApp messages and retries failed ones."""
+    required_secret = os.getenv('CRON_SECRET')
+    if not required_secret or request.headers.get('Authorization') != f"Bearer {required_secret}":
+        return jsonify({'error': 'Unauthorized access'}), 401
+    sent, total = wa_api.flush_outbox(include_failed=True, limit=20)
+    return jsonify({'sent': sent, 'attempted': total})
+
 @app.route('/api/admin/sync_inventory', methods=['POST'])
 def sync_inventory_api():
     secret = request.headers.get('X-Sync-Secret')
@@ -404,45 +561,54 @@ def sync_inventory_api():
     if secret != required_secret:
         return jsonify({'error': 'Unauthorized access'}), 401
 
-    data = request.json
-    if not data:
-        return jsonify({'error': 'No data provided'}), 400
-
-    updated_count = 0
-    created_count = 0
-
+    # Accepts a JSON list or an NDJSON stream, optionally with Content-Encoding: gzip
+    sync = InventorySync()
     try:
-        for entry in data:
-            item_name = entry.get('name')
-            new_years_data = entry.get('years')
-
-            if not item_name or not new_years_data:
-                continue
-
-            item = db.session.execute(db.select(items).filter(items.name.ilike(item_name))).scalar_one_or_none()
-
-            if item:
-                item.years_available = new_years_data
-                updated_count += 1
-            else:
-                new_item = items(
-                    name=item_name,
-                    img="https://placehold.co/400x600?text=No+Image",
-                    years_available=new_years_data
-                )
-                db.session.add(new_item)
-                created_count += 1
-
-        db.session.commit()
-        return jsonify({
-            'status': 'success', 
-            'message': f'Synced successfully. Updated: {updated_count}, Created: {created_count}'
-        })
-
+        sync.run(iter_entries(request))
+    except SyncError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+    if not (sync.updated or sync.created or sync.skipped):
+        return jsonify({'error': 'No data provided'}), 400
+
+    catalog.invalidate()
+    return jsonify({
+        'status': 'success',
+        'message': f'Synced successfully. Updated: {sync.updated}, Created: {sync.created}',
+        'updated': sync.updated,
+        'created': sync.created,
+        'skipped': sync.skipped,
+        'timings_ms': sync.timings_ms()
+    })
+
+@app.route('/api/quote', methods=['POST'])
+def quote_api():
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('quotes')
+    if not isinstance(data, list) or not data:
+        return jsonify({'error': 'No quotes provided'}), 400
+    if len(data) > pricing.MAX_QUOTES_PER_REQUEST:
+        return jsonify({'error': f'At most {pricing.MAX_QUOTES_PER_REQUEST} quotes per request'}), 400
+
+    engine = pricing.get_engine()
+    results = []
+    for entry in data:
+        if not isinstance(entry, dict):
+            results.append({'error': 'Invalid quote'})
+            continue
+        try:
+            item_id = int(entry.get('item_id'))
+        except (TypeError, ValueError):
+            results.append({'error': 'Invalid item_id'})
+            continue
+        results.append(engine.quote(item_id, entry.get('start'), entry.get('end'), entry.get('cover') or 'Normal'))
+    return jsonify({'catalog_version': engine.version, 'quotes': results})
+
 @app.route('/api/admin/get_all_items', methods=['GET'])
 def get_all_items_api():
     secret = request.headers.get('X-Sync-Secret')
@@ -460,6 +626,7 @@ def get_all_items_api():
         return jsonify({'error': str(e)}), 500
 
 @app.route("/About")
+@pagecache.cached(catalog_bound=False)
 def about(): return render_template("about.html")
 
 @app.route("/Contact", methods=["GET", "POST"])
@@ -470,13 +637,19 @@ def contact():
         email = request.form.get('email')
         subject = request.form.get('subject')
         message = request.form.get('message')
-        send_contact_message(name, email, subject, message)
-        success = True
+        try:
+            outbox_id = queue_contact_message(name, email, subject, message)
+            db.session.commit()
+            wa_api.dispatch(outbox_id)
+            success = True
+        except Exception:
+            db.session.rollback()
     return render_template("contact.html", success=success)
 
 # SEO ROUTING: Two routes for the same product
 @app.route("/Product/<int:item_id>")
 @app.route("/Product/<int:item_id>/<string:slug>")
+@pagecache.cached()
 def product_detail(item_id, slug=None):
     item_obj = db.session.get(items, item_id)
     if not item_obj:
@@ -489,7 +662,8 @@ def product_detail(item_id, slug=None):
     if slug != correct_slug:
         return redirect(url_for('product_detail', item_id=item_id, slug=correct_slug), code=301)
 
-    return render_template("product_detail.html", item=item_obj)
+    table = pricing.get_table(item_id)
+    return render_template("product_detail.html", item=item_obj, pricing=table.client_data() if table else None)
 
 @app.errorhandler(404)
 def page_not_found(e):
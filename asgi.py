@@ -0,0 +1,194 @@
+"""
+ASGI entry point for deployments that want the chat endpoints to run async.
+
+POST /api/chat and /api/chat/stream await Groq through AsyncGroq, so one worker
+holds many model calls in flight instead of one. The short database steps
+before and after the call (prepare_chat / finish_chat) run in a thread inside a
+normal Flask request context. Every other route is the unchanged Flask app,
+served through asgiref's WSGI adapter.
+
+    uvicorn asgi:app --workers 2
+"""
+import asyncio
+import json
+import time
+
+from asgiref.wsgi import WsgiToAsgi
+from groq import AsyncGroq
+from werkzeug.test import EnvironBuilder
+
+import ai_routes
+from app import app as flask_app
+
+CHAT_PATHS = {"/api/chat", "/api/chat/stream"}
+
+if ai_routes.GROQ_API_KEY:
+    async_client = AsyncGroq(api_key=ai_routes.GROQ_API_KEY, timeout=ai_routes.GROQ_TIMEOUT, max_retries=1)
+else:
+    async_client = None
+
+wsgi_app = WsgiToAsgi(flask_app)
+
+
+async def _read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+def _environ(scope, body):
+    """WSGI environ for a chat request, so Flask sees the same cookies (session, g.user)."""
+    headers = [(name.decode("latin-1"), value.decode("latin-1")) for name, value in scope["headers"]]
+    host = next((value for name, value in headers if name.lower() == "host"), "localhost")
+    return EnvironBuilder(
+        path=scope["path"],
+        method=scope["method"],
+        headers=headers,
+        data=body,
+        base_url=f"{scope.get('scheme', 'http')}://{host}{scope.get('root_path', '')}",
+    ).get_environ()
+
+
+def _in_flask(environ, fn, *args):
+    """Runs fn inside a full Flask request cycle; returns (result, Set-Cookie headers).
+
+    process_response runs the after_request hooks and saves the session, so
+    session changes (e.g. a deleted account being logged out) reach the
+    browser just as they do through the WSGI routes.
+    """
+    with flask_app.request_context(environ):
+        flask_app.preprocess_request()
+        result = fn(*args)
+        response = flask_app.process_response(flask_app.response_class())
+        cookies = [(b"set-cookie", value.encode("latin-1")) for value in response.headers.getlist("Set-Cookie")]
+        return result, cookies
+
+
+async def _send_json(send, payload, status=200, cookies=()):
+    body = json.dumps(payload).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                            *cookies]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _chat(environ, turn, send, cookies):
+    try:
+        completion = await async_client.chat.completions.create(
+            model=ai_routes.CHAT_MODEL,
+            messages=turn.messages,
+            temperature=0.5,
+        )
+    except Exception as e:
+        return await _send_json(send, ai_routes.model_failed(e), cookies=cookies)
+    ai_text, finish_cookies = await asyncio.to_thread(_in_flask, environ, ai_routes.finish_chat, turn,
+                                                      completion.choices[0].message.content)
+    # The later cookie carries the session as finish_chat left it
+    await _send_json(send, {'response': ai_text}, cookies=finish_cookies or cookies)
+
+
+async def _chat_stream(environ, turn, started, send, cookies):
+    # Headers go out before the model answers, so, as with the WSGI stream,
+    # only session changes made by prepare_chat reach the browser
+    await send({"type": "http.response.start", "status": 200, "headers": [
+        (b"content-type", b"text/event-stream; charset=utf-8"),
+        (b"cache-control", b"no-cache"),
+        (b"x-accel-buffering", b"no"),
+        *cookies,
+    ]})
+
+    async def emit(text):
+        await send({"type": "http.response.body", "body": text.encode(), "more_body": True})
+
+    relay = ai_routes.StreamRelay()
+    first_token_ms = None
+    try:
+        model_started = time.perf_counter()
+        try:
+            stream = await async_client.chat.completions.create(
+                model=ai_routes.CHAT_MODEL,
+                messages=turn.messages,
+                temperature=0.5,
+                stream=True,
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - model_started) * 1000
+                event = relay.feed(delta)
+                if event:
+                    await emit(event)
+        except Exception as e:
+            fallback = ai_routes.model_failed(e)
+            if relay.sent:
+                await emit(ai_routes.sse_event({'error': f'System Error: {e}'}, event='error'))
+            else:
+                await emit(ai_routes.sse_reply_body(fallback, started))
+            return
+        model_ms = (time.perf_counter() - model_started) * 1000
+
+        final_text, _cookies = await asyncio.to_thread(_in_flask, environ, ai_routes.finish_chat, turn, relay.text)
+        await emit(relay.finish(final_text, {
+            'prompt': round(turn.prompt_ms, 1),
+            'first_token': round(first_token_ms or model_ms, 1),
+            'model': round(model_ms, 1),
+        }))
+    except Exception as e:
+        print(f"AI STREAM ERROR: {e}")
+        await emit(ai_routes.sse_event({'error': f'System Error: {e}'}, event='error'))
+    finally:
+        await send({"type": "http.response.body", "body": b""})
+
+
+async def chat_app(scope, receive, send):
+    """Async twin of ai_routes.chat_api / chat_stream_api."""
+    body = await _read_body(receive)
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        data = {}
+    user_message = data.get('message') if isinstance(data, dict) else None
+    if not user_message:
+        return await _send_json(send, {'error': 'No message provided'}, 400)
+
+    streaming = scope["path"] == "/api/chat/stream"
+    environ = _environ(scope, body)
+    started = time.perf_counter()
+    try:
+        (reply, turn), cookies = await asyncio.to_thread(_in_flask, environ, ai_routes.prepare_chat, user_message)
+    except Exception as e:
+        print(f"AI CRITICAL ERROR: {e}")
+        return await _send_json(send, {'error': f'System Error: {e}'}, 500)
+
+    if reply is not None:
+        if not streaming:
+            return await _send_json(send, reply, cookies=cookies)
+        body = ai_routes.sse_reply_body(reply, started).encode()
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"), (b"cache-control", b"no-cache"), *cookies]})
+        return await send({"type": "http.response.body", "body": body})
+
+    if async_client is None:
+        return await _send_json(send, {'error': 'AI API Key missing on server.'}, 500, cookies=cookies)
+    if streaming:
+        return await _chat_stream(environ, turn, started, send, cookies)
+    return await _chat(environ, turn, send, cookies)
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in CHAT_PATHS:
+        return await chat_app(scope, receive, send)
+    return await wsgi_app(scope, receive, send)
@@ -0,0 +1,129 @@
+"""Compares the Genius AI system prompt with and without inventory retrieval.
+
+Usage:
+    python benchmark_chat.py            # prompt size and build time only
+    python benchmark_chat.py --live     # also time real Groq calls (needs GROQ_API_KEY)
+
+Token counts are estimated at ~4 characters per token unless tiktoken is installed.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime
+
+from catalog import CatalogItem, CatalogSnapshot
+from chat_context import ChatRetriever, PRICING_CONTEXT
+from functions import slugify, categorize
+
+SIZES = [100, 1000, 10000]
+
+SUBJECTS = ["Pure Maths", "Mechanics", "Statistics", "Physics Unit", "Chemistry Unit", "Biology Unit",
+            "IT Unit", "Business Unit", "Economics Unit", "Accounting Unit", "Psychology Unit", "Law Unit"]
+
+MESSAGES = [
+    "How much is Physics Unit 2 from 2019 Jan to 2022 Oct with custom cover?",
+    "price of Pure Maths 1 2019-2023",
+    "do you have econ unit 3?",
+    "what covers do you have",
+    "add chemestry unit 4 from 2020 to 2023 normal cover",
+]
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count_tokens(text):
+        return len(_encoding.encode(text))
+except ImportError:
+    def count_tokens(text):
+        return max(1, len(text) // 4)
+
+
+def synthetic_snapshot(size, seed=7):
+    rng = random.Random(seed)
+    months = ["Jan", "Jun", "Oct"]
+    entries = []
+    for item_id in range(1, size + 1):
+        name = f"{SUBJECTS[(item_id - 1) % len(SUBJECTS)]} {(item_id - 1) // len(SUBJECTS) + 1}"
+        years = tuple(sorted(f"{year} {month}" for year in range(2015, 2026) for month in months))
+        pages = tuple(rng.randint(10, 40) for _ in years)
+        entries.append(CatalogItem(item_id, name, slugify(name), "img.png", categorize(name), years, pages, datetime.utcnow()))
+    return CatalogSnapshot(size, entries)
+
+
+def legacy_instruction(snapshot, user_name="Guest", is_logged_in=False):
+    """The pre-retrieval prompt: every item and every year on every message."""
+    inventory_context = "CURRENT SHOP INVENTORY:\n"
+    for item in snapshot:
+        inventory_context += f"- Item: '{item.name}'\n  * Years: {list(item.years)}\n"
+    return (
+        f"You are 'Genius AI', speaking to: {user_name}.\n"
+        "SCOPE: Selling Edexcel papers. You cannot checkout, only add to cart.\n\n"
+        f"{inventory_context}\n\n{PRICING_CONTEXT}\n\n"
+        "--- ADD TO CART PROTOCOL ---\n"
+        f"User Logged In: {is_logged_in}\n"
+    )
+
+
+def time_call(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return result, statistics.median(samples)
+
+
+def live_latency(prompt, message):
+    from groq import Groq
+    client = Groq(api_key=os.environ['GROQ_API_KEY'])
+    started = time.perf_counter()
+    client.chat.completions.create(
+        model="llama-3.3-70b-versatile",
+        messages=[{"role": "system", "content": prompt}, {"role": "user", "content": message}],
+        temperature=0.5,
+    )
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--live', action='store_true', help='also measure end-to-end Groq latency')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.live and not os.getenv('GROQ_API_KEY'):
+        parser.error('--live needs GROQ_API_KEY')
+
+    print(f"{'items':>6} | {'mode':<9} | {'prompt tokens':>13} | {'build ms':>9} | {'e2e ms':>9}")
+    print("-" * 60)
+    for size in SIZES:
+        snapshot = synthetic_snapshot(size)
+        retriever, index_ms = time_call(lambda: ChatRetriever(snapshot), 1)
+
+        legacy_prompt, legacy_ms = time_call(lambda: legacy_instruction(snapshot), args.repeat)
+        legacy_tokens = count_tokens(legacy_prompt)
+        legacy_e2e = live_latency(legacy_prompt, MESSAGES[0]) if args.live else None
+
+        tokens, build_ms, e2e = [], [], []
+        for message in MESSAGES:
+            prompt, ms = time_call(lambda: retriever.system_instruction(message, "Guest", False), args.repeat)
+            tokens.append(count_tokens(prompt))
+            build_ms.append(ms)
+            if args.live:
+                e2e.append(live_latency(prompt, message))
+
+        def fmt(value):
+            return f"{value:9.1f}" if value is not None else f"{'-':>9}"
+
+        print(f"{size:>6} | {'full':<9} | {legacy_tokens:>13} | {legacy_ms:9.2f} | {fmt(legacy_e2e)}")
+        print(f"{size:>6} | {'retrieval':<9} | {max(tokens):>13} | {max(build_ms):9.2f} | "
+              f"{fmt(statistics.median(e2e) if e2e else None)}")
+        print(f"{'':>6} | index build once per catalog version: {index_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Image bytes a phone downloads for one shop page, full-size covers vs. srcset variants.
+
+Usage:
+    python benchmark_images.py [--items 24] [--viewport 360] [--dpr 2]
+
+Writes synthetic A4 covers (1240x1754 JPEG, like a phone photo of a book cover)
+to static/img/benchmark/, renders /Shop against a throwaway database whose
+items use them (once to queue the WebP derivatives, again after the
+background builder made them), and picks the srcset candidate a browser would for the given
+viewport and device pixel ratio (smallest width >= needed pixels, else the
+largest). Bytes are read from disk. Cloudinary covers get the same srcset
+widths through w_/f_auto/q_auto URLs, but their sizes need network access, so
+only an example URL is printed for them. Everything it writes is removed.
+"""
+import argparse
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+
+# The app reads DATABASE_URL at import time
+_db_path = os.path.join(tempfile.mkdtemp(), "images.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ.setdefault("SECRET_KEY", "benchmark-images")
+
+from PIL import Image, ImageDraw, ImageFilter  # noqa: E402
+
+from app import app  # noqa: E402
+import catalog  # noqa: E402
+import images  # noqa: E402
+from models import db, items  # noqa: E402
+
+COVER_DIR = "img/benchmark"
+IMG_TAG = re.compile(r'<img [^>]*class="unit-image"[^>]*>')
+ATTR = re.compile(r'(\w+)="([^"]*)"')
+
+
+def make_cover(path, rng):
+    """Photo-like cover: gradient, blocks of 'text', soft noise."""
+    width, height = 1240, 1754
+    top, bottom = [rng.randint(40, 220) for _ in range(3)], [rng.randint(40, 220) for _ in range(3)]
+    image = Image.new("RGB", (width, height))
+    draw = ImageDraw.Draw(image)
+    for y in range(height):
+        mix = y / height
+        draw.line([(0, y), (width, y)], fill=tuple(int(a + (b - a) * mix) for a, b in zip(top, bottom)))
+    for _ in range(40):
+        x, y = rng.randint(60, width - 400), rng.randint(60, height - 80)
+        draw.rectangle([x, y, x + rng.randint(120, 340), y + rng.randint(12, 40)],
+                       fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    noise = Image.effect_noise((width, height), 24).convert("RGB")
+    image = Image.blend(image, noise, 0.12).filter(ImageFilter.SMOOTH)
+    image.save(path, "JPEG", quality=90)
+
+
+def chosen(tag, needed):
+    attrs = dict(ATTR.findall(tag))
+    if "srcset" not in attrs:
+        return attrs["src"], attrs["src"]
+    candidates = []
+    for part in attrs["srcset"].split(", "):
+        url, width = part.rsplit(" ", 1)
+        candidates.append((int(width[:-1]), url))
+    candidates.sort()
+    pick = next((url for width, url in candidates if width >= needed), candidates[-1][1])
+    return pick, attrs["src"]
+
+
+def file_bytes(url):
+    return os.path.getsize(os.path.join(app.static_folder, url.split("/static/", 1)[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=24)
+    parser.add_argument("--viewport", type=int, default=360, help="CSS px width of the phone screen")
+    parser.add_argument("--dpr", type=float, default=2.0)
+    args = parser.parse_args()
+
+    cover_dir = os.path.join(app.static_folder, COVER_DIR)
+    os.makedirs(cover_dir, exist_ok=True)
+    rng = random.Random(22)
+    names = []
+    try:
+        with app.app_context():
+            db.create_all()
+            for i in range(args.items):
+                name = f"{COVER_DIR}/cover{i}.jpg"
+                make_cover(os.path.join(app.static_folder, name), rng)
+                names.append(name)
+                db.session.add(items(name=f"Benchmark Paper {i}", img=name, years_available={"2020 Jan": 10}))
+            db.session.commit()
+            catalog.invalidate()
+
+        client = app.test_client()
+        images.IMAGE_BUILD = "background"
+        started = time.perf_counter()
+        cold = client.get("/Shop").data.decode()
+        cold_ms = (time.perf_counter() - started) * 1000
+        assert "srcset" not in cold, "the first render must not resize covers inline"
+        started = time.perf_counter()
+        images.wait_for_builds()
+        build_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        html = client.get("/Shop").data.decode()
+        warm_ms = (time.perf_counter() - started) * 1000
+
+        # Cards are 320 CSS px, or the full width on narrow screens (CARD_SIZES)
+        needed = int(min(args.viewport, 320) * args.dpr)
+        tags = IMG_TAG.findall(html)
+        original = sum(os.path.getsize(os.path.join(app.static_folder, name)) for name in names[:len(tags)])
+        picked = [chosen(tag, needed) for tag in tags]
+        variant = sum(file_bytes(url) for url, _src in picked)
+        fallback = sum(file_bytes(src) for _url, src in picked)
+
+        print(f"{len(tags)} covers on the page, phone {args.viewport} CSS px @ {args.dpr}x needs {needed} px per card")
+        print(f"{'full-size JPEG':<28} {original / 1024:9.0f} KiB")
+        print(f"{'srcset pick (' + picked[0][0].rsplit('-', 1)[-1] + ')':<28} {variant / 1024:9.0f} KiB"
+              f"   {original / variant:5.1f}x smaller")
+        print(f"{'src fallback (no srcset)':<28} {fallback / 1024:9.0f} KiB   {original / fallback:5.1f}x smaller")
+        print(f"render /Shop: {cold_ms:.0f} ms before derivatives exist (originals served, builds queued),"
+              f" {warm_ms:.0f} ms after the background builder's {build_ms:.0f} ms")
+        example = "https://res.cloudinary.com/demo/image/upload/v1700000000/covers/pure-maths.jpg"
+        print(f"cloudinary example: {images.cloudinary_url(example, images.CARD_WIDTHS[0])}")
+    finally:
+        shutil.rmtree(cover_dir, ignore_errors=True)
+        for name in names:
+            for width in set(images.CARD_WIDTHS + images.DETAIL_WIDTHS + images.THUMB_WIDTHS):
+                derived = os.path.join(app.static_folder, images.derived_name(name, width))
+                if os.path.exists(derived):
+                    os.remove(derived)
+        try:
+            os.rmdir(os.path.join(app.static_folder, images.DERIVED_DIR))
+        except OSError:
+            pass  # still holds derivatives of real covers
+        os.remove(_db_path)
+
+
+if __name__ == "__main__":
+    main()
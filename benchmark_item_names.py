@@ -0,0 +1,83 @@
+"""Resolution rate and latency of AI cart item names: exact dict lookup vs. ItemNameMatcher.
+
+Usage:
+    python benchmark_item_names.py [--size 10000]
+
+Queries are near misses of real item names in the shapes the model produces
+("Pure Math 12", "Physics U3", "Chemestry Unit 4") plus names that must not match.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from benchmark_chat import synthetic_snapshot
+from item_names import ItemNameMatcher
+
+# (how the model mangles a name, function building the query from the real name)
+VARIANTS = [
+    ("exact", lambda name: name),
+    ("lowercase", lambda name: name.lower()),
+    ("math/maths", lambda name: name.replace("Maths", "Math")),
+    ("unit code", lambda name: name.replace("Unit ", "U")),
+    ("typo", lambda name: name.replace("Physics", "Physcs").replace("Chemistry", "Chemestry")
+                              .replace("Accounting", "Acounting").replace("Statistics", "Statistcs")),
+    ("abbreviation", lambda name: name.replace("Economics", "Econ").replace("Chemistry", "Chem")
+                                      .replace("Statistics", "Stats")),
+    ("extra spaces", lambda name: "  " + name.replace(" ", "  ") + " "),
+]
+
+
+def build_corpus(snapshot, per_variant=200, seed=11):
+    rng = random.Random(seed)
+    corpus = []
+    for label, mangle in VARIANTS:
+        for entry in rng.sample(snapshot.items, per_variant):
+            corpus.append((label, mangle(entry.name), entry.id))
+    for _ in range(per_variant):
+        corpus.append(("no such item", f"Physics Unit {len(snapshot) * 10 + rng.randint(1, 999)}", None))
+        corpus.append(("no such item", "Underwater Basket Weaving 2", None))
+    return corpus
+
+
+def run(resolve, corpus):
+    hits = {}
+    samples = []
+    for label, query, expected in corpus:
+        started = time.perf_counter()
+        entry = resolve(query)
+        samples.append((time.perf_counter() - started) * 1e6)
+        got = entry.id if entry is not None else None
+        ok, total = hits.get(label, (0, 0))
+        hits[label] = (ok + (got == expected), total + 1)
+    samples.sort()
+    return hits, statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=10000)
+    args = parser.parse_args()
+
+    snapshot = synthetic_snapshot(args.size)
+    corpus = build_corpus(snapshot)
+
+    started = time.perf_counter()
+    matcher = ItemNameMatcher(snapshot)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    legacy_hits, legacy_p50, legacy_p99 = run(lambda q: snapshot.by_name.get(q.lower()), corpus)
+    matcher_hits, p50, p99 = run(matcher.match, corpus)
+
+    print(f"{args.size} items, {len(corpus)} queries, matcher built in {build_ms:.0f} ms")
+    print(f"{'variant':<14} | {'exact dict':>10} | {'matcher':>8}")
+    print("-" * 38)
+    for label in legacy_hits:
+        ok, total = legacy_hits[label]
+        m_ok, _ = matcher_hits[label]
+        print(f"{label:<14} | {ok / total:10.0%} | {m_ok / total:8.0%}")
+    print(f"{'latency us':<14} | {legacy_p50:7.1f} p50 | {p50:5.1f} p50, {p99:.1f} p99")
+
+
+if __name__ == "__main__":
+    main()
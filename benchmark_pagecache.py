@@ -0,0 +1,101 @@
+"""Anonymous page throughput with and without the page cache.
+
+Usage:
+    python benchmark_pagecache.py [--items 500] [--requests 300]
+
+Seeds a throwaway SQLite database with --items items and times --requests
+anonymous GETs of each cached page through the Flask test client, first
+rendering every time (PAGE_CACHE off), then from the page cache, then as
+revalidations that carry the ETag and get 304 Not Modified. It finishes by
+editing an item as an admin and checking that /Shop and the product page are
+re-rendered while /About stays cached. Exits 1 if any check fails.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# The app reads DATABASE_URL at import time
+_db_path = os.path.join(tempfile.mkdtemp(), "pagecache.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ.setdefault("SECRET_KEY", "benchmark-pagecache")
+os.environ["WABOT_WORKERS"] = "0"
+
+from app import app  # noqa: E402
+import catalog  # noqa: E402
+import pagecache  # noqa: E402
+from functions import slugify  # noqa: E402
+from models import db, items  # noqa: E402
+
+# Remote covers, so rendering never writes resized copies into static/
+COVER = "https://placehold.co/400x600?text=Paper"
+EDITED_COVER = "https://placehold.co/400x600?text=Edited"
+YEARS = {f"{year} {month}": 12 for year in range(2012, 2025) for month in ("Jan", "May", "Oct")}
+
+
+def seed(count):
+    db.create_all()
+    db.session.add_all(items(name=f"Benchmark Paper {i}", img=COVER, years_available=YEARS)
+                       for i in range(count))
+    db.session.commit()
+    catalog.invalidate()
+
+
+def timed(client, path, count, headers=None):
+    started = time.perf_counter()
+    for _ in range(count):
+        response = client.get(path, headers=headers)
+    return count / (time.perf_counter() - started), response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    ok = True
+    try:
+        with app.app_context():
+            seed(args.items)
+        product = f"/Product/1/{slugify('Benchmark Paper 0')}"
+        paths = ["/", "/About", "/Shop", "/Shop?q=paper+1&page=2", product]
+        client = app.test_client()
+
+        print(f"{args.items} items, {args.requests} anonymous requests per page")
+        print(f"{'page':<28} {'no cache':>10} {'cached':>10} {'304':>10}   req/s")
+        for path in paths:
+            pagecache.PAGE_CACHE_ENABLED = False
+            uncached, plain = timed(client, path, args.requests)
+            pagecache.PAGE_CACHE_ENABLED = True
+            cached, response = timed(client, path, args.requests)
+            revalidated, not_modified = timed(client, path, args.requests, {"If-None-Match": response.headers["ETag"]})
+            same = plain.data == response.data and response.headers.get("X-Page-Cache") == "HIT"
+            ok &= same and not_modified.status_code == 304
+            print(f"{path:<28} {uncached:10.0f} {cached:10.0f} {revalidated:10.0f}"
+                  f"{'' if same and not_modified.status_code == 304 else '   FAIL'}")
+
+        admin = app.test_client()
+        with admin.session_transaction() as session:
+            session["is_admin"] = True
+        admin.post("/admin/edit_item/1", data={"item_name": "Benchmark Paper 0", "img_url": EDITED_COVER,
+                                               "year_month[]": ["2020 Jan"], "page_count[]": ["40"]})
+        after = {path: client.get(path) for path in ("/Shop", product, "/About")}
+        purged = (after["/Shop"].headers.get("X-Page-Cache") == "MISS"
+                  and after[product].headers.get("X-Page-Cache") == "MISS"
+                  and b"Edited" in after[product].data
+                  and after["/About"].headers.get("X-Page-Cache") == "HIT")
+        signed_in = admin.get("/Shop")
+        private = "private" in signed_in.headers.get("Cache-Control", "") and "X-Page-Cache" not in signed_in.headers
+        print(f"item edit re-renders /Shop and its product page, /About stays cached: {'ok' if purged else 'FAIL'}")
+        print(f"signed-in requests bypass the cache and are private: {'ok' if private else 'FAIL'}")
+        ok &= purged and private
+    finally:
+        os.remove(_db_path)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
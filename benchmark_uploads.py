@@ -0,0 +1,110 @@
+"""How long the admin waits on POST /admin/add_item, uploading inline vs. in the background.
+
+Usage:
+    python benchmark_uploads.py [--items 5] [--delay 1.5] [--size-mb 6]
+
+Cloudinary is replaced by uploads.FakeUploader, which sleeps --delay seconds
+per upload (a slow connection to Cloudinary), so nothing leaves the machine.
+Each mode adds --items items with a --size-mb cover against a throwaway
+SQLite database:
+
+    sync        the old behaviour, the upload runs inside the request
+    background  the cover is spooled and the item saved with a placeholder
+    chunked     like background, but the cover arrives in browser-sized
+                pieces through /admin/upload_chunk first (big scans)
+
+Background items are then checked to have their Cloudinary URL once the
+worker finishes. Everything it writes is removed.
+"""
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+# The app reads these at import time
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'uploads.db')}"
+os.environ["UPLOAD_SPOOL_DIR"] = os.path.join(_tmp, "spool")
+os.environ.setdefault("SECRET_KEY", "benchmark-uploads")
+os.environ["WABOT_WORKERS"] = "0"
+
+from app import app  # noqa: E402
+import uploads  # noqa: E402
+from models import db, items, image_uploads  # noqa: E402
+
+
+def add(client, name, cover, chunked):
+    data = {"item_name": name, "year_month[]": ["2020 Jan"], "page_count[]": ["10"]}
+    if chunked:
+        upload_id = uuid.uuid4().hex
+        offset = 0
+        while offset < len(cover):
+            piece = cover[offset:offset + uploads.BROWSER_CHUNK_BYTES]
+            response = client.post(f"/admin/upload_chunk?upload_id={upload_id}&offset={offset}", data=piece)
+            assert response.status_code == 200, response.data
+            offset = response.get_json()["received"]
+        data.update(spooled_upload=upload_id, spooled_name="cover.jpg")
+    else:
+        data["img_file"] = (io.BytesIO(cover), "cover.jpg")
+    response = client.post("/admin/add_item", data=data, content_type="multipart/form-data")
+    assert response.status_code == 302, response.status_code
+
+
+def run(mode, args, cover):
+    uploads.UPLOAD_MODE = "sync" if mode == "sync" else "background"
+    fake = uploads.FakeUploader(delay=args.delay)
+    uploads.set_uploader(fake)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["is_admin"] = True
+    timings = []
+    for i in range(args.items):
+        started = time.perf_counter()
+        add(client, f"{mode} paper {i}", cover, chunked=mode == "chunked")
+        timings.append(time.perf_counter() - started)
+    uploads.wait_for_dispatch()
+
+    with app.app_context():
+        added = db.session.execute(db.select(items).where(items.name.like(f"{mode} paper %"))).scalars().all()
+        uploaded = sum(1 for item in added if item.img.startswith("https://res.cloudinary.com/"))
+    calls_ok = len(fake.calls) == args.items and all(size in (None, len(cover)) for _name, size, _large in fake.calls)
+    ok = uploaded == args.items and calls_ok
+    average = sum(timings) / len(timings) * 1000
+    print(f"{mode:<11} {average:8.0f} ms per add_item   {uploaded}/{args.items} covers on Cloudinary"
+          f"{'' if ok else '   FAIL'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5)
+    parser.add_argument("--delay", type=float, default=1.5, help="seconds the fake Cloudinary takes per upload")
+    parser.add_argument("--size-mb", type=float, default=6.0)
+    args = parser.parse_args()
+
+    cover = os.urandom(int(args.size_mb * 1024 * 1024))
+    ok = True
+    try:
+        with app.app_context():
+            db.create_all()
+        print(f"{args.items} items per mode, {args.size_mb:g} MB covers, {args.delay:g} s per Cloudinary upload")
+        for mode in ("sync", "background", "chunked"):
+            ok &= run(mode, args, cover)
+        with app.app_context():
+            left = db.session.execute(db.select(db.func.count()).select_from(image_uploads)
+                                      .where(image_uploads.status != "sent")).scalar()
+        spooled = os.listdir(uploads.UPLOAD_SPOOL_DIR)
+        print(f"{left} unfinished upload jobs, {len(spooled)} files left in the spool")
+        ok &= not left and not spooled
+    finally:
+        shutil.rmtree(_tmp, ignore_errors=True)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
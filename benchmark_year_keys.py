@@ -0,0 +1,104 @@
+"""Hit rate and speed of AI add-to-cart year matching, old scan vs. YearKeyResolver.
+
+Usage:
+    python benchmark_year_keys.py
+
+The corpus below holds phrasings seen in ||ADD_CART|| commands and chat
+messages, each with the canonical key it should resolve to (None = must not match).
+"""
+import time
+
+from year_keys import YearKeyResolver
+
+KEYS = sorted(f"{year} {month}" for year in range(2015, 2026) for month in ("Jan", "Jun", "Oct"))
+
+# (phrasing, prefer, expected key)
+CORPUS = [
+    ("2019 Jan", "start", "2019 Jan"),
+    ("2019 jan", "start", "2019 Jan"),
+    ("2019 January", "start", "2019 Jan"),
+    ("January 2019", "start", "2019 Jan"),
+    ("Jan 2019", "start", "2019 Jan"),
+    ("jan-2019", "start", "2019 Jan"),
+    ("2019-01", "start", "2019 Jan"),
+    ("01/2019", "start", "2019 Jan"),
+    ("1/2019", "start", "2019 Jan"),
+    ("January, 2019", "start", "2019 Jan"),
+    ("  2019   JAN ", "start", "2019 Jan"),
+    ("2020 Oct", "end", "2020 Oct"),
+    ("October 2020", "end", "2020 Oct"),
+    ("Oct 2020", "end", "2020 Oct"),
+    ("2020/10", "end", "2020 Oct"),
+    ("10-2020", "end", "2020 Oct"),
+    ("2021 June", "start", "2021 Jun"),
+    ("June 2021", "start", "2021 Jun"),
+    ("jun 2021", "start", "2021 Jun"),
+    ("2021-06", "start", "2021 Jun"),
+    ("2019", "start", "2019 Jan"),
+    ("2023", "end", "2023 Oct"),
+    ("2022 Oct.", "end", "2022 Oct"),
+    ("2019 Feb", "start", None),
+    ("March 2019", "start", None),
+    ("2030 Jan", "start", None),
+    ("2019 2020", "start", None),
+    ("next year", "start", None),
+    ("", "start", None),
+]
+
+
+def legacy_resolve_year_key(input_val, valid_keys):
+    """The original per-lookup scan from ai_routes.py."""
+    if not input_val:
+        return None
+    clean_input = input_val.strip().lower()
+    month_map = {
+        "january": "jan", "february": "feb", "march": "mar", "april": "apr",
+        "may": "may", "june": "jun", "july": "jul", "august": "aug",
+        "september": "sep", "october": "oct", "november": "nov", "december": "dec"
+    }
+    for key in valid_keys:
+        clean_key = key.lower()
+        if clean_input == clean_key:
+            return key
+        for full_month, short_month in month_map.items():
+            if full_month in clean_input:
+                normalized_input = clean_input.replace(full_month, short_month)
+                if normalized_input == clean_key:
+                    return key
+        parts = clean_key.split()
+        if len(parts) > 1:
+            db_year = parts[0]
+            db_month = parts[1]
+            if db_year in clean_input and db_month in clean_input:
+                return key
+    return None
+
+
+def measure(resolve, rounds=2000):
+    hits = sum(1 for phrase, prefer, expected in CORPUS if resolve(phrase, prefer) == expected)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for phrase, prefer, _expected in CORPUS:
+            resolve(phrase, prefer)
+    per_lookup_us = (time.perf_counter() - started) / (rounds * len(CORPUS)) * 1e6
+    return hits, per_lookup_us
+
+
+def main():
+    resolver = YearKeyResolver(KEYS)
+    legacy = measure(lambda phrase, prefer: legacy_resolve_year_key(phrase, sorted(KEYS)))
+    indexed = measure(resolver.resolve)
+
+    print(f"{len(CORPUS)} phrasings against {len(KEYS)} keys")
+    print(f"{'resolver':<14} | {'hit rate':>8} | {'us/lookup':>9}")
+    print("-" * 38)
+    for name, (hits, us) in (("legacy scan", legacy), ("indexed", indexed)):
+        print(f"{name:<14} | {hits / len(CORPUS):8.0%} | {us:9.2f}")
+
+    misses = [(p, e, resolver.resolve(p, pr)) for p, pr, e in CORPUS if resolver.resolve(p, pr) != e]
+    for phrase, expected, got in misses:
+        print(f"MISS: {phrase!r} expected {expected!r} got {got!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from models import db, items
+from functions import categories, categorize, slugify
+
+# Safety net for multi-worker deployments: a worker that never sees the admin
+# write still rereads the catalog after this many seconds (and gets a new
+# version only if the rows changed).
+CATALOG_MAX_AGE = int(os.getenv('CATALOG_MAX_AGE', '300'))
+
+
+class CatalogItem(namedtuple('CatalogItem', ['id', 'name', 'slug', 'img', 'category', 'years', 'pages', 'date_added'])):
+    """Read-only view of one `items` row with its years already sorted."""
+    __slots__ = ()
+
+    @property
+    def years_available(self):
+        # Same shape as items.years_available so templates work unchanged
+        return dict(zip(self.years, self.pages))
+
+    @property
+    def categories(self):
+        # Every shop filter this item shows under; `category` is only the first of them
+        return categories(self.name)
+
+
+def fingerprint(entries):
+    """Content hash of a catalog: the same rows give the same value in every worker."""
+    digest = hashlib.sha1()
+    for entry in entries:
+        digest.update(repr(tuple(entry)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CatalogSnapshot:
+    """Immutable view of the whole catalog, built once per catalog version.
+
+    `version` is a per-process counter that local caches compare against;
+    `fingerprint` is derived from the rows themselves, so it is the key to use
+    for anything shared between workers.
+    """
+
+    def __init__(self, version, entries):
+        self.version = version
+        self.items = tuple(entries)
+        self.fingerprint = fingerprint(self.items)
+        self.by_id = MappingProxyType({entry.id: entry for entry in self.items})
+        self.by_name = MappingProxyType({entry.name.lower(): entry for entry in self.items})
+        self.built_at = time.time()
+        # Last time the rows were read back and found unchanged; drives CATALOG_MAX_AGE
+        self.checked_at = self.built_at
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, item_id):
+        return self.by_id.get(item_id)
+
+
+_lock = threading.Lock()
+_version = 0
+_snapshot = None
+
+
+def _make_entry(item):
+    # item_years rows arrive already ordered by sort_order
+    years = tuple(entry.year_key for entry in item.year_entries)
+    pages = tuple(entry.pages for entry in item.year_entries)
+    return CatalogItem(item.id, item.name, slugify(item.name), item.img, categorize(item.name), years, pages,
+                       item.date_added)
+
+
+def build_snapshot(version):
+    all_items = db.session.execute(db.select(items).order_by(items.id)).scalars().all()
+    return CatalogSnapshot(version, [_make_entry(item) for item in all_items])
+
+
+def invalidate():
+    """Call after any committed write to `items`; the next reader rebuilds."""
+    global _version
+    with _lock:
+        _version += 1
+
+
+def current_version():
+    return _version
+
+
+def get_catalog():
+    """Returns the current CatalogSnapshot, rebuilding it if a write happened."""
+    global _snapshot, _version
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == _version and time.time() - snapshot.checked_at < CATALOG_MAX_AGE:
+        return snapshot
+    with _lock:
+        snapshot = _snapshot
+        if snapshot is not None and snapshot.version == _version:
+            if time.time() - snapshot.checked_at < CATALOG_MAX_AGE:
+                return snapshot
+            # Expired without a local write: reread the rows, but only call it a new
+            # version if another worker actually changed them, so the indexes and
+            # caches built on this snapshot survive
+            fresh = build_snapshot(_version + 1)
+            if fresh.fingerprint == snapshot.fingerprint:
+                snapshot.checked_at = fresh.checked_at
+                return snapshot
+            _version += 1
+            _snapshot = fresh
+            return _snapshot
+        _snapshot = build_snapshot(_version)
+        return _snapshot
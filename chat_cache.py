@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Tuning: seconds an answer stays valid, entries kept per process, longest answer worth caching
+CHAT_CACHE_TTL = int(os.getenv('CHAT_CACHE_TTL', '600'))
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv('CHAT_CACHE_MAX_ENTRIES', '1000'))
+CHAT_CACHE_MAX_CHARS = int(os.getenv('CHAT_CACHE_MAX_CHARS', '8000'))
+# "memory" (default, per process) or a redis:// URL shared by every worker
+CHAT_CACHE_URL = os.getenv('CHAT_CACHE_URL', 'memory')
+
+_spaces = re.compile(r"\s+")
+_trailing = re.compile(r"[\s?!.]+$")
+
+
+def normalize_message(message):
+    """'  Price of Pure Maths 1  2019-2023?? ' -> 'price of pure maths 1 2019-2023'"""
+    return _trailing.sub("", _spaces.sub(" ", (message or "").strip().lower()))
+
+
+class MemoryBackend:
+    """LRU dict with per-entry expiry, local to this process."""
+
+    def __init__(self, max_entries=CHAT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                self.expirations += 1
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        return {'entries': len(self.entries), 'evictions': self.evictions, 'expirations': self.expirations}
+
+
+class RedisBackend:
+    """Shared store for several workers; expiry is SETEX, eviction is the server's maxmemory policy."""
+
+    prefix = "chat:"
+
+    def __init__(self, url):
+        import redis  # only needed when CHAT_CACHE_URL points at redis
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode() if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.setex(self.prefix + key, ttl, value)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+    def stats(self):
+        return {}
+
+
+def make_backend(url=CHAT_CACHE_URL):
+    if url.startswith(('redis://', 'rediss://')):
+        return RedisBackend(url)
+    return MemoryBackend()
+
+
+class ChatCache:
+    """
+    Caches model answers keyed by (catalog fingerprint, user, normalized message).
+
+    The fingerprint is a hash of the catalog rows rather than the per-process
+    version counter, so workers sharing a Redis backend only share answers
+    built from the same catalog. Guests share one entry per message; a signed
+    in user's prompt carries their name, school and level, so their answers
+    are only ever served back to them.
+
+    Anything carrying an ADD_CART command, or over CHAT_CACHE_MAX_CHARS, is
+    never stored: those answers have side effects or are one-offs.
+    """
+
+    def __init__(self, backend, ttl=CHAT_CACHE_TTL, max_chars=CHAT_CACHE_MAX_CHARS):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_chars = max_chars
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.skipped = 0
+        self.errors = 0
+
+    @staticmethod
+    def key(message, user_id, fingerprint):
+        """user_id is None for guests."""
+        owner = "guest" if user_id is None else f"user:{user_id}"
+        raw = f"{fingerprint}|{owner}|{normalize_message(message)}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def get(self, message, user_id, fingerprint):
+        try:
+            value = self.backend.get(self.key(message, user_id, fingerprint))
+        except Exception as e:
+            print(f"Chat cache read failed: {e}")
+            self.errors += 1
+            value = None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value)['response']
+
+    def put(self, message, user_id, fingerprint, ai_text):
+        """Stores ai_text unless it must not be reused. Returns True if stored."""
+        if not ai_text or "||ADD_CART" in ai_text or len(ai_text) > self.max_chars:
+            self.skipped += 1
+            return False
+        try:
+            self.backend.set(self.key(message, user_id, fingerprint), json.dumps({'response': ai_text}), self.ttl)
+        except Exception as e:
+            print(f"Chat cache write failed: {e}")
+            self.errors += 1
+            return False
+        self.stores += 1
+        return True
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'stores': self.stores,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            **self.backend.stats(),
+        }
+
+
+_lock = threading.Lock()
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = ChatCache(make_backend())
+    return _cache
@@ -0,0 +1,146 @@
+import math
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+import catalog
+from functions import PRICE_PER_PAGE, BINDING_PRICE, COVER_COSTS, CATEGORY_RULES, CATEGORIES
+from item_names import FUZZY_THRESHOLD, name_tokens, trigrams
+
+# Number of catalog items put into the prompt for one message
+CHAT_TOP_K = 8
+
+# Compared against name_tokens output, which splits on apostrophes ("it's" -> "it", "s").
+# "it" itself stays searchable: it is the IT subject.
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "can", "do", "for", "from", "have", "how", "i",
+    "in", "is", "me", "much", "my", "of", "on", "please", "price", "the",
+    "to", "want", "what", "with", "you", "cover", "book", "paper", "papers",
+}
+
+PRICING_CONTEXT = (
+    "--- PRICING ---\n"
+    f"Formula: (Total Pages * {PRICE_PER_PAGE:g}) + {BINDING_PRICE:g} + CoverCost\n"
+    "Cover Costs: " + ", ".join(f"{name.capitalize()}({cost})" for name, cost in COVER_COSTS.items())
+)
+
+
+def _similarity(a, b):
+    return SequenceMatcher(None, a, b).ratio()
+
+
+class ChatRetriever:
+    """Keyword/fuzzy index over item names and subjects for one catalog version."""
+
+    def __init__(self, snapshot):
+        self.version = snapshot.version
+        self.entries = snapshot.items
+        self.postings = defaultdict(set)
+        self.category_postings = defaultdict(set)
+        for pos, entry in enumerate(self.entries):
+            for token in name_tokens(entry.name):
+                self.postings[token].add(pos)
+            for category in entry.categories:
+                self.category_postings[category].add(pos)
+        total = max(len(self.entries), 1)
+        self.idf = {token: math.log(1 + total / len(posting)) for token, posting in self.postings.items()}
+        self.vocabulary = sorted(self.postings)
+        self.gram_words = defaultdict(set)
+        for word in self.vocabulary:
+            for gram in trigrams(word):
+                self.gram_words[gram].add(word)
+        self.static_instruction = self._build_static_instruction()
+
+    def _build_static_instruction(self):
+        counts = defaultdict(int)
+        for entry in self.entries:
+            counts[entry.category] += 1
+        subjects = ", ".join(f"{cat}({counts[cat]})" for cat in CATEGORIES + ["other"] if counts[cat])
+        return (
+            "SCOPE: Selling Edexcel papers. You cannot checkout, only add to cart.\n"
+            f"The shop has {len(self.entries)} units. Subjects: {subjects or 'none'}.\n"
+            "Only the units relevant to the customer's message are listed below. "
+            "If the unit they want is not listed, ask them to name it exactly.\n\n"
+            f"{PRICING_CONTEXT}\n\n"
+        )
+
+    def _matching_words(self, token):
+        """Yields (word, weight) for vocabulary words matching a message token."""
+        if token in self.postings:
+            yield token, 1.0
+            return
+        if len(token) >= 3:
+            lo = bisect_left(self.vocabulary, token)
+            hi = bisect_left(self.vocabulary, token + "\x7f")
+            if lo < hi:
+                for word in self.vocabulary[lo:hi]:
+                    yield word, 0.8
+                return
+            candidates = set()
+            for gram in trigrams(token):
+                candidates |= self.gram_words.get(gram, set())
+            for word in candidates:
+                score = _similarity(token, word)
+                if score >= FUZZY_THRESHOLD:
+                    yield word, score
+
+    def retrieve(self, message, k=CHAT_TOP_K):
+        """Returns up to k catalog entries ranked by relevance to the message."""
+        scores = defaultdict(float)
+        for token in name_tokens(message):
+            if token in STOPWORDS:
+                continue
+            for word, weight in self._matching_words(token):
+                idf = self.idf[word]
+                for pos in self.postings[word]:
+                    scores[pos] += weight * idf
+            # Subject words ("maths", "econ") give a small boost to that category
+            for category, keywords in CATEGORY_RULES:
+                if any(keyword in token for keyword in keywords if len(keyword) >= 4):
+                    for pos in self.category_postings.get(category, ()):
+                        scores[pos] += 0.25
+        ranked = sorted(scores, key=lambda pos: (-scores[pos], pos))
+        return [self.entries[pos] for pos in ranked[:k]]
+
+    def inventory_context(self, message, k=CHAT_TOP_K):
+        relevant = self.retrieve(message, k)
+        if not relevant:
+            return "RELEVANT INVENTORY: (no unit matched this message)\n"
+        lines = ["RELEVANT INVENTORY:"]
+        for item in relevant:
+            if item.years:
+                lines.append(f"- Item: '{item.name}'\n  * Years: {list(item.years)}")
+            else:
+                lines.append(f"- Item: '{item.name}' (Out of Stock)")
+        return "\n".join(lines) + "\n"
+
+    def system_instruction(self, message, user_context_name, is_logged_in):
+        return (
+            f"You are 'Genius AI', speaking to: {user_context_name}.\n"
+            f"{self.static_instruction}"
+            f"{self.inventory_context(message)}\n"
+            "--- ADD TO CART PROTOCOL ---\n"
+            f"User Logged In: {is_logged_in}\n"
+            "1. IF NOT LOGGED IN: Refuse to add to cart.\n"
+            "2. IF LOGGED IN: If user confirms to buy, output a HIDDEN COMMAND.\n"
+            "   Format: ||ADD_CART:ItemName|StartYear|EndYear|CoverType||\n\n"
+            "   Example: ||ADD_CART:Pure Maths 1|2019 Jan|2020 Oct|Normal||\n"
+        )
+
+
+_lock = threading.Lock()
+_retriever = None
+
+
+def get_retriever():
+    """Returns the ChatRetriever for the current catalog version."""
+    global _retriever
+    snapshot = catalog.get_catalog()
+    retriever = _retriever
+    if retriever is not None and retriever.version == snapshot.version:
+        return retriever
+    with _lock:
+        if _retriever is None or _retriever.version != snapshot.version:
+            _retriever = ChatRetriever(snapshot)
+        return _retriever
@@ -0,0 +1,215 @@
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+import chat_context
+import pricing
+from functions import COVER_COSTS
+from item_names import name_tokens
+from search import tokenize
+from year_keys import MONTH_NUMBERS, MONTHS
+
+# Circuit breaker: consecutive Groq failures before opening, and seconds before trying again
+GROQ_FAILURE_THRESHOLD = int(os.getenv('GROQ_FAILURE_THRESHOLD', '3'))
+GROQ_RESET_AFTER = float(os.getenv('GROQ_RESET_AFTER', '30'))
+
+Intent = namedtuple('Intent', 'kind item start end cover')
+
+# "add ... to (my) cart" is the only phrasing that writes to the cart; "buy"/"order"
+# also turn up in price questions ("how much to order ..."), so they don't count
+ADD_VERBS = {"add"}
+CART_WORDS = {"cart", "basket"}
+PRICE_WORDS = {"price", "prices", "cost", "costs", "quote", "much", "total"}
+AVAILABILITY_WORDS = {"available", "availability", "have", "stock", "years", "sessions", "got", "sell"}
+COVER_WORDS = {"normal": "normal", "custom": "custom", "minimalistic": "minimalistic", "minimal": "minimalistic",
+               "minimalist": "minimalistic"}
+
+_year_re = re.compile(r"^(19|20)\d\d$")
+_month_words = {word for word in MONTH_NUMBERS if not word.isdigit()}
+
+UNAVAILABLE_REPLY = (
+    "Genius AI is busy right now. I can still answer prices and availability, e.g. "
+    "\"price of Pure Maths 1 from 2019 Jan to 2021 Jun with custom cover\"."
+)
+
+
+def _year_spans(tokens):
+    """['2019', 'jan', 'to', '2022', 'oct'] -> ['2019 jan', '2022 oct']"""
+    dated = [i for i, t in enumerate(tokens) if _year_re.match(t) or t in _month_words]
+    if not dated:
+        return []
+    # Whichever comes first (month or year) sets the order for the whole message
+    month_first = tokens[dated[0]] in _month_words
+    spans = []
+    for i, token in enumerate(tokens):
+        if not _year_re.match(token):
+            continue
+        neighbour = i - 1 if month_first else i + 1
+        if 0 <= neighbour < len(tokens) and tokens[neighbour] in _month_words:
+            spans.append(f"{token} {MONTHS[MONTH_NUMBERS[tokens[neighbour]] - 1]}")
+        else:
+            spans.append(token)
+    return spans
+
+
+def _match_item(message):
+    """The one catalog entry whose full (normalized) name appears in the message, or None if unsure."""
+    token_set = set(name_tokens(message))
+    best, best_len, tied = None, 0, False
+    for entry in chat_context.get_retriever().retrieve(message):
+        tokens = name_tokens(entry.name)
+        if not tokens or not token_set.issuperset(tokens):
+            continue
+        if len(tokens) > best_len:
+            best, best_len, tied = entry, len(tokens), False
+        elif len(tokens) == best_len:
+            tied = True
+    return None if tied else best
+
+
+def parse_intent(message):
+    """Returns an Intent for price/availability/add-to-cart questions it is sure about, else None."""
+    tokens = tokenize(message)
+    words = set(tokens)
+    # Price and availability win: a question must never turn into a cart write
+    if words & PRICE_WORDS:
+        kind = "price"
+    elif words & ADD_VERBS and words & CART_WORDS:
+        kind = "add_cart"
+    elif words & AVAILABILITY_WORDS:
+        kind = "availability"
+    else:
+        return None
+
+    item = _match_item(message)
+    if item is None:
+        return None
+
+    spans = _year_spans(tokens)
+    if len(spans) > 2:
+        return None
+    start, end = (spans[0], spans[-1]) if spans else (None, None)
+    covers = {COVER_WORDS[t] for t in tokens if t in COVER_WORDS}
+    if len(covers) > 1:
+        return None
+    cover = covers.pop() if covers else None
+
+    # Adding to the cart changes state: only act when every field was stated
+    if kind == "add_cart" and (start is None or cover is None):
+        return None
+    return Intent(kind, item, start, end, cover)
+
+
+def _range_text(table, s_idx, e_idx):
+    if s_idx == e_idx:
+        return table.years[s_idx]
+    return f"{table.years[s_idx]} to {table.years[e_idx]}"
+
+
+def answer(intent, is_logged_in):
+    """
+    Returns the reply text for a parsed intent, or None to hand the message to the model.
+
+    For add_cart the reply is the same hidden ||ADD_CART:...|| command the model
+    would emit, so the caller runs it through apply_cart_command unchanged.
+    """
+    table = pricing.get_table(intent.item.id)
+    if table is None:
+        return None
+    name = intent.item.name
+
+    if not table.years:
+        return f"**{name}** is out of stock right now."
+
+    if intent.start is None:
+        s_idx, e_idx = 0, len(table.years) - 1
+        start_key, end_key = table.years[0], table.years[-1]
+    else:
+        resolved = table.resolver.resolve_range(intent.start, intent.end)
+        if resolved is None:
+            wanted = intent.start if intent.start == intent.end else f"{intent.start} to {intent.end}"
+            return f"**{name}** doesn't have {wanted}. Available years: {', '.join(table.years)}."
+        start_key, end_key, s_idx, e_idx = resolved
+
+    if intent.kind == "availability":
+        return f"Yes, we have **{name}**. Available years: {', '.join(table.years)}."
+
+    if intent.kind == "price":
+        pages = table.pages(s_idx, e_idx)
+        if intent.cover:
+            price = table.price(s_idx, e_idx, intent.cover)
+            return (f"**{name}** ({_range_text(table, s_idx, e_idx)}, {pages} pages) with a "
+                    f"{intent.cover.capitalize()} cover costs **LKR {price:,.2f}**.")
+        prices = ", ".join(f"{cover.capitalize()} LKR {table.price(s_idx, e_idx, cover):,.2f}" for cover in COVER_COSTS)
+        return f"**{name}** ({_range_text(table, s_idx, e_idx)}, {pages} pages): {prices}."
+
+    if not is_logged_in:
+        return "Please log in first, then I can add it to your cart."
+    return f"||ADD_CART:{name}|{start_key}|{end_key}|{intent.cover.capitalize()}||"
+
+
+def fast_reply(message, is_logged_in):
+    """Answers the message locally when the intent is unambiguous. Returns text or None."""
+    try:
+        intent = parse_intent(message)
+        return answer(intent, is_logged_in) if intent else None
+    except Exception as e:
+        print(f"Fast path error: {e}")
+        return None
+
+
+class CircuitBreaker:
+    """Stops calling Groq after repeated failures, then lets one trial call through after reset_after seconds."""
+
+    def __init__(self, failure_threshold=GROQ_FAILURE_THRESHOLD, reset_after=GROQ_RESET_AFTER):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        # True while the one trial call admitted after reset_after is in flight
+        self.half_open = False
+        self.probe_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if self.half_open:
+                # A probe that never reported back (client went away) must not block forever
+                if now - self.probe_at < self.reset_after:
+                    return False
+            elif now - self.opened_at < self.reset_after:
+                return False
+            # Half-open: this call probes, everyone else waits for its outcome
+            self.half_open = True
+            self.probe_at = now
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.half_open = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.half_open or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"Groq circuit opened after {self.failures} failures")
+                # A failed probe reopens for another full reset window
+                self.opened_at = time.monotonic()
+                self.half_open = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self.half_open else "open"
+
+
+groq_breaker = CircuitBreaker()
@@ -0,0 +1,107 @@
+"""Fails if the chat fast path misreads a message or the Groq breaker lets a burst through.
+
+Usage:
+    python check_chat_intents.py
+
+Seeds a throwaway SQLite catalog and runs chat_intents.fast_reply as a logged
+in user on each phrasing below. A price or availability question must never
+come back as an ||ADD_CART:...|| command, even when it says "buy" or "order";
+only "add ... to cart" may. Then it trips a CircuitBreaker and checks that
+after the reset window exactly one trial call is admitted until it reports.
+Exits 1 on any failure.
+"""
+import os
+import sys
+import tempfile
+
+# The app reads DATABASE_URL at import time
+_db_path = os.path.join(tempfile.mkdtemp(), "intents.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ.setdefault("SECRET_KEY", "check-chat-intents")
+os.environ["WABOT_WORKERS"] = "0"
+
+from app import app  # noqa: E402
+import catalog  # noqa: E402
+import chat_intents  # noqa: E402
+from models import db, items  # noqa: E402
+
+YEARS = {"2019 Jan": 40, "2020 Jan": 42, "2021 Jun": 38}
+
+# (message, expected kind of reply: "cart", "price", "availability" or None for the model)
+CASES = [
+    ("How much would it cost to order Pure Maths 1 from 2019 Jan to 2021 Jun with custom cover?", "price"),
+    ("What's the price to buy Pure Maths 1 2019 Jan to 2021 Jun normal cover", "price"),
+    ("I want to purchase Pure Maths 1 from 2019 Jan to 2021 Jun custom, what is the total?", "price"),
+    ("How much to add Pure Maths 1 2019 Jan to 2021 Jun custom cover to my cart?", "price"),
+    ("Can I buy Pure Maths 1, which years do you have?", "availability"),
+    ("Add Pure Maths 1 from 2019 Jan to 2021 Jun with custom cover to my cart", "cart"),
+    ("buy Pure Maths 1 from 2019 Jan to 2021 Jun custom cover", None),
+    ("order Pure Maths 1 from 2019 Jan to 2021 Jun custom cover", None),
+]
+
+
+def kind_of(reply):
+    if reply is None:
+        return None
+    if reply.startswith("||ADD_CART:"):
+        return "cart"
+    return "price" if "LKR" in reply else "availability"
+
+
+class Clock:
+    now = 0.0
+
+
+def check_breaker():
+    real_monotonic = chat_intents.time.monotonic
+    chat_intents.time.monotonic = lambda: Clock.now
+    try:
+        breaker = chat_intents.CircuitBreaker(failure_threshold=2, reset_after=30)
+        breaker.record_failure()
+        breaker.record_failure()
+        results = {"open rejects": not breaker.allow()}
+        Clock.now += 31
+        results["one probe after reset"] = [breaker.allow() for _ in range(5)] == [True, False, False, False, False]
+        breaker.record_failure()
+        results["failed probe reopens"] = breaker.state == "open" and not breaker.allow()
+        Clock.now += 31
+        breaker.allow()
+        breaker.record_success()
+        results["successful probe closes"] = breaker.state == "closed" and all(breaker.allow() for _ in range(3))
+        breaker.record_failure()
+        breaker.record_failure()
+        Clock.now += 31
+        breaker.allow()
+        Clock.now += 31
+        results["lost probe is replaced"] = [breaker.allow() for _ in range(3)] == [True, False, False]
+        return results
+    finally:
+        chat_intents.time.monotonic = real_monotonic
+
+
+def main():
+    failures = 0
+    try:
+        with app.app_context():
+            db.create_all()
+            db.session.add(items(name="Pure Maths 1", img="x.png", years_available=YEARS))
+            db.session.commit()
+            catalog.invalidate()
+            for message, expected in CASES:
+                reply = chat_intents.fast_reply(message, is_logged_in=True)
+                got = kind_of(reply)
+                failures += got != expected
+                print(f"{'ok' if got == expected else 'FAIL':<4}  {str(expected):<12} {message}")
+                if got != expected:
+                    print(f"        got {got}: {reply}")
+        for name, passed in check_breaker().items():
+            failures += not passed
+            print(f"{'ok' if passed else 'FAIL':<4}  breaker: {name}")
+    finally:
+        os.remove(_db_path)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Fails if any hot route query falls back to a full table scan.
+
+Usage:
+    python check_query_plans.py                  # schema from the models (db.create_all)
+    python check_query_plans.py --migrations     # schema from flask db upgrade instead
+    python check_query_plans.py --scale 5        # 5x the default synthetic data
+
+Seeds a throwaway SQLite database with a large synthetic dataset, runs ANALYZE,
+then runs EXPLAIN QUERY PLAN on the statements the routes execute (the same
+model query helpers, compiled with literal values). Exits 1 if a query scans a
+table without an index, or sorts in a temp b-tree where the index should
+already give the order. Run it after changing models, queries or migrations.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+# The app reads DATABASE_URL at import time
+_db_path = os.path.join(tempfile.mkdtemp(), "plans.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ.setdefault("SECRET_KEY", "check-query-plans")
+
+from app import app  # noqa: E402
+import wa_api  # noqa: E402
+from models import db, items, item_years, users, cart, orders, order_lines, wa_outbox  # noqa: E402
+from pagination import date_bounds, keyset_query  # noqa: E402
+
+BASE_ROWS = {"users": 5000, "items": 2000, "cart": 50000, "orders": 100000, "order_lines": 150000, "wa_outbox": 20000}
+STATUSES = ["Pending", "Processing", "Shipped", "Completed", "Cancelled"]
+CHUNK = 5000
+ORDER_KEY = (orders.order_date, orders.id)
+USER_KEY = (users.id,)
+
+# (name, route, statement, full listing allowed, order must come from the index)
+CHECKS = [
+    ("login", "/Login", lambda: db.select(users).filter_by(email="user42@example.com"), False, False),
+    ("admin login", "/admin", lambda: db.select(users).filter(
+        (users.email == "user42@example.com") | (users.name == "user42")), False, False),
+    ("cart page", "/Cart", lambda: cart.for_user(42), False, False),
+    ("checkout rows", "/Checkout", lambda: cart.for_user(42, [1, 2, 3]), False, False),
+    ("delete user cart", "/admin/delete_user", lambda: db.delete(cart).where(cart.user_id == 42), False, False),
+    ("my orders", "/MyOrders", lambda: orders.for_user(42), False, True),
+    ("admin orders", "/admin/orders", lambda: keyset_query(orders.matching(), ORDER_KEY), True, True),
+    ("admin orders next page", "/admin/orders?cursor=",
+     lambda: keyset_query(orders.matching(), ORDER_KEY, (datetime(2025, 12, 1), 40000)), False, True),
+    ("admin orders by status", "/admin/orders?status=", lambda: keyset_query(
+        orders.matching("Pending"), ORDER_KEY, (datetime(2025, 12, 1), 40000)), False, True),
+    ("admin orders by date", "/admin/orders?from=&to=", lambda: keyset_query(orders.matching(
+        date_range=date_bounds(orders.order_date, date(2025, 11, 1), date(2025, 11, 30))), ORDER_KEY), False, True),
+    ("admin orders by customer", "/admin/orders?customer=",
+     lambda: keyset_query(orders.matching(customer="94"), ORDER_KEY), True, True),
+    ("admin users", "/admin/users", lambda: keyset_query(users.matching(), USER_KEY, (2500,)), False, True),
+    ("sync name match", "/api/admin/sync_inventory", lambda: db.select(items.id, items.name_lower).where(
+        items.name_lower.in_(["item 1", "item 2", "item 3"])).order_by(items.id), False, False),
+    ("sync year rows", "/api/admin/sync_inventory",
+     lambda: db.delete(item_years).where(item_years.item_id.in_([1, 2, 3])), False, False),
+    ("range pages", "pricing", lambda: item_years.total_pages(7, "2019 Jan", "2021 Jun"), False, False),
+    ("order status move", "/admin/update_order", lambda: order_lines.item_ids(42), False, False),
+    ("sales by item", "order_lines", lambda: db.select(db.func.count(), db.func.sum(order_lines.price)).where(
+        order_lines.item_id == 7), False, False),
+    ("outbox flush", "flask wa-flush", lambda: wa_api.waiting_query("pending", 500), False, True),
+]
+
+
+def insert_chunks(table, rows):
+    for start in range(0, len(rows), CHUNK):
+        db.session.execute(db.insert(table), rows[start:start + CHUNK])
+
+
+def seed(scale, rng):
+    n = {name: int(count * scale) for name, count in BASE_ROWS.items()}
+    now = datetime(2026, 1, 1)
+    insert_chunks(users, [{
+        "id": i, "name": f"user{i}", "password": "x", "email": f"user{i}@example.com", "school": "s",
+        "level": "AS", "number": "94000000", "address": "a", "town": "t", "date_joined": now,
+    } for i in range(1, n["users"] + 1)])
+    insert_chunks(items, [{
+        "id": i, "name": f"Item {i}", "name_lower": f"item {i}", "img": "x.png", "date_added": now,
+    } for i in range(1, n["items"] + 1)])
+    years = ["2019 Jan", "2020 Oct", "2021 Jun"]
+    insert_chunks(item_years, [{
+        "item_id": i, "year_key": key, "sort_order": order, "pages": 10,
+    } for i in range(1, n["items"] + 1) for order, key in enumerate(years)])
+    insert_chunks(cart, [{
+        "user_id": rng.randint(1, n["users"]), "original_item_id": rng.randint(1, n["items"]),
+        "start_year": years[0], "end_year": years[-1], "pages": 30, "design_type": "Normal", "price": 750.0,
+        "date_added": now,
+    } for _ in range(n["cart"])])
+    insert_chunks(orders, [{
+        "user_id": rng.randint(1, n["users"]), "customer_name": "c", "contact_number": "94", "order_items": "x",
+        "total_price": 750.0, "status": rng.choice(STATUSES), "order_date": now - timedelta(minutes=i),
+    } for i in range(n["orders"])])
+    insert_chunks(order_lines, [{
+        "order_id": rng.randint(1, n["orders"]), "item_id": rng.randint(1, n["items"]), "start_key": years[0],
+        "end_key": years[-1], "cover": "Normal", "pages": 30, "price": 750.0,
+    } for _ in range(n["order_lines"])])
+    insert_chunks(wa_outbox, [{
+        "number": "94", "message": "m", "status": "sent" if rng.random() < 0.98 else "pending", "attempts": 1,
+        "created_at": now,
+    } for _ in range(n["wa_outbox"])])
+    db.session.commit()
+    db.session.execute(db.text("ANALYZE"))
+    return n
+
+
+def plan(statement):
+    sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+    rows = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+    return [row[-1] for row in rows]
+
+
+def problems(details, allow_full_listing, index_order):
+    found = []
+    for detail in details:
+        if detail.startswith("SCAN ") and " USING " not in detail and not detail.startswith("SCAN CONSTANT ROW"):
+            found.append(f"full table scan: {detail}")
+        elif detail.startswith("SCAN ") and not allow_full_listing and "INDEX" in detail:
+            found.append(f"full index scan: {detail}")
+        elif index_order and "TEMP B-TREE" in detail:
+            found.append(f"sort not served by an index: {detail}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--migrations", action="store_true", help="build the schema with the Alembic migrations")
+    parser.add_argument("--verbose", action="store_true", help="print every plan line")
+    args = parser.parse_args()
+
+    failures = 0
+    with app.app_context():
+        started = time.perf_counter()
+        if args.migrations:
+            # app.py only sets up Flask-Migrate under the flask command
+            from flask_migrate import Migrate, upgrade
+            Migrate(app, db)
+            upgrade()
+        else:
+            db.create_all()
+        counts = seed(args.scale, random.Random(17))
+        print(f"Seeded {', '.join(f'{v} {k}' for k, v in counts.items())} in {time.perf_counter() - started:.1f}s")
+
+        for name, route, build, allow_full_listing, index_order in CHECKS:
+            details = plan(build())
+            found = problems(details, allow_full_listing, index_order)
+            failures += bool(found)
+            print(f"{'FAIL' if found else 'ok':<4}  {name:<24} {route}")
+            for line in (details if args.verbose else found):
+                print(f"        {line}")
+    os.remove(_db_path)
+    if failures:
+        print(f"{failures} quer{'y' if failures == 1 else 'ies'} without index coverage")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
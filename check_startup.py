@@ -0,0 +1,56 @@
+"""Fails if a cold start of the app is over budget or loads a lazy dependency.
+
+Usage:
+    python check_startup.py                     # best of 5 cold starts vs STARTUP_BUDGET_MS
+    python check_startup.py --budget-ms 800 --runs 10
+    python check_startup.py --verbose           # full import-time report
+
+Each run is a fresh `python -X importtime` process that imports app.py and
+serves one request, which is what a Vercel cold start pays before the first
+response. The fastest run is compared with the budget, so one noisy run can't
+fail the check. Exits 1 if that run is over budget, or if any of
+startup.LAZY_MODULES (cloudinary, groq, requests, flask_migrate, ...) was
+imported at startup instead of on first use. Run it after adding imports.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import startup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=startup.STARTUP_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    # The probe's one request must not touch a real database
+    db_dir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'startup.db')}"
+    os.environ.setdefault("SECRET_KEY", "check-startup")
+    try:
+        runs = [startup.profile() for _ in range(args.runs)]
+    finally:
+        for name in os.listdir(db_dir):
+            os.remove(os.path.join(db_dir, name))
+        os.rmdir(db_dir)
+    best = min(runs, key=lambda result: result.total_ms)
+
+    if args.verbose:
+        print(startup.report(best))
+        print()
+    totals = ", ".join(f"{result.total_ms:.0f}" for result in runs)
+    over = best.total_ms > args.budget_ms
+    print(f"{'FAIL' if over else 'ok':<4}  cold start {best.total_ms:.0f} ms (runs: {totals} ms),"
+          f" budget {args.budget_ms:.0f} ms")
+    print(f"{'FAIL' if best.eager else 'ok':<4}  lazy modules not imported at startup"
+          f"{': ' + ', '.join(best.eager) if best.eager else ''}")
+    if over or best.eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import g, session
+
+from models import db, users
+
+# Seconds a loaded user is reused by this process, and how many users it keeps
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '60'))
+USER_CACHE_MAX = int(os.getenv('USER_CACHE_MAX', '2048'))
+# The only user fields copied into the signed session cookie (enough for the header)
+SESSION_USER_FIELDS = ('id', 'name')
+
+# Read-only copy of a users row, safe to share between requests (no password hash)
+CurrentUser = namedtuple('CurrentUser', 'id name email school level number address town date_joined')
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+# user_id -> time.time() of the last invalidate() in this process, kept for one TTL;
+# sessions whose header fields are older than that reload them
+_changed = {}
+
+
+def _snapshot(user):
+    return CurrentUser(user.id, user.name, user.email, user.school, user.level,
+                       user.number, user.address, user.town, user.date_joined)
+
+
+def get_user(user_id):
+    """Returns the CurrentUser for user_id from the process cache, querying at most once per TTL."""
+    now = time.monotonic()
+    with _lock:
+        cached = _cache.get(user_id)
+        if cached is not None and cached[1] > now:
+            _cache.move_to_end(user_id)
+            return cached[0]
+    row = db.session.get(users, user_id)
+    if row is None:
+        invalidate(user_id)
+        return None
+    user = _snapshot(row)
+    with _lock:
+        _cache[user_id] = (user, now + USER_CACHE_TTL)
+        _cache.move_to_end(user_id)
+        while len(_cache) > USER_CACHE_MAX:
+            _cache.popitem(last=False)
+    return user
+
+
+def invalidate(user_id):
+    """Drops a user from this process's cache and marks their session header stale.
+
+    Call after changing or deleting the row (profile edits, admin deletes and resets).
+    """
+    now = time.time()
+    with _lock:
+        _cache.pop(user_id, None)
+        _changed[user_id] = now
+        for stale_id in [key for key, at in _changed.items() if now - at > USER_CACHE_TTL]:
+            del _changed[stale_id]
+
+
+def remember_login(user):
+    """Stores the logged-in user in the session, including the header fields."""
+    session['user_id'] = user.id
+    session['user'] = {field: getattr(user, field) for field in SESSION_USER_FIELDS}
+    session['user_checked_at'] = time.time()
+
+
+def refresh(user_id):
+    """Reloads g.user and the session header fields after the row was updated."""
+    invalidate(user_id)
+    g.user = get_user(user_id)
+    if g.user is not None:
+        remember_login(g.user)
+
+
+def load_current_user():
+    user_id = session.get('user_id')
+    if user_id is None:
+        return None
+    user = get_user(user_id)
+    if user is None:
+        # Deleted account: forget it so the header stops showing the name
+        session.pop('user_id', None)
+        session.pop('user', None)
+        session.pop('user_checked_at', None)
+    return user
+
+
+class LazyUserGlobals:
+    """Mixin for app.app_ctx_globals_class: `g.user` is loaded on first access.
+
+    Pages that never read it never query for it.
+    """
+
+    def __getattr__(self, name):
+        if name == 'user':
+            user = load_current_user()
+            self.user = user
+            return user
+        return super().__getattr__(name)
+
+
+def _header_stale(user_id):
+    # Another user's edit can't reach this cookie, so the fields are rechecked
+    # once per USER_CACHE_TTL, and at once after a change made in this process
+    checked_at = session.get('user_checked_at', 0)
+    if time.time() - checked_at >= USER_CACHE_TTL:
+        return True
+    with _lock:
+        changed_at = _changed.get(user_id)
+    return changed_at is not None and changed_at >= checked_at
+
+
+def header_user():
+    """User fields for the page header, from the session cookie when fresh (no DB round trip)."""
+    summary = session.get('user')
+    user_id = session.get('user_id')
+    if user_id is None or (summary is not None and not _header_stale(user_id)):
+        return summary
+    # Stale, or a session from before the header fields existed: reload and backfill.
+    # A deleted account comes back as None and is dropped from the session.
+    user = g.user
+    if user is None:
+        return None
+    remember_login(user)
+    return session['user']
+
+
+def init_app(app):
+    app.app_ctx_globals_class = type('LazyUserGlobals', (LazyUserGlobals, app.app_ctx_globals_class), {})
+
+    @app.context_processor
+    def inject_header_user():
+        return {'header_user': header_user()}
@@ -1,9 +1,65 @@
+import re
+
+# Pricing formula shared by the server, the product page and the AI prompt
+PRICE_PER_PAGE = 5.0
+BINDING_PRICE = 400.0
+COVER_COSTS = {
+    "normal": 200,
+    "custom": 500,
+    "minimalistic": 80
+}
+
+# Shop categories in match order. An item is listed under every category whose
+# keywords appear in its lowercased name, like the old client-side filter; the
+# first match is its primary category (CatalogItem.category). Items matching nothing
+# fall into "other".
+CATEGORY_RULES = [
+    ("physics", ("physics",)),
+    ("chemistry", ("chemistry",)),
+    ("biology", ("biology",)),
+    ("it", ("it unit",)),
+    ("business", ("business",)),
+    ("economics", ("econ",)),
+    ("accounting", ("account",)),
+    ("psychology", ("psychology",)),
+    ("law", ("law",)),
+    ("math", ("math", "mechanics", "statistics", "pure", "decision", "further")),
+]
+# Display order of the shop filter buttons
+CATEGORIES = ["math", "physics", "chemistry", "biology", "it", "business", "economics", "accounting", "psychology", "law"]
+
+
+def categories(name):
+    """Every shop category an item name belongs to, e.g. 'Physics Mechanics' -> {'physics', 'math'}."""
+    name = (name or "").lower()
+    found = frozenset(category for category, keywords in CATEGORY_RULES
+                      if any(keyword in name for keyword in keywords))
+    return found or frozenset(("other",))
+
+
+def categorize(name):
+    """Returns the primary shop category for an item name, e.g. 'Pure Maths 1' -> 'math'."""
+    name = (name or "").lower()
+    for category, keywords in CATEGORY_RULES:
+        if any(keyword in name for keyword in keywords):
+            return category
+    return "other"
+
+
+def slugify(text):
+    """Converts 'Pure Maths 1' into 'pure-maths-1' for SEO URLs"""
+    text = text.lower().strip()
+    text = re.sub(r'[^a-z0-9\s-]', '', text)
+    text = re.sub(r'[\s-]+', '-', text)
+    return text
+
+
 def calculate_total_price(item_obj, design_type, selected_years):
     """
     Calculates the total price of an item based on selected years (total pages) and design type.
     
     Args:
-        item_obj (items): The SQLAlchemy items object containing years_available (dict).
+        item_obj (items): The items object (or catalog entry) exposing years_available (dict).
         design_type (str): The cover type selected ("normal", "custom", etc.).
         selected_years (list): A list of year strings selected by the user.
         
@@ -11,55 +67,32 @@ def calculate_total_price(item_obj, design_type, selected_years):
         float: The calculated total price.
     """
     
-    # item_obj.years_available is the dictionary: {'year': page_count, ...}
+    # item_obj.years_available is built from the item_years rows: {'year': page_count, ...}
+    # Page counts are stored as integers, so no per-year conversion is needed.
     available_years_data = item_obj.years_available
 
-    total_pages = 0
+    # 1. Calculate total pages (years missing from the item are skipped)
+    total_pages = sum(available_years_data.get(year, 0) for year in selected_years)
 
-    # 1. Calculate total pages
-    for year in selected_years:
-        # Use .get(year, 0) to safely retrieve page count, defaulting to 0 if the year key is missing
-        page_count = available_years_data.get(year)
-        
-        # Defensive check for None (addresses the previous TypeError)
-        if page_count is None:
-            # You can raise an error here or skip the year. Skipping is safer.
-            print(f"Warning: Page count for year {year} is missing in available data. Skipping.")
-            continue
-            
-        if not isinstance(page_count, int):
-            # Ensure page_count is an integer before adding it
-            try:
-                page_count = int(page_count)
-            except ValueError:
-                print(f"Error: Page count for year {year} is not a valid number: {page_count}. Skipping.")
-                continue
-
-        total_pages += page_count
-
-
-    # 2. Define base costs
-    base_cost = {
-        "normal": 200,
-        "custom": 500,
-        "minimalistic": 80
-    }
-
-    # 3. Determine design cost
-    # Convert design_type to lowercase to make the lookup case-insensitive
-    design_type_lower = design_type.lower()
-    
-    # If the design type is not recognized, default to "normal" cost
-    design_cost = base_cost.get(design_type_lower, base_cost["normal"]) 
 
-    # 4. Calculate final price
-    price_per_page = 5.0
-    binding_price = 400.0
-    
-    total_price = (total_pages * price_per_page) + design_cost + binding_price
+    # 2. Apply the shared pricing formula
+    return price_for_pages(total_pages, design_type)
+
 
-    # Return the total price as a float
-    return total_price
+def price_for_pages(total_pages, design_type):
+    """
+    Applies the shop pricing formula: (Total Pages * 5) + 400 + CoverCost.
+
+    Args:
+        total_pages (int): The number of printed pages in the book.
+        design_type (str): The cover type selected, matched case-insensitively.
+
+    Returns:
+        float: The calculated total price.
+    """
+    # If the design type is not recognized, default to "normal" cost
+    design_cost = COVER_COSTS.get((design_type or "").lower(), COVER_COSTS["normal"])
+    return (total_pages * PRICE_PER_PAGE) + design_cost + BINDING_PRICE
 
 # The following functions were commented out in your original code. 
 # They are not needed if you are using Flask-SQLAlchemy for database operations.
@@ -0,0 +1,235 @@
+import os
+import queue
+import re
+import threading
+
+from flask import url_for
+from markupsafe import Markup, escape
+
+from outbox import serverless
+
+# Widths (px) offered in srcset for each place a cover is shown, and the matching `sizes`
+CARD_WIDTHS = (300, 600)
+CARD_SIZES = "(max-width: 360px) 100vw, 320px"
+DETAIL_WIDTHS = (600, 900, 1200)
+DETAIL_SIZES = "(max-width: 768px) 100vw, 50vw"
+THUMB_WIDTHS = (80, 160)
+THUMB_SIZES = "80px"
+
+WEBP_QUALITY = int(os.getenv('WEBP_QUALITY', '80'))
+# Resized local covers are written under static/, next to the originals they come from
+DERIVED_DIR = 'derived'
+# Requests never resize. Missing derivatives are built by a background thread
+# ('background') or only by `flask images-build` ('cli'), which is the only
+# option on serverless: the filesystem is read-only and threads don't outlive
+# the response, so run it before deploying.
+IMAGE_BUILD = os.getenv('IMAGE_BUILD') or ('cli' if serverless() else 'background')
+
+# .../image/upload/[transformations/][v123/]public_id; our resize goes right before the version
+CLOUDINARY_UPLOAD = re.compile(r'^(https?://res\.cloudinary\.com/[^/]+/image/upload/)(.*)$')
+CLOUDINARY_VERSION = re.compile(r'(^|/)(v\d+/)')
+
+_static_folder = None
+_locks = {}
+_locks_guard = threading.Lock()
+# (filename, source mtime, width) that Pillow couldn't build; a new mtime retries
+_failed = set()
+_pending = set()
+_queue = queue.Queue()
+_worker = None
+
+
+def cloudinary_url(url, width):
+    """Width-limited, auto-format, auto-quality delivery URL for a Cloudinary upload (no API call)."""
+    match = CLOUDINARY_UPLOAD.match(url)
+    if not match:
+        return None
+    base, rest = match.groups()
+    step = f'w_{width},c_limit,f_auto,q_auto/'
+    version = CLOUDINARY_VERSION.search(rest)
+    if version:
+        # Keep any transformations already in the URL ahead of the resize
+        at = version.start(2)
+        return base + rest[:at] + step + rest[at:]
+    return base + step + rest
+
+
+def _lock_for(path):
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def derived_name(filename, width):
+    """static/-relative name of the WebP derivative of a static/ image at `width`."""
+    stem = os.path.splitext(filename.replace('\\', '/'))[0].replace('/', '__')
+    return f'{DERIVED_DIR}/{stem}-{width}.webp'
+
+
+def _source(filename):
+    if _static_folder is None:
+        return None
+    source = os.path.normpath(os.path.join(_static_folder, filename))
+    if not source.startswith(os.path.join(_static_folder, '')):
+        return None
+    return source
+
+
+def build_variant(filename, width):
+    """Writes the resized WebP copy of a static/ image unless it is fresh; returns its name or None.
+
+    Failures (no Pillow, unreadable source, read-only static/) are remembered
+    per (file, mtime, width), so the same file isn't retried until it changes.
+    """
+    source = _source(filename)
+    if source is None:
+        return None
+    name = derived_name(filename, width)
+    target = os.path.join(_static_folder, name)
+    try:
+        source_mtime = os.path.getmtime(source)
+    except OSError:
+        return None
+    key = (filename, source_mtime, width)
+    if key in _failed:
+        return None
+    with _lock_for(target):
+        if os.path.exists(target) and os.path.getmtime(target) >= source_mtime:
+            return name
+        try:
+            from PIL import Image
+        except ImportError:
+            _failed.add(key)
+            return None
+        try:
+            with Image.open(source) as image:
+                image.thumbnail((width, width * 4))
+                if image.mode not in ('RGB', 'RGBA'):
+                    image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                partial = f'{target}.{os.getpid()}.tmp'
+                image.save(partial, 'WEBP', quality=WEBP_QUALITY, method=4)
+            os.replace(partial, target)
+        except OSError as e:
+            print(f"Image derivative failed for {filename} at {width}px: {e}")
+            _failed.add(key)
+            return None
+    return name
+
+
+def _worker_loop():
+    while True:
+        filename, width = _queue.get()
+        try:
+            built = build_variant(filename, width)
+        except Exception as e:
+            print(f"Image worker error for {filename} at {width}px: {e}")
+            built = None
+        finally:
+            with _locks_guard:
+                _pending.discard((filename, width))
+            _queue.task_done()
+        if built and _queue.empty():
+            # Pages rendered while this was missing fell back to the original; re-render them
+            import pagecache
+            pagecache.clear()
+
+
+def _schedule(filename, width):
+    global _worker
+    with _locks_guard:
+        if (filename, width) in _pending:
+            return
+        _pending.add((filename, width))
+        if _worker is None:
+            _worker = threading.Thread(target=_worker_loop, name="image-derivatives", daemon=True)
+            _worker.start()
+    _queue.put((filename, width))
+
+
+def wait_for_builds():
+    """Blocks until every queued derivative has been attempted (CLI and test use)."""
+    _queue.join()
+
+
+def local_variant(filename, width):
+    """static/-relative name of a resized WebP copy of a static/ image, or None if it isn't built yet.
+
+    Never resizes in the request: a missing or stale copy is queued for the
+    background builder (IMAGE_BUILD=background) and the caller falls back to
+    the original meanwhile.
+    """
+    source = _source(filename)
+    if source is None:
+        return None
+    name = derived_name(filename, width)
+    target = os.path.join(_static_folder, name)
+    try:
+        source_mtime = os.path.getmtime(source)
+    except OSError:
+        return None
+    if os.path.exists(target) and os.path.getmtime(target) >= source_mtime:
+        return name
+    if IMAGE_BUILD == 'background' and (filename, source_mtime, width) not in _failed:
+        _schedule(filename, width)
+    return None
+
+
+def variant_url(img, width):
+    """URL of `img` scaled to `width`, or None if it can't be resized (other hosts, missing file)."""
+    if not img:
+        return None
+    if img.startswith('http'):
+        return cloudinary_url(img, width)
+    name = local_variant(img, width)
+    return url_for('static', filename=name) if name else None
+
+
+def original_url(img):
+    return img if img.startswith('http') else url_for('static', filename=img)
+
+
+def image_attrs(img, widths=CARD_WIDTHS, sizes=CARD_SIZES):
+    """src/srcset/sizes attributes for an <img> showing a catalog cover.
+
+    src is the smallest variant so old browsers still save bytes; images that
+    can't be resized keep their original URL and get no srcset.
+    """
+    img = img or ''
+    candidates = [(url, width) for width in widths for url in [variant_url(img, width)] if url]
+    if not candidates:
+        return Markup(f'src="{escape(original_url(img))}"')
+    srcset = ', '.join(f'{url} {width}w' for url, width in candidates)
+    return Markup(f'src="{escape(candidates[0][0])}" srcset="{escape(srcset)}" sizes="{escape(sizes)}"')
+
+
+def build_all(entries, widths=CARD_WIDTHS + DETAIL_WIDTHS + THUMB_WIDTHS):
+    """Pre-builds local derivatives for catalog entries; returns (built or fresh, skipped)."""
+    built = skipped = 0
+    for entry in entries:
+        if not entry.img or entry.img.startswith('http'):
+            continue
+        for width in sorted(set(widths)):
+            if build_variant(entry.img, width):
+                built += 1
+            else:
+                skipped += 1
+    return built, skipped
+
+
+def init_app(app):
+    global _static_folder
+    _static_folder = os.path.abspath(app.static_folder)
+    app.jinja_env.globals.update(
+        image_attrs=image_attrs,
+        CARD_WIDTHS=CARD_WIDTHS, CARD_SIZES=CARD_SIZES,
+        DETAIL_WIDTHS=DETAIL_WIDTHS, DETAIL_SIZES=DETAIL_SIZES,
+        THUMB_WIDTHS=THUMB_WIDTHS, THUMB_SIZES=THUMB_SIZES,
+    )
+
+    @app.cli.command("images-build")
+    def images_build_command():
+        """Build the resized WebP copies of every local (static/) catalog cover ahead of traffic."""
+        import click
+        import catalog
+        built, skipped = build_all(catalog.get_catalog())
+        click.echo(f"{built} image derivatives ready, {skipped} could not be built.")
@@ -0,0 +1,159 @@
+import gzip
+import io
+import json
+import time
+import zlib
+from collections import defaultdict
+
+from models import db, items, item_years
+
+# Entries resolved and written per round trip
+SYNC_BATCH_SIZE = 1000
+
+PLACEHOLDER_IMG = "https://placehold.co/400x600?text=No+Image"
+
+# What reading a corrupt or truncated gzip body, or bytes that aren't UTF-8, can raise
+UNREADABLE_BODY = (OSError, EOFError, zlib.error, UnicodeDecodeError)
+
+
+class SyncError(ValueError):
+    """Raised for malformed sync payloads; reported back as a 400."""
+
+
+def _open_body(request):
+    stream = request.stream
+    if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    return stream
+
+
+def iter_entries(request):
+    """Yields payload entries from a JSON list or an NDJSON stream, optionally gzip-encoded."""
+    body = _open_body(request)
+    mimetype = request.mimetype or ''
+    if mimetype in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        lines = enumerate(io.TextIOWrapper(body, encoding='utf-8'), start=1)
+        while True:
+            try:
+                line_no, line = next(lines)
+            except StopIteration:
+                return
+            except UNREADABLE_BODY:
+                raise SyncError('Unreadable request body (bad gzip or not UTF-8)')
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                raise SyncError(f'Invalid JSON on line {line_no}')
+            yield entry
+    try:
+        data = json.load(body)
+    except UNREADABLE_BODY + (ValueError,):
+        raise SyncError('Invalid JSON body')
+    if not isinstance(data, list):
+        raise SyncError('Expected a list of items')
+    yield from data
+
+
+def iter_batches(entries, batch_size=SYNC_BATCH_SIZE):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _year_rows(item_id, years_data):
+    rows = []
+    for order, year_key in enumerate(sorted(years_data)):
+        try:
+            pages = int(years_data[year_key])
+        except (TypeError, ValueError):
+            pages = 0
+        rows.append({'item_id': item_id, 'year_key': year_key, 'sort_order': order, 'pages': pages})
+    return rows
+
+
+class InventorySync:
+    """Set-based upsert of {name, years} entries into items/item_years."""
+
+    def __init__(self):
+        self.updated = 0
+        self.created = 0
+        self.skipped = 0
+        self.timings = defaultdict(float)
+
+    def _timed(self, phase, started):
+        now = time.perf_counter()
+        self.timings[phase] += now - started
+        return now
+
+    def apply_batch(self, batch):
+        started = time.perf_counter()
+
+        # Last entry wins when a name repeats within the batch
+        wanted = {}
+        for entry in batch:
+            if not isinstance(entry, dict):
+                self.skipped += 1
+                continue
+            item_name = entry.get('name')
+            new_years_data = entry.get('years')
+            if not item_name or not new_years_data or not isinstance(new_years_data, dict):
+                self.skipped += 1
+                continue
+            wanted[item_name.lower()] = (item_name, new_years_data)
+        if not wanted:
+            return
+        started = self._timed('parse', started)
+
+        existing = {}
+        rows = db.session.execute(
+            db.select(items.id, items.name_lower).where(items.name_lower.in_(list(wanted))).order_by(items.id)
+        ).all()
+        for item_id, name_lower in rows:
+            existing.setdefault(name_lower, item_id)
+        started = self._timed('resolve', started)
+
+        new_entries = [
+            {'name': name, 'name_lower': key, 'img': PLACEHOLDER_IMG}
+            for key, (name, _) in wanted.items() if key not in existing
+        ]
+        if new_entries:
+            inserted = db.session.execute(db.insert(items).returning(items.id, items.name_lower), new_entries).all()
+            for item_id, name_lower in inserted:
+                existing[name_lower] = item_id
+            self.created += len(new_entries)
+        self.updated += len(wanted) - len(new_entries)
+        started = self._timed('insert_items', started)
+
+        item_ids = [existing[key] for key in wanted]
+        db.session.execute(db.delete(item_years).where(item_years.item_id.in_(item_ids)))
+        year_rows = []
+        for key, (_, years_data) in wanted.items():
+            year_rows.extend(_year_rows(existing[key], years_data))
+        if year_rows:
+            db.session.execute(db.insert(item_years), year_rows)
+        self._timed('write_years', started)
+
+    def run(self, entries):
+        batches = iter_batches(entries)
+        started = time.perf_counter()
+        for batch in batches:
+            # Time spent pulling the batch off the (possibly gzipped) request stream
+            self._timed('read', started)
+            self.apply_batch(batch)
+            started = time.perf_counter()
+        started = self._timed('read', started)
+        db.session.commit()
+        # Rows were written with Core statements; drop any stale ORM copies
+        db.session.expire_all()
+        self._timed('commit', started)
+
+    def timings_ms(self):
+        return {phase: round(seconds * 1000, 2) for phase, seconds in self.timings.items()}
@@ -0,0 +1,169 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+import catalog
+
+# Score needed for a cart command / search fallback to accept a fuzzy name match
+MATCH_THRESHOLD = 0.75
+# A fuzzy match must beat the runner-up by this much, otherwise it is ambiguous
+MATCH_MARGIN = 0.05
+# Minimum edit similarity for a misspelled word to count as a match. Candidates
+# come from the trigram index, so only words sharing a trigram are compared.
+FUZZY_THRESHOLD = 0.75
+
+# Spellings folded to one canonical word, applied to item names and queries alike
+SYNONYMS = {
+    "maths": "math", "mathematics": "math",
+    "chem": "chemistry", "phys": "physics", "bio": "biology",
+    "econ": "economics", "economic": "economics", "eco": "economics",
+    "stats": "statistics", "stat": "statistics", "mech": "mechanics",
+    "acc": "accounting", "accounts": "accounting", "psych": "psychology",
+    "units": "unit", "u": "unit",
+}
+# Paper codes written glued to their number: "U2", "P1", "FP3", "M1", "S2", "D1"
+PAPER_CODES = {
+    "u": ("unit",),
+    "unit": ("unit",),
+    "p": ("pure", "math"),
+    "fp": ("further", "pure", "math"),
+    "m": ("mechanics",),
+    "s": ("statistics",),
+    "d": ("decision",),
+}
+
+_word_re = re.compile(r"[a-z0-9]+")
+_code_re = re.compile(r"^([a-z]+)(\d+)$")
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def name_tokens(text):
+    """'Physics U2' -> ['physics', 'unit', '2']; 'Pure Maths 1' -> ['pure', 'math', '1']"""
+    tokens = []
+    for word in _word_re.findall((text or "").lower()):
+        code = _code_re.match(word)
+        if code:
+            prefix, number = code.groups()
+            tokens.extend(PAPER_CODES.get(prefix, (SYNONYMS.get(prefix, prefix),)))
+            tokens.append(str(int(number)))
+        elif word.isdigit():
+            tokens.append(str(int(word)))
+        else:
+            tokens.append(SYNONYMS.get(word, word))
+    return tokens
+
+
+def name_key(text):
+    return " ".join(name_tokens(text))
+
+
+class ItemNameMatcher:
+    """Normalized-name, token and trigram index over item names for one catalog version."""
+
+    def __init__(self, snapshot):
+        self.version = snapshot.version
+        self.entries = snapshot.items
+        self.exact = {}
+        self.tokens = []
+        self.numbers = []
+        self.postings = defaultdict(set)
+        self.numberless = set()
+        for pos, entry in enumerate(self.entries):
+            tokens = name_tokens(entry.name)
+            self.exact.setdefault(" ".join(tokens), pos)
+            self.tokens.append(frozenset(tokens))
+            numbers = frozenset(t for t in tokens if t.isdigit())
+            self.numbers.append(numbers)
+            if not numbers:
+                self.numberless.add(pos)
+            for token in tokens:
+                self.postings[token].add(pos)
+        self.vocabulary = sorted(t for t in self.postings if not t.isdigit())
+        self.gram_words = defaultdict(set)
+        for word in self.vocabulary:
+            for gram in trigrams(word):
+                self.gram_words[gram].add(word)
+
+    def _word_matches(self, token):
+        """{vocabulary word: weight} for one query word: exact, then prefix, then edit similarity."""
+        if token in self.postings:
+            return {token: 1.0}
+        if len(token) < 3:
+            return {}
+        lo = bisect_left(self.vocabulary, token)
+        hi = bisect_left(self.vocabulary, token + "\x7f")
+        if lo < hi:
+            return {word: 0.9 for word in self.vocabulary[lo:hi]}
+        candidates = set()
+        for gram in trigrams(token):
+            candidates |= self.gram_words.get(gram, set())
+        matches = {}
+        for word in candidates:
+            score = SequenceMatcher(None, token, word).ratio()
+            if score >= FUZZY_THRESHOLD:
+                matches[word] = score
+        return matches
+
+    def rank(self, query, limit=5, threshold=MATCH_THRESHOLD):
+        """Returns [(score, entry)] best first. Numbers must agree exactly: Unit 2 never matches Unit 3."""
+        tokens = name_tokens(query)
+        if not tokens:
+            return []
+        pos = self.exact.get(" ".join(tokens))
+        if pos is not None:
+            return [(1.0, self.entries[pos])]
+
+        numbers = frozenset(t for t in tokens if t.isdigit())
+        if numbers:
+            candidates = set.intersection(*(self.postings.get(n, set()) for n in numbers))
+        else:
+            candidates = self.numberless
+        if not candidates:
+            return []
+
+        words = [t for t in tokens if not t.isdigit()]
+        word_matches = [self._word_matches(word) for word in words]
+        scored = []
+        for pos in candidates:
+            if self.numbers[pos] != numbers:
+                continue
+            name = self.tokens[pos]
+            matched = len(numbers)
+            for matches in word_matches:
+                matched += max((weight for word, weight in matches.items() if word in name), default=0.0)
+            score = 2 * matched / (len(set(tokens)) + len(name))
+            if score >= threshold:
+                scored.append((score, pos))
+        scored.sort(key=lambda pair: (-pair[0], pair[1]))
+        return [(score, self.entries[pos]) for score, pos in scored[:limit]]
+
+    def match(self, query):
+        """The single best entry for a possibly misspelled name, or None if nothing is close or it's a tie."""
+        ranked = self.rank(query, limit=2)
+        if not ranked:
+            return None
+        if len(ranked) > 1 and ranked[0][0] - ranked[1][0] < MATCH_MARGIN:
+            return None
+        return ranked[0][1]
+
+
+_lock = threading.Lock()
+_matcher = None
+
+
+def get_matcher():
+    """Returns the ItemNameMatcher for the current catalog version."""
+    global _matcher
+    snapshot = catalog.get_catalog()
+    matcher = _matcher
+    if matcher is not None and matcher.version == snapshot.version:
+        return matcher
+    with _lock:
+        if _matcher is None or _matcher.version != snapshot.version:
+            _matcher = ItemNameMatcher(snapshot)
+        return _matcher
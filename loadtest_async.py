@@ -0,0 +1,146 @@
+"""Load test: concurrent /api/chat calls against one sync Flask worker vs. one ASGI worker.
+
+Usage:
+    python loadtest_async.py [--requests 100] [--concurrency 50] [--latency 0.5]
+
+Starts a local stub of the Groq chat completions API that sleeps --latency
+seconds per call, then runs the app twice against it on a free port:
+
+    wsgi  one single-threaded Werkzeug worker (like a gunicorn sync worker)
+    asgi  one uvicorn worker running asgi:app
+
+Every message is unique, so neither the local fast path nor the response cache
+answers it. "in flight" is the average number of upstream calls a worker held
+at once: completed * latency / wall time.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+WSGI_SERVER = ("from werkzeug.serving import run_simple; from app import app; "
+               "run_simple('127.0.0.1', {port}, app, threaded=False)")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def stub_groq(latency, port):
+    """Minimal OpenAI-compatible chat endpoint: waits `latency` seconds, then answers."""
+
+    async def handle(reader, writer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            await asyncio.sleep(latency)
+            body = json.dumps({
+                "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": "stub",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "Stub answer."}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }).encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                         b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", port, backlog=1024)
+
+
+def start_app(mode, port, groq_port):
+    env = dict(os.environ, GROQ_API_KEY="stub", GROQ_BASE_URL=f"http://127.0.0.1:{groq_port}",
+               SECRET_KEY=os.getenv("SECRET_KEY", "loadtest"), GROQ_FAILURE_THRESHOLD="1000000")
+    if mode == "wsgi":
+        cmd = [sys.executable, "-c", WSGI_SERVER.format(port=port)]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "asgi:app", "--port", str(port), "--workers", "1",
+               "--log-level", "warning", "--backlog", "1024"]
+    return subprocess.Popen(cmd, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as http:
+        while time.monotonic() < deadline:
+            try:
+                await http.get(f"http://127.0.0.1:{port}/robots.txt")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"app on port {port} did not start")
+
+
+async def drive(port, total, concurrency):
+    gate = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=300) as http:
+        async def one(i):
+            nonlocal errors
+            async with gate:
+                started = time.perf_counter()
+                try:
+                    response = await http.post(f"http://127.0.0.1:{port}/api/chat",
+                                               json={"message": f"tell me a fun fact #{i} {time.time()}"})
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+                except httpx.HTTPError:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return time.perf_counter() - started, latencies, errors
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds the stub Groq waits per call")
+    parser.add_argument("--modes", default="wsgi,asgi")
+    args = parser.parse_args()
+
+    groq_port = free_port()
+    stub = await stub_groq(args.latency, groq_port)
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent, upstream latency {args.latency * 1000:.0f} ms")
+    print(f"{'mode':<5} | {'wall s':>7} | {'req/s':>7} | {'p50 ms':>8} | {'p95 ms':>8} | {'in flight':>9} | errors")
+    print("-" * 68)
+    for mode in args.modes.split(","):
+        port = free_port()
+        process = start_app(mode, port, groq_port)
+        try:
+            await wait_ready(port)
+            wall, latencies, errors = await drive(port, args.requests, args.concurrency)
+        finally:
+            process.terminate()
+            process.wait()
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000 if latencies else 0
+        p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0
+        in_flight = len(latencies) * args.latency / wall
+        print(f"{mode:<5} | {wall:7.2f} | {len(latencies) / wall:7.1f} | {p50:8.0f} | {p95:8.0f} | "
+              f"{in_flight:9.1f} | {errors}")
+
+    stub.close()
+    await stub.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,177 @@
+"""Concurrency test: parallel checkouts of the same cart must place exactly one order.
+
+Usage:
+    python loadtest_checkout.py [--parallel 16] [--rounds 5]
+    python loadtest_checkout.py --database-url postgresql://.../scratch   # a throwaway database only
+
+Serves the app from a threaded Werkzeug server on a free port and, for each
+round, fills one user's cart and releases --parallel POST /Checkout requests
+at the same instant:
+
+    same key   every request carries the same checkout_key (a double-click or retry)
+    new keys   every request has its own key (the same cart open in several tabs)
+
+Either way there must be exactly one order, with one order_lines row per cart
+row, an empty cart, and matching sales rollups. With the same key every
+request must also report that one order's id. Exits 1 on any violation.
+WhatsApp workers are disabled, so nothing is sent.
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import uuid
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--parallel", type=int, default=16)
+parser.add_argument("--rounds", type=int, default=5)
+parser.add_argument("--lines", type=int, default=3, help="cart rows per round")
+parser.add_argument("--database-url", help="scratch database (tables are created and emptied); default: temp SQLite")
+args = parser.parse_args()
+
+# The app reads these at import time
+_db_path = None
+if args.database_url:
+    os.environ["DATABASE_URL"] = args.database_url
+else:
+    _db_path = os.path.join(tempfile.mkdtemp(), "checkout.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ.setdefault("SECRET_KEY", "loadtest-checkout")
+os.environ["WABOT_WORKERS"] = "0"
+
+import requests  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+
+from app import app  # noqa: E402
+from models import db, items, users, cart, orders, order_lines, sales_daily, sales_daily_items  # noqa: E402
+
+ORDER_ID = re.compile(r"Order ID: <strong>#(\d+)</strong>")
+YEARS = {"2019 Jan": 10, "2020 Oct": 12, "2021 Jun": 8}
+
+
+def seed():
+    db.create_all()
+    for model in (sales_daily_items, sales_daily, order_lines, orders, cart):
+        db.session.execute(db.delete(model))
+    user = db.session.execute(db.select(users).filter_by(email="loadtest@example.com")).scalar_one_or_none()
+    if user is None:
+        user = users(name="loadtest", password=generate_password_hash("loadtest"), email="loadtest@example.com",
+                     school="s", level="AS", number="94000000", address="a", town="t")
+        db.session.add(user)
+    item = db.session.execute(db.select(items).filter_by(name_lower="loadtest paper")).scalar_one_or_none()
+    if item is None:
+        item = items(name="Loadtest Paper", img="x.png", years_available=YEARS)
+        db.session.add(item)
+    db.session.commit()
+    return user.id, item.id
+
+
+def fill_cart(user_id, item_id, lines):
+    db.session.execute(db.insert(cart), [{
+        "user_id": user_id, "original_item_id": item_id, "start_year": "2019 Jan", "end_year": "2021 Jun",
+        "pages": 30, "design_type": "Normal", "price": 750.0,
+    } for _ in range(lines)])
+    db.session.commit()
+    return [str(cart_id) for cart_id in db.session.execute(db.select(cart.id).where(cart.user_id == user_id)).scalars()]
+
+
+def fire(base_url, sessions, cart_ids, keys):
+    """Posts one checkout per session, all released together; returns (status, order id or None) per request."""
+    barrier = threading.Barrier(len(sessions))
+    results = [None] * len(sessions)
+
+    def one(index):
+        barrier.wait()
+        try:
+            response = sessions[index].post(f"{base_url}/Checkout", allow_redirects=False, timeout=60, data={
+                "selected_cart_ids": cart_ids, "checkout_key": keys[index], "user_comments": "",
+            })
+            match = ORDER_ID.search(response.text)
+            results[index] = (response.status_code, int(match.group(1)) if match else None)
+        except requests.RequestException as e:
+            results[index] = (type(e).__name__, None)
+
+    threads = [threading.Thread(target=one, args=(index,)) for index in range(len(sessions))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def check(round_no, mode, results, user_id, lines):
+    problems = []
+    with app.app_context():
+        placed = db.session.execute(db.select(orders).where(orders.user_id == user_id)).scalars().all()
+        placed = [order for order in placed if order.id not in check.seen]
+        check.seen.update(order.id for order in placed)
+        left = db.session.execute(db.select(db.func.count()).select_from(cart).where(cart.user_id == user_id)).scalar()
+        line_count = db.session.execute(db.select(db.func.count()).select_from(order_lines).where(
+            order_lines.order_id.in_([order.id for order in placed]))).scalar() if placed else 0
+        rolled_up = db.session.execute(db.select(db.func.coalesce(db.func.sum(sales_daily.order_count), 0))).scalar()
+    if len(placed) != 1:
+        problems.append(f"{len(placed)} orders placed")
+    if left:
+        problems.append(f"{left} cart rows left")
+    if line_count != lines:
+        problems.append(f"{line_count} order lines for {lines} cart rows")
+    if rolled_up != len(check.seen):
+        problems.append(f"rollups count {rolled_up} orders, table has {len(check.seen)}")
+    if mode == "same key" and len(placed) == 1 and any(order_id != placed[0].id for _status, order_id in results):
+        problems.append(f"not every response showed order #{placed[0].id}")
+    errors = [status for status, _order_id in results if status not in (200, 302)]
+    if errors:
+        problems.append(f"failed requests: {errors}")
+    statuses = {}
+    for status, order_id in results:
+        label = f"{status} order" if order_id else f"{status}"
+        statuses[label] = statuses.get(label, 0) + 1
+    summary = ", ".join(f"{n}x {label}" for label, n in sorted(statuses.items()))
+    print(f"{'FAIL' if problems else 'ok':<4}  round {round_no} {mode:<8}  {summary}")
+    for problem in problems:
+        print(f"        {problem}")
+    return not problems
+
+
+check.seen = set()
+
+
+def main():
+    with app.app_context():
+        user_id, item_id = seed()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    sessions = []
+    for _ in range(args.parallel):
+        session = requests.Session()
+        session.post(f"{base_url}/Login", data={"Email": "loadtest@example.com", "Password": "loadtest"})
+        sessions.append(session)
+
+    print(f"{args.parallel} parallel checkouts per round, {args.lines} cart rows, {args.rounds} rounds per mode")
+    ok = True
+    for round_no in range(1, args.rounds + 1):
+        for mode in ("same key", "new keys"):
+            with app.app_context():
+                cart_ids = fill_cart(user_id, item_id, args.lines)
+            shared = uuid.uuid4().hex
+            keys = [shared if mode == "same key" else uuid.uuid4().hex for _ in sessions]
+            results = fire(base_url, sessions, cart_ids, keys)
+            ok &= check(round_no, mode, results, user_id, args.lines)
+
+    server.shutdown()
+    if _db_path:
+        os.remove(_db_path)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
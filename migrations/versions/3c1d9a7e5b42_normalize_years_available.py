@@ -0,0 +1,178 @@
+"""Normalize years_available into item_years, cart pickles to JSON
+
+Revision ID: 3c1d9a7e5b42
+Revises: 6b0f83bc9917
+Create Date: 2026-10-18 09:12:40.481532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1d9a7e5b42'
+down_revision = '6b0f83bc9917'
+branch_labels = None
+depends_on = None
+
+# Rows converted per round trip during the backfill
+BATCH_SIZE = 500
+
+items_table = sa.table(
+    'items',
+    sa.column('id', sa.Integer),
+    sa.column('years_available', sa.PickleType),
+)
+
+item_years_table = sa.table(
+    'item_years',
+    sa.column('item_id', sa.Integer),
+    sa.column('year_key', sa.String),
+    sa.column('sort_order', sa.Integer),
+    sa.column('pages', sa.Integer),
+)
+
+cart_table = sa.table(
+    'cart',
+    sa.column('id', sa.Integer),
+    sa.column('years_available', sa.PickleType),
+    sa.column('selected_years', sa.PickleType),
+    sa.column('years_available_json', sa.JSON),
+    sa.column('selected_years_json', sa.JSON),
+)
+
+
+def _to_pages(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def iter_batches(conn, table, columns, batch_size=BATCH_SIZE):
+    """Keyset-paginates `table` by id so large tables never load in one go."""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(table.c.id, *columns)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def backfill_item_years(conn, batch_size=BATCH_SIZE):
+    converted = 0
+    for rows in iter_batches(conn, items_table, [items_table.c.years_available], batch_size):
+        year_rows = []
+        for item_id, years_available in rows:
+            for order, year_key in enumerate(sorted(years_available or {})):
+                year_rows.append({
+                    'item_id': item_id,
+                    'year_key': year_key,
+                    'sort_order': order,
+                    'pages': _to_pages(years_available[year_key]),
+                })
+        if year_rows:
+            conn.execute(item_years_table.insert(), year_rows)
+        converted += len(rows)
+    print(f"item_years backfill: converted {converted} items")
+
+
+def backfill_cart_json(conn, batch_size=BATCH_SIZE):
+    converted = 0
+    columns = [cart_table.c.years_available, cart_table.c.selected_years]
+    for rows in iter_batches(conn, cart_table, columns, batch_size):
+        for cart_id, years_available, selected_years in rows:
+            conn.execute(
+                cart_table.update()
+                .where(cart_table.c.id == cart_id)
+                .values(
+                    years_available_json={k: _to_pages(v) for k, v in (years_available or {}).items()},
+                    selected_years_json=list(selected_years or []),
+                )
+            )
+        converted += len(rows)
+    print(f"cart backfill: converted {converted} rows")
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    op.create_table('item_years',
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('year_key', sa.String(length=50), nullable=False),
+    sa.Column('sort_order', sa.Integer(), nullable=False),
+    sa.Column('pages', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['item_id'], ['items.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('item_id', 'year_key')
+    )
+    op.create_index('ix_item_years_item_id_sort_order', 'item_years', ['item_id', 'sort_order'], unique=False)
+    backfill_item_years(conn)
+
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.drop_column('years_available')
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('years_available_json', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('selected_years_json', sa.JSON(), nullable=True))
+    backfill_cart_json(conn)
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.drop_column('years_available')
+        batch_op.drop_column('selected_years')
+        batch_op.alter_column('years_available_json', new_column_name='years_available', existing_type=sa.JSON(), nullable=False)
+        batch_op.alter_column('selected_years_json', new_column_name='selected_years', existing_type=sa.JSON(), nullable=False)
+
+
+def downgrade():
+    conn = op.get_bind()
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.alter_column('years_available', new_column_name='years_available_json', existing_type=sa.JSON(), nullable=True)
+        batch_op.alter_column('selected_years', new_column_name='selected_years_json', existing_type=sa.JSON(), nullable=True)
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('years_available', sa.PickleType(), nullable=True))
+        batch_op.add_column(sa.Column('selected_years', sa.PickleType(), nullable=True))
+
+    columns = [cart_table.c.years_available_json, cart_table.c.selected_years_json]
+    for rows in iter_batches(conn, cart_table, columns):
+        for cart_id, years_available, selected_years in rows:
+            conn.execute(
+                cart_table.update()
+                .where(cart_table.c.id == cart_id)
+                .values(years_available=dict(years_available or {}), selected_years=list(selected_years or []))
+            )
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.drop_column('years_available_json')
+        batch_op.drop_column('selected_years_json')
+        batch_op.alter_column('years_available', existing_type=sa.PickleType(), nullable=False)
+        batch_op.alter_column('selected_years', existing_type=sa.PickleType(), nullable=False)
+
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('years_available', sa.PickleType(), nullable=True))
+
+    for rows in iter_batches(conn, items_table, []):
+        for (item_id,) in rows:
+            year_rows = conn.execute(
+                sa.select(item_years_table.c.year_key, item_years_table.c.pages)
+                .where(item_years_table.c.item_id == item_id)
+                .order_by(item_years_table.c.sort_order)
+            ).fetchall()
+            conn.execute(
+                items_table.update()
+                .where(items_table.c.id == item_id)
+                .values(years_available={year_key: pages for year_key, pages in year_rows})
+            )
+
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.alter_column('years_available', existing_type=sa.PickleType(), nullable=False)
+
+    op.drop_index('ix_item_years_item_id_sort_order', table_name='item_years')
+    op.drop_table('item_years')
@@ -0,0 +1,33 @@
+"""Add indexed items.name_lower for bulk inventory sync
+
+Revision ID: 8e4f2b6d1a93
+Revises: 3c1d9a7e5b42
+Create Date: 2026-10-18 10:05:17.302914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4f2b6d1a93'
+down_revision = '3c1d9a7e5b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('name_lower', sa.String(length=100), nullable=True))
+
+    op.execute("UPDATE items SET name_lower = lower(name)")
+
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.alter_column('name_lower', existing_type=sa.String(length=100), nullable=False)
+        batch_op.create_index(batch_op.f('ix_items_name_lower'), ['name_lower'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_items_name_lower'))
+        batch_op.drop_column('name_lower')
@@ -0,0 +1,29 @@
+"""Add orders.checkout_key for idempotent checkout
+
+Revision ID: a3e5f8c1d962
+Revises: f2c7b9d3a614
+Create Date: 2026-10-18 20:03:51.774219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3e5f8c1d962'
+down_revision = 'f2c7b9d3a614'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing orders keep NULL, which the unique index allows any number of
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('checkout_key', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_orders_checkout_key', ['checkout_key'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_checkout_key')
+        batch_op.drop_column('checkout_key')
@@ -0,0 +1,77 @@
+"""Drop items.category: shop filtering matches categories in memory
+
+Revision ID: a3e8c6f1d952
+Revises: f2c7d4a9b318
+Create Date: 2026-10-19 10:41:07.215839
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3e8c6f1d952'
+down_revision = 'f2c7d4a9b318'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+# Frozen copy of functions.CATEGORY_RULES, to refill the column on downgrade
+CATEGORY_RULES = [
+    ("physics", ("physics",)),
+    ("chemistry", ("chemistry",)),
+    ("biology", ("biology",)),
+    ("it", ("it unit",)),
+    ("business", ("business",)),
+    ("economics", ("econ",)),
+    ("accounting", ("account",)),
+    ("psychology", ("psychology",)),
+    ("law", ("law",)),
+    ("math", ("math", "mechanics", "statistics", "pure", "decision", "further")),
+]
+
+items_table = sa.table(
+    'items',
+    sa.column('id', sa.Integer),
+    sa.column('name', sa.String),
+    sa.column('category', sa.String),
+)
+
+
+def categorize(name):
+    name = (name or "").lower()
+    for category, keywords in CATEGORY_RULES:
+        if any(keyword in name for keyword in keywords):
+            return category
+    return "other"
+
+
+def upgrade():
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_items_category'))
+        batch_op.drop_column('category')
+
+
+def downgrade():
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('category', sa.String(length=30), nullable=True))
+
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(items_table.c.id, items_table.c.name)
+            .where(items_table.c.id > last_id)
+            .order_by(items_table.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        for item_id, name in rows:
+            conn.execute(items_table.update().where(items_table.c.id == item_id).values(category=categorize(name)))
+        last_id = rows[-1][0]
+
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.alter_column('category', existing_type=sa.String(length=30), nullable=False)
+        batch_op.create_index(batch_op.f('ix_items_category'), ['category'], unique=False)
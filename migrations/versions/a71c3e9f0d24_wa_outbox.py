@@ -0,0 +1,39 @@
+"""Add wa_outbox for queued WhatsApp notifications
+
+Revision ID: a71c3e9f0d24
+Revises: 8e4f2b6d1a93
+Create Date: 2026-10-18 11:20:44.918305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a71c3e9f0d24'
+down_revision = '8e4f2b6d1a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('wa_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('number', sa.String(length=20), nullable=False),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('wa_outbox', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_wa_outbox_status'), ['status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('wa_outbox', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_wa_outbox_status'))
+
+    op.drop_table('wa_outbox')
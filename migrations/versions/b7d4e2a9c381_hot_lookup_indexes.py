@@ -0,0 +1,36 @@
+"""Index the hot cart and order lookups
+
+Revision ID: b7d4e2a9c381
+Revises: e93b5a1c7d20
+Create Date: 2026-10-18 16:21:05.337190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d4e2a9c381'
+down_revision = 'e93b5a1c7d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_cart_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_orders_order_date'), ['order_date'], unique=False)
+        batch_op.create_index('ix_orders_user_id_order_date', ['user_id', 'order_date'], unique=False)
+        batch_op.create_index('ix_orders_status_order_date', ['status', 'order_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_status_order_date')
+        batch_op.drop_index('ix_orders_user_id_order_date')
+        batch_op.drop_index(batch_op.f('ix_orders_order_date'))
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_cart_user_id'))
@@ -0,0 +1,43 @@
+"""Add image_uploads for background Cloudinary uploads
+
+Revision ID: c8f1d3e6a527
+Revises: a3e5f8c1d962
+Create Date: 2026-10-18 20:41:17.306852
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8f1d3e6a527'
+down_revision = 'a3e5f8c1d962'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('image_uploads',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('spool_name', sa.String(length=100), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('secure_url', sa.String(length=300), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('image_uploads', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_image_uploads_item_id'), ['item_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_image_uploads_status'), ['status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('image_uploads', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_image_uploads_status'))
+        batch_op.drop_index(batch_op.f('ix_image_uploads_item_id'))
+
+    op.drop_table('image_uploads')
@@ -0,0 +1,39 @@
+"""Add daily sales rollup tables
+
+Revision ID: d4a8c6f1e257
+Revises: b7d4e2a9c381
+Create Date: 2026-10-18 18:05:37.221690
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a8c6f1e257'
+down_revision = 'b7d4e2a9c381'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Backfill afterwards with `flask sales-rebuild`
+    op.create_table('sales_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'status')
+    )
+    op.create_table('sales_daily_items',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'status', 'item_id')
+    )
+
+
+def downgrade():
+    op.drop_table('sales_daily_items')
+    op.drop_table('sales_daily')
@@ -0,0 +1,28 @@
+"""Add wa_outbox.claimed_at for claim-before-send delivery
+
+Revision ID: e5b9a2d7c143
+Revises: c8f1d3e6a527
+Create Date: 2026-10-18 22:14:36.481907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b9a2d7c143'
+down_revision = 'c8f1d3e6a527'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('wa_outbox', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    # Rows caught mid-send go back to pending so the next flush retries them
+    op.execute("UPDATE wa_outbox SET status = 'pending' WHERE status = 'sending'")
+    with op.batch_alter_table('wa_outbox', schema=None) as batch_op:
+        batch_op.drop_column('claimed_at')
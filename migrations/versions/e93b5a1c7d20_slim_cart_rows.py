@@ -0,0 +1,160 @@
+"""Slim cart rows to an item reference and a year range
+
+Revision ID: e93b5a1c7d20
+Revises: c52e7d8b4f16
+Create Date: 2026-10-18 15:40:12.904417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e93b5a1c7d20'
+down_revision = 'c52e7d8b4f16'
+branch_labels = None
+depends_on = None
+
+# Rows converted per round trip during the backfill
+BATCH_SIZE = 500
+
+cart_table = sa.table(
+    'cart',
+    sa.column('id', sa.Integer),
+    sa.column('original_item_id', sa.Integer),
+    sa.column('name', sa.String),
+    sa.column('img', sa.String),
+    sa.column('years_available', sa.JSON),
+    sa.column('selected_years', sa.JSON),
+    sa.column('start_year', sa.String),
+    sa.column('end_year', sa.String),
+    sa.column('pages', sa.Integer),
+)
+
+items_table = sa.table(
+    'items',
+    sa.column('id', sa.Integer),
+    sa.column('name', sa.String),
+    sa.column('img', sa.String),
+)
+
+item_years_table = sa.table(
+    'item_years',
+    sa.column('item_id', sa.Integer),
+    sa.column('year_key', sa.String),
+    sa.column('sort_order', sa.Integer),
+    sa.column('pages', sa.Integer),
+)
+
+
+def iter_batches(conn, table, columns, batch_size=BATCH_SIZE):
+    """Keyset-paginates `table` by id so large tables never load in one go."""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(table.c.id, *columns)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def _pages(years_available, selected_years):
+    total = 0
+    for year in selected_years:
+        try:
+            total += int((years_available or {}).get(year, 0))
+        except (TypeError, ValueError):
+            pass
+    return total
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('start_year', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('end_year', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('pages', sa.Integer(), nullable=True))
+
+    converted = 0
+    columns = [cart_table.c.years_available, cart_table.c.selected_years]
+    for rows in iter_batches(conn, cart_table, columns):
+        for cart_id, years_available, selected_years in rows:
+            selected_years = list(selected_years or []) or [""]
+            conn.execute(
+                cart_table.update()
+                .where(cart_table.c.id == cart_id)
+                .values(
+                    start_year=selected_years[0],
+                    end_year=selected_years[-1],
+                    pages=_pages(years_available, selected_years),
+                )
+            )
+        converted += len(rows)
+    print(f"cart backfill: converted {converted} rows")
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.alter_column('start_year', existing_type=sa.String(length=50), nullable=False)
+        batch_op.alter_column('end_year', existing_type=sa.String(length=50), nullable=False)
+        batch_op.alter_column('pages', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('name')
+        batch_op.drop_column('img')
+        batch_op.drop_column('years_available')
+        batch_op.drop_column('selected_years')
+
+
+def downgrade():
+    conn = op.get_bind()
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('name', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('img', sa.String(length=200), nullable=True))
+        batch_op.add_column(sa.Column('years_available', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('selected_years', sa.JSON(), nullable=True))
+
+    # Copy the display data back out of items/item_years, one item at a time
+    item_cache = {}
+    columns = [cart_table.c.original_item_id, cart_table.c.start_year, cart_table.c.end_year]
+    for rows in iter_batches(conn, cart_table, columns):
+        for cart_id, item_id, start_year, end_year in rows:
+            if item_id not in item_cache:
+                item = conn.execute(
+                    sa.select(items_table.c.name, items_table.c.img).where(items_table.c.id == item_id)
+                ).first()
+                year_rows = conn.execute(
+                    sa.select(item_years_table.c.year_key, item_years_table.c.pages)
+                    .where(item_years_table.c.item_id == item_id)
+                    .order_by(item_years_table.c.sort_order)
+                ).fetchall()
+                item_cache[item_id] = (item, [(key, pages) for key, pages in year_rows])
+            item, year_rows = item_cache[item_id]
+            keys = [key for key, _pages in year_rows]
+            if start_year in keys and end_year in keys:
+                s_idx, e_idx = sorted((keys.index(start_year), keys.index(end_year)))
+                selected_years = keys[s_idx:e_idx + 1]
+            else:
+                selected_years = list(dict.fromkeys([start_year, end_year]))
+            conn.execute(
+                cart_table.update()
+                .where(cart_table.c.id == cart_id)
+                .values(
+                    name=item.name if item else "Unavailable item",
+                    img=item.img if item else "",
+                    years_available=dict(year_rows),
+                    selected_years=selected_years,
+                )
+            )
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.alter_column('name', existing_type=sa.String(length=100), nullable=False)
+        batch_op.alter_column('img', existing_type=sa.String(length=200), nullable=False)
+        batch_op.alter_column('years_available', existing_type=sa.JSON(), nullable=False)
+        batch_op.alter_column('selected_years', existing_type=sa.JSON(), nullable=False)
+        batch_op.drop_column('start_year')
+        batch_op.drop_column('end_year')
+        batch_op.drop_column('pages')
@@ -0,0 +1,149 @@
+"""Add order_lines and backfill them from orders.order_items
+
+Revision ID: f2c7b9d3a614
+Revises: d4a8c6f1e257
+Create Date: 2026-10-18 19:12:08.530126
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c7b9d3a614'
+down_revision = 'd4a8c6f1e257'
+branch_labels = None
+depends_on = None
+
+# Orders parsed per round trip during the backfill
+BATCH_SIZE = 500
+
+# One "Name [Cover] (From-To)" entry of the comma-joined order_items text
+ORDER_LINE = re.compile(r'(.+?) \[([^\]]+)\] \(([^)]*)\)(?:, |$)')
+
+orders_table = sa.table(
+    'orders',
+    sa.column('id', sa.Integer),
+    sa.column('order_items', sa.Text),
+    sa.column('total_price', sa.Float),
+)
+
+items_table = sa.table(
+    'items',
+    sa.column('id', sa.Integer),
+    sa.column('name_lower', sa.String),
+)
+
+item_years_table = sa.table(
+    'item_years',
+    sa.column('item_id', sa.Integer),
+    sa.column('year_key', sa.String),
+    sa.column('sort_order', sa.Integer),
+    sa.column('pages', sa.Integer),
+)
+
+order_lines_table = sa.table(
+    'order_lines',
+    sa.column('order_id', sa.Integer),
+    sa.column('item_id', sa.Integer),
+    sa.column('start_key', sa.String),
+    sa.column('end_key', sa.String),
+    sa.column('cover', sa.String),
+    sa.column('pages', sa.Integer),
+    sa.column('price', sa.Float),
+)
+
+
+def iter_batches(conn, table, columns, batch_size=BATCH_SIZE):
+    """Keyset-paginates `table` by id so large tables never load in one go."""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(table.c.id, *columns)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def parse_lines(order_items):
+    """(name, cover, start_key, end_key) for each entry of an order_items string."""
+    lines = []
+    for name, cover, span in ORDER_LINE.findall(order_items or ''):
+        start_key, _, end_key = span.partition('-')
+        lines.append((name, cover, start_key.strip(), (end_key or start_key).strip()))
+    return lines
+
+
+def _pages(year_rows, start_key, end_key):
+    orders = {key: order for key, order, _pages in year_rows}
+    if start_key not in orders or end_key not in orders:
+        return 0
+    low, high = sorted((orders[start_key], orders[end_key]))
+    return sum(pages for _key, order, pages in year_rows if low <= order <= high)
+
+
+def upgrade():
+    op.create_table('order_lines',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=True),
+    sa.Column('start_key', sa.String(length=50), nullable=False),
+    sa.Column('end_key', sa.String(length=50), nullable=False),
+    sa.Column('cover', sa.String(length=50), nullable=False),
+    sa.Column('pages', sa.Integer(), nullable=False),
+    sa.Column('price', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('order_lines', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_lines_order_id'), ['order_id'], unique=False)
+        batch_op.create_index('ix_order_lines_item_id_order_id', ['item_id', 'order_id'], unique=False)
+
+    conn = op.get_bind()
+    item_ids = dict(conn.execute(sa.select(items_table.c.name_lower, items_table.c.id)).fetchall())
+    year_cache = {}
+    converted = unmatched = 0
+    columns = [orders_table.c.order_items, orders_table.c.total_price]
+    for rows in iter_batches(conn, orders_table, columns):
+        batch = []
+        for order_id, order_items, total_price in rows:
+            lines = parse_lines(order_items)
+            for name, cover, start_key, end_key in lines:
+                item_id = item_ids.get(name.lower())
+                if item_id is None:
+                    unmatched += 1
+                    pages = 0
+                else:
+                    if item_id not in year_cache:
+                        year_cache[item_id] = conn.execute(
+                            sa.select(item_years_table.c.year_key, item_years_table.c.sort_order,
+                                      item_years_table.c.pages)
+                            .where(item_years_table.c.item_id == item_id)
+                        ).fetchall()
+                    pages = _pages(year_cache[item_id], start_key, end_key)
+                batch.append({
+                    'order_id': order_id, 'item_id': item_id, 'start_key': start_key, 'end_key': end_key,
+                    'cover': cover, 'pages': pages,
+                    # The text never carried line prices; only a single-line order's total is exact
+                    'price': total_price if len(lines) == 1 else None,
+                })
+        if batch:
+            conn.execute(order_lines_table.insert(), batch)
+        converted += len(batch)
+    print(f"order_lines backfill: wrote {converted} lines, {unmatched} without a matching item")
+
+
+def downgrade():
+    # orders.order_items is still written at checkout, so nothing needs copying back
+    with op.batch_alter_table('order_lines', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_lines_item_id_order_id')
+        batch_op.drop_index(batch_op.f('ix_order_lines_order_id'))
+
+    op.drop_table('order_lines')
@@ -0,0 +1,28 @@
+"""Add image_uploads.claimed_at for claim-before-upload delivery
+
+Revision ID: f2c7d4a9b318
+Revises: e5b9a2d7c143
+Create Date: 2026-10-18 23:02:11.530214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c7d4a9b318'
+down_revision = 'e5b9a2d7c143'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('image_uploads', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    # Jobs caught mid-upload go back to pending so the next flush retries them
+    op.execute("UPDATE image_uploads SET status = 'pending' WHERE status = 'uploading'")
+    with op.batch_alter_table('image_uploads', schema=None) as batch_op:
+        batch_op.drop_column('claimed_at')
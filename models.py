@@ -7,9 +7,63 @@ db = SQLAlchemy()
 class items(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
+    name_lower = db.Column(db.String(100), nullable=False, index=True)
     img = db.Column(db.String(200), nullable=False)
-    years_available = db.Column(db.PickleType, nullable=False)
     date_added = db.Column(db.DateTime, default=datetime.utcnow)
+    year_entries = db.relationship('item_years', order_by='item_years.sort_order', lazy='selectin',
+                                   cascade='all, delete-orphan', back_populates='item')
+
+    @db.validates('name')
+    def _store_name_lower(self, key, value):
+        # Indexed copy used by sync_inventory to match names without ilike scans
+        self.name_lower = value.lower() if value else value
+        return value
+
+    @property
+    def years_available(self):
+        """{'year': page_count, ...} built from the item_years rows."""
+        return {entry.year_key: entry.pages for entry in self.year_entries}
+
+    @years_available.setter
+    def years_available(self, data):
+        # Update rows in place so unchanged keys keep their primary key
+        existing = {entry.year_key: entry for entry in self.year_entries}
+        entries = []
+        for order, year_key in enumerate(sorted(data)):
+            try:
+                pages = int(data[year_key])
+            except (TypeError, ValueError):
+                pages = 0
+            entry = existing.get(year_key)
+            if entry is None:
+                entry = item_years(year_key=year_key)
+            entry.sort_order = order
+            entry.pages = pages
+            entries.append(entry)
+        self.year_entries = entries
+
+class item_years(db.Model):
+    item_id = db.Column(db.Integer, db.ForeignKey('items.id', ondelete='CASCADE'), primary_key=True)
+    year_key = db.Column(db.String(50), primary_key=True)
+    sort_order = db.Column(db.Integer, nullable=False)
+    pages = db.Column(db.Integer, nullable=False, default=0)
+    item = db.relationship('items', back_populates='year_entries')
+
+    __table_args__ = (
+        db.Index('ix_item_years_item_id_sort_order', 'item_id', 'sort_order'),
+    )
+
+    @classmethod
+    def total_pages(cls, item_id, start_key, end_key):
+        """Single indexed query: sum of pages between two year keys (inclusive, either order)."""
+        start_order = db.select(cls.sort_order).where(cls.item_id == item_id, cls.year_key == start_key).scalar_subquery()
+        end_order = db.select(cls.sort_order).where(cls.item_id == item_id, cls.year_key == end_key).scalar_subquery()
+        low = db.case((start_order <= end_order, start_order), else_=end_order)
+        high = db.case((start_order <= end_order, end_order), else_=start_order)
+        return db.select(db.func.coalesce(db.func.sum(cls.pages), 0)).where(
+            cls.item_id == item_id,
+            cls.sort_order.between(low, high),
+        )
 
 class users(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -23,18 +77,82 @@ class users(db.Model):
     town = db.Column(db.String(200), nullable=False)
     date_joined = db.Column(db.DateTime, default=datetime.utcnow)
 
+    @classmethod
+    def matching(cls, search=None):
+        """Admin list filter (name, email or number prefix); page with pagination.keyset_page on id."""
+        query = db.select(cls)
+        if search:
+            query = query.where(db.or_(cls.name.ilike(f"{search}%"), cls.email.ilike(f"{search}%"),
+                                       cls.number.like(f"{search}%")))
+        return query
+
 class cart(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
     original_item_id = db.Column(db.Integer, nullable=False)
-    name = db.Column(db.String(100), nullable=False)
-    img = db.Column(db.String(200), nullable=False)
-    years_available = db.Column(db.PickleType, nullable=False)
-    selected_years = db.Column(db.PickleType, nullable=False)
+    # The selected range as catalog year keys; name, image and years come from the catalog snapshot
+    start_year = db.Column(db.String(50), nullable=False)
+    end_year = db.Column(db.String(50), nullable=False)
+    # Pages in the range when it was priced, so later catalog edits can be spotted
+    pages = db.Column(db.Integer, nullable=False, default=0)
     design_type = db.Column(db.String(50), nullable=False)
     price = db.Column(db.Float, nullable=True)
     date_added = db.Column(db.DateTime, default=datetime.utcnow)
 
+    @classmethod
+    def for_user(cls, user_id, cart_ids=None):
+        """A user's cart rows, optionally only the given ids (ix_cart_user_id)."""
+        query = db.select(cls).where(cls.user_id == user_id)
+        if cart_ids is not None:
+            query = query.where(cls.id.in_(cart_ids))
+        return query
+
+    @classmethod
+    def for_range(cls, user_id, table, s_idx, e_idx, design_type):
+        """A cart row for years[s_idx..e_idx] of a pricing.PriceTable, priced now."""
+        return cls(
+            user_id=user_id, original_item_id=table.item_id,
+            start_year=table.years[s_idx], end_year=table.years[e_idx], pages=table.pages(s_idx, e_idx),
+            design_type=design_type, price=table.price(s_idx, e_idx, design_type)
+        )
+
+    def set_range(self, table, s_idx, e_idx, design_type):
+        self.start_year = table.years[s_idx]
+        self.end_year = table.years[e_idx]
+        self.pages = table.pages(s_idx, e_idx)
+        self.design_type = design_type
+        self.price = table.price(s_idx, e_idx, design_type)
+
+    @property
+    def item(self):
+        """The catalog entry this row points at, or None if the item was deleted."""
+        import catalog
+        return catalog.get_catalog().get(self.original_item_id)
+
+    @property
+    def name(self):
+        entry = self.item
+        return entry.name if entry else "Unavailable item"
+
+    @property
+    def img(self):
+        entry = self.item
+        return entry.img if entry else ""
+
+    @property
+    def years_available(self):
+        entry = self.item
+        return entry.years_available if entry else {}
+
+    @property
+    def selected_years(self):
+        import pricing
+        table = pricing.get_table(self.original_item_id)
+        span = table.resolve_range(self.start_year, self.end_year) if table else None
+        if span is None:
+            return list(dict.fromkeys([self.start_year, self.end_year]))
+        return table.selected_years(*span)
+
 class orders(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, nullable=False)
@@ -44,4 +162,107 @@ class orders(db.Model):
     total_price = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(50), default="Pending")
     additional_info = db.Column(db.Text, nullable=True)
-    order_date = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    order_date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Idempotency key posted with the cart form; NULL for orders placed before it existed
+    checkout_key = db.Column(db.String(64), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_orders_user_id_order_date', 'user_id', 'order_date'),
+        db.Index('ix_orders_status_order_date', 'status', 'order_date'),
+        db.Index('ix_orders_checkout_key', 'checkout_key', unique=True),
+    )
+
+    @classmethod
+    def by_checkout_key(cls, user_id, checkout_key):
+        """The order a checkout_key already placed for this user (ix_orders_checkout_key)."""
+        return db.select(cls).where(cls.checkout_key == checkout_key, cls.user_id == user_id)
+
+    @classmethod
+    def for_user(cls, user_id):
+        """A user's orders, newest first, read in index order (ix_orders_user_id_order_date)."""
+        return db.select(cls).where(cls.user_id == user_id).order_by(cls.order_date.desc())
+
+    @classmethod
+    def matching(cls, status=None, date_range=(), customer=None):
+        """Admin list filters; page with pagination.keyset_page on (order_date, id).
+
+        Status pages read ix_orders_status_order_date, the rest ix_orders_order_date;
+        the customer filter (name or number prefix) is checked while walking that index.
+        """
+        query = db.select(cls).where(*date_range)
+        if status:
+            query = query.where(cls.status == status)
+        if customer:
+            query = query.where(db.or_(cls.customer_name.ilike(f"{customer}%"),
+                                       cls.contact_number.like(f"{customer}%")))
+        return query
+
+class order_lines(db.Model):
+    # One row per cart line of an order; orders.order_items keeps the text summary for display
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id', ondelete='CASCADE'), nullable=False, index=True)
+    # NULL only for backfilled lines whose item name no longer matched the catalog
+    item_id = db.Column(db.Integer, nullable=True)
+    start_key = db.Column(db.String(50), nullable=False)
+    end_key = db.Column(db.String(50), nullable=False)
+    cover = db.Column(db.String(50), nullable=False)
+    pages = db.Column(db.Integer, nullable=False, default=0)
+    price = db.Column(db.Float, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_order_lines_item_id_order_id', 'item_id', 'order_id'),
+    )
+
+    @staticmethod
+    def rows_for(order_id, cart_items):
+        """Insert parameters for a checkout's cart rows, for one bulk db.insert(order_lines)."""
+        return [{
+            'order_id': order_id, 'item_id': item.original_item_id, 'start_key': item.start_year,
+            'end_key': item.end_year, 'cover': item.design_type, 'pages': item.pages, 'price': item.price,
+        } for item in cart_items]
+
+    @classmethod
+    def item_ids(cls, order_id):
+        """Item ids of an order's lines, one entry per line (ix_order_lines_order_id)."""
+        return db.select(cls.item_id).where(cls.order_id == order_id, cls.item_id.is_not(None)).order_by(cls.id)
+
+class sales_daily(db.Model):
+    # Per-day, per-status order totals, maintained by sales.record_order / sales.move_order
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+class sales_daily_items(db.Model):
+    # Units (cart lines) sold per day, status and item; same maintenance as sales_daily
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+
+class wa_outbox(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    number = db.Column(db.String(20), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="pending", index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    # Set while a worker holds the row in "sending" (outbox.Outbox.claim)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+
+class image_uploads(db.Model):
+    # Cover files spooled by add_item, pushed to Cloudinary by the uploads workers
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, nullable=False, index=True)
+    spool_name = db.Column(db.String(100), nullable=False)
+    size = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default="pending", index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    secure_url = db.Column(db.String(300), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # Set when a worker claims the job; a stale claim means it died mid-upload
+    claimed_at = db.Column(db.DateTime, nullable=True)
\ No newline at end of file
@@ -0,0 +1,186 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from models import db
+
+# A row claimed by a worker that then died (crash, frozen serverless instance)
+# is taken over by the next delivery after this many seconds
+OUTBOX_CLAIM_TIMEOUT = int(os.getenv('OUTBOX_CLAIM_TIMEOUT', '600'))
+
+# How dispatched rows get delivered:
+#   thread  background worker threads in this process (long-lived servers)
+#   inline  right away, inside the request that committed them
+#   queue   not in-process at all; a cron or CLI flush sends them (serverless)
+MODES = ('thread', 'inline', 'queue')
+
+
+class DeliveryError(Exception):
+    """Raised by an Outbox's send function for a failure worth retrying."""
+
+
+def serverless():
+    """True on Vercel, where the process freezes after each response and threads don't run."""
+    return bool(os.getenv('VERCEL'))
+
+
+class Outbox:
+    """
+    Rows that are delivered once their transaction commits: wa_outbox messages, image_uploads jobs.
+
+    The caller adds a row with status "pending", commits, then dispatch()es its id.
+    deliver() first claims the row with one conditional UPDATE (pending/failed
+    -> claimed_status), so a worker thread, a CLI flush and another process can
+    never send the same row twice. It then calls send(payload) with exponential
+    backoff, holding no DB connection, and records "sent" or "failed".
+
+    load(row) copies what send needs out of the row; on_sent(row, result) runs in
+    the same transaction that marks it sent; after_commit(payload, sent) runs last.
+    """
+
+    def __init__(self, name, model, load, send, claimed_status="sending", on_sent=None, after_commit=None,
+                 mode='thread', workers=1, max_attempts=3, inline_attempts=1, backoff_base=1.0, give_up_after=20):
+        if mode not in MODES:
+            raise ValueError(f"{name} delivery mode must be one of {', '.join(MODES)}, not {mode!r}")
+        self.name = name
+        self.model = model
+        self.load = load
+        self.send = send
+        self.claimed_status = claimed_status
+        self.on_sent = on_sent
+        self.after_commit = after_commit
+        self.mode = mode
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.inline_attempts = inline_attempts
+        self.backoff_base = backoff_base
+        # Failed rows stop being retried by flush() after this many attempts in total
+        self.give_up_after = give_up_after
+        self.app = None
+        self._queue = queue.Queue()
+        self._threads = []
+        self._threads_lock = threading.Lock()
+
+    def claim(self, row_id):
+        """Atomically marks a pending, failed or abandoned row as ours; False if someone else has it."""
+        model = self.model
+        now = datetime.utcnow()
+        abandoned = db.and_(model.status == self.claimed_status,
+                            model.claimed_at < now - timedelta(seconds=OUTBOX_CLAIM_TIMEOUT))
+        result = db.session.execute(
+            db.update(model)
+            .where(model.id == row_id, db.or_(model.status.in_(("pending", "failed")), abandoned))
+            .values(status=self.claimed_status, claimed_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def deliver(self, row_id, max_attempts=None, sleep=time.sleep):
+        """Claims and delivers one row with exponential backoff; True if it is sent. Needs an app context."""
+        if not self.claim(row_id):
+            row = db.session.get(self.model, row_id)
+            return row is None or row.status == "sent"
+        payload = self.load(db.session.get(self.model, row_id))
+        # Release the DB connection while we wait on the network
+        db.session.rollback()
+
+        result = error = None
+        attempts = 0
+        for attempt in range(max_attempts or self.max_attempts):
+            if attempt:
+                sleep(self.backoff_base * (2 ** (attempt - 1)))
+            attempts += 1
+            try:
+                result = self.send(payload)
+                error = None
+                break
+            except DeliveryError as e:
+                error = str(e)
+            except Exception as e:
+                # Not worth retrying now; flush() tries again later
+                error = f"{type(e).__name__}: {e}"
+                break
+
+        row = db.session.get(self.model, row_id)
+        row.attempts = (row.attempts or 0) + attempts
+        row.claimed_at = None
+        if error is None:
+            row.status = "sent"
+            row.last_error = None
+            if self.on_sent:
+                self.on_sent(row, result)
+        else:
+            row.status = "failed"
+            row.last_error = error[:1000]
+        db.session.commit()
+        if self.after_commit:
+            self.after_commit(payload, error is None)
+        return error is None
+
+    def dispatch(self, *row_ids):
+        """Delivers committed row ids the way `mode` says."""
+        row_ids = [row_id for row_id in row_ids if row_id is not None]
+        if self.mode == 'inline':
+            for row_id in row_ids:
+                try:
+                    self.deliver(row_id, max_attempts=self.inline_attempts)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"{self.name} delivery error for #{row_id}: {e}")
+            return
+        if self.mode == 'queue' or not row_ids:
+            return
+        self._ensure_workers()
+        for row_id in row_ids:
+            self._queue.put(row_id)
+
+    def _worker_loop(self):
+        while True:
+            row_id = self._queue.get()
+            try:
+                with self.app.app_context():
+                    self.deliver(row_id)
+            except Exception as e:
+                print(f"{self.name} worker error for #{row_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _ensure_workers(self):
+        if self.app is None:
+            raise RuntimeError(f"{self.name}: init_app(app) must be called before dispatching")
+        if len(self._threads) >= self.workers:
+            return
+        with self._threads_lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._worker_loop, name=f"{self.name}-{len(self._threads)}",
+                                          daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def wait(self):
+        """Blocks until every row handed to the worker threads has been attempted."""
+        self._queue.join()
+
+    def waiting_query(self, status, limit):
+        """Oldest ids in one status; one status per query so it stays an index search."""
+        model = self.model
+        query = db.select(model.id).where(model.status == status)
+        if status == "failed":
+            query = query.where(model.attempts < self.give_up_after)
+        elif status == self.claimed_status:
+            query = query.where(model.claimed_at < datetime.utcnow() - timedelta(seconds=OUTBOX_CLAIM_TIMEOUT))
+        return query.order_by(model.id).limit(limit)
+
+    def flush(self, include_failed=False, limit=500):
+        """Delivers pending (and optionally failed or abandoned) rows synchronously. Needs an app context."""
+        statuses = ["pending", self.claimed_status] + (["failed"] if include_failed else [])
+        row_ids = []
+        for status in statuses:
+            if len(row_ids) >= limit:
+                break
+            row_ids += db.session.execute(self.waiting_query(status, limit - len(row_ids))).scalars().all()
+        sent = sum(1 for row_id in row_ids if self.deliver(row_id))
+        return sent, len(row_ids)
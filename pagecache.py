@@ -0,0 +1,116 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from flask import make_response, request, session
+
+import catalog
+
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE', '1') != '0'
+# Rendered pages kept per process (every distinct /Shop query string is one entry)
+PAGE_CACHE_MAX = int(os.getenv('PAGE_CACHE_MAX', '1024'))
+# Browsers always revalidate (cheap with the ETag); shared caches such as the
+# Vercel edge may serve a page for S_MAXAGE seconds, then stale while they refetch
+PAGE_CACHE_S_MAXAGE = int(os.getenv('PAGE_CACHE_S_MAXAGE', '60'))
+PAGE_CACHE_STALE = int(os.getenv('PAGE_CACHE_STALE', '300'))
+
+# Pages that don't read the catalog are stored under this version and survive item writes
+STATIC_VERSION = None
+
+CachedPage = namedtuple('CachedPage', 'version body content_type etag')
+
+_lock = threading.Lock()
+_pages = OrderedDict()
+_catalog_version = None
+
+
+def is_anonymous():
+    """True when nothing on the page can depend on who is asking."""
+    return session.get('user_id') is None and not session.get('is_admin')
+
+
+def _sweep(version):
+    # First request after an item write: drop every page rendered from an older catalog
+    global _catalog_version
+    with _lock:
+        if _catalog_version == version:
+            return
+        for key in [key for key, page in _pages.items() if page.version not in (STATIC_VERSION, version)]:
+            del _pages[key]
+        _catalog_version = version
+
+
+def lookup(key, version):
+    with _lock:
+        page = _pages.get(key)
+        if page is None or page.version != version:
+            return None
+        _pages.move_to_end(key)
+        return page
+
+
+def store(key, version, response):
+    body = response.get_data()
+    page = CachedPage(version, body, response.content_type, hashlib.sha1(body).hexdigest()[:20])
+    with _lock:
+        _pages[key] = page
+        _pages.move_to_end(key)
+        while len(_pages) > PAGE_CACHE_MAX:
+            _pages.popitem(last=False)
+    return page
+
+
+def clear():
+    """Drops every cached page, e.g. once new image derivatives exist."""
+    with _lock:
+        _pages.clear()
+
+
+def _shared(response, etag, state):
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 0
+    response.cache_control.s_maxage = PAGE_CACHE_S_MAXAGE
+    response.cache_control.stale_while_revalidate = PAGE_CACHE_STALE
+    response.headers['X-Page-Cache'] = state
+    return response.make_conditional(request)
+
+
+def cached(catalog_bound=True):
+    """
+    Serves a GET view's HTML from memory for anonymous visitors.
+
+    Entries are keyed by path + query string and the catalog version they were
+    rendered from, so catalog.invalidate() after an item write retires every
+    shop and product page at once; pass catalog_bound=False for pages that
+    don't show items. Signed-in users always get a fresh, private render.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not is_anonymous() or not PAGE_CACHE_ENABLED:
+                response = make_response(view(*args, **kwargs))
+                if request.method in ('GET', 'HEAD') and not is_anonymous():
+                    response.cache_control.private = True
+                    response.cache_control.no_cache = True
+                return response
+
+            version = catalog.get_catalog().version if catalog_bound else STATIC_VERSION
+            if catalog_bound:
+                _sweep(version)
+            key = request.full_path
+            page = lookup(key, version)
+            if page is not None:
+                response = make_response(page.body)
+                response.content_type = page.content_type
+                return _shared(response, page.etag, 'HIT')
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or session.modified or response.is_streamed:
+                return response
+            page = store(key, version, response)
+            return _shared(response, page.etag, 'MISS')
+        return wrapper
+    return decorator
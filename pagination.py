@@ -0,0 +1,87 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from models import db
+
+# Rows per page, and the most a client may ask for with ?limit=
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# rows: this page's ORM objects; next_cursor: opaque string for the following page, or None on the last page
+Page = namedtuple('Page', 'rows next_cursor')
+
+
+def encode_cursor(values):
+    """Opaque, URL-safe cursor for the sort key of the last row on a page."""
+    plain = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(plain, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """Sort key from encode_cursor, or None for a missing or malformed cursor (restart at page one)."""
+    if not cursor:
+        return None
+    try:
+        plain = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(plain, list) or len(plain) != len(columns):
+            return None
+        values = []
+        for column, value in zip(columns, plain):
+            if isinstance(column.type, db.DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(column.type, db.Integer) and not isinstance(value, int):
+                return None
+            values.append(value)
+        return tuple(values)
+    except (ValueError, TypeError):
+        return None
+
+
+def page_size(raw):
+    try:
+        return max(1, min(int(raw), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+
+
+def parse_date(raw):
+    """'YYYY-MM-DD' from a filter form, or None if empty or invalid."""
+    try:
+        return date.fromisoformat((raw or '').strip())
+    except ValueError:
+        return None
+
+
+def date_bounds(column, date_from, date_to):
+    """Conditions for an inclusive date range on a DateTime column (still a plain index range)."""
+    conditions = []
+    if date_from:
+        conditions.append(column >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        conditions.append(column < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    return conditions
+
+
+def keyset_query(query, columns, after=None, limit=PAGE_SIZE):
+    """`query` newest first by `columns`, starting after the sort key `after`.
+
+    Seeks with a row-value comparison, (a, b) < (last_a, last_b), instead of
+    OFFSET, so every page is an index range read however deep it is. `columns`
+    must end with a unique column (the id) to make the order total. Selects
+    limit + 1 rows so the caller can tell whether another page exists.
+    """
+    if after is not None:
+        query = query.where(db.tuple_(*columns) < after)
+    return query.order_by(*(column.desc() for column in columns)).limit(limit + 1)
+
+
+def keyset_page(query, columns, cursor=None, limit=PAGE_SIZE):
+    """One Page of `query` continuing after `cursor` (see keyset_query)."""
+    after = decode_cursor(cursor, columns)
+    rows = db.session.execute(keyset_query(query, columns, after, limit)).scalars().all()
+    if len(rows) <= limit:
+        return Page(rows, None)
+    rows = rows[:limit]
+    return Page(rows, encode_cursor([getattr(rows[-1], column.key) for column in columns]))
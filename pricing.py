@@ -0,0 +1,104 @@
+import threading
+from functools import cached_property
+from itertools import accumulate
+
+import catalog
+from year_keys import YearKeyResolver
+from functions import PRICE_PER_PAGE, BINDING_PRICE, COVER_COSTS, price_for_pages
+
+# Upper bound on quotes priced by one /api/quote call
+MAX_QUOTES_PER_REQUEST = 5000
+
+
+class PriceTable:
+    """Cumulative page counts for one catalog item, so any year range prices in O(1)."""
+
+    def __init__(self, entry):
+        self.item_id = entry.id
+        self.name = entry.name
+        self.years = entry.years
+        self.index = {year: i for i, year in enumerate(entry.years)}
+        # prefix[i] = pages in years[0:i]
+        self.prefix = (0,) + tuple(accumulate(entry.pages))
+
+    @cached_property
+    def resolver(self):
+        # Built on first use; lives as long as this catalog version
+        return YearKeyResolver(self.years)
+
+    def resolve_range(self, start_year, end_year):
+        """Returns (start_idx, end_idx) in sorted order, or None if either key is unknown."""
+        s_idx = self.index.get(start_year)
+        e_idx = self.index.get(end_year)
+        if s_idx is None or e_idx is None:
+            return None
+        if s_idx > e_idx: s_idx, e_idx = e_idx, s_idx
+        return s_idx, e_idx
+
+    def pages(self, s_idx, e_idx):
+        return self.prefix[e_idx + 1] - self.prefix[s_idx]
+
+    def selected_years(self, s_idx, e_idx):
+        return list(self.years[s_idx:e_idx + 1])
+
+    def price(self, s_idx, e_idx, design_type):
+        return price_for_pages(self.pages(s_idx, e_idx), design_type)
+
+    def client_data(self):
+        """Everything the product page needs to price ranges without a round trip."""
+        return {
+            'years': list(self.years),
+            'prefix': list(self.prefix),
+            'price_per_page': PRICE_PER_PAGE,
+            'binding_price': BINDING_PRICE,
+            'cover_costs': COVER_COSTS,
+        }
+
+
+class PriceEngine:
+    """PriceTables for every item in one catalog snapshot."""
+
+    def __init__(self, snapshot):
+        self.version = snapshot.version
+        self.tables = {entry.id: PriceTable(entry) for entry in snapshot}
+
+    def get(self, item_id):
+        return self.tables.get(item_id)
+
+    def quote(self, item_id, start_year, end_year, design_type):
+        table = self.tables.get(item_id)
+        if table is None:
+            return {'item_id': item_id, 'error': 'Item not found'}
+        span = table.resolve_range(start_year, end_year)
+        if span is None:
+            return {'item_id': item_id, 'error': 'Unknown year'}
+        s_idx, e_idx = span
+        return {
+            'item_id': item_id,
+            'start': table.years[s_idx],
+            'end': table.years[e_idx],
+            'cover': design_type,
+            'pages': table.pages(s_idx, e_idx),
+            'price': table.price(s_idx, e_idx, design_type),
+        }
+
+
+_lock = threading.Lock()
+_engine = None
+
+
+def get_engine():
+    """Returns the PriceEngine for the current catalog version."""
+    global _engine
+    snapshot = catalog.get_catalog()
+    engine = _engine
+    if engine is not None and engine.version == snapshot.version:
+        return engine
+    with _lock:
+        if _engine is None or _engine.version != snapshot.version:
+            _engine = PriceEngine(snapshot)
+        return _engine
+
+
+def get_table(item_id):
+    return get_engine().get(item_id)
@@ -0,0 +1,154 @@
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+import catalog
+from models import db, orders, order_lines, sales_daily, sales_daily_items
+
+# Statuses left out of revenue and units sold
+EXCLUDED_STATUSES = ('Cancelled',)
+# Orders read per round trip by rebuild()
+REBUILD_BATCH_SIZE = 1000
+TOP_ITEMS = 10
+
+
+def order_day(order_date):
+    return (order_date or datetime.utcnow()).date()
+
+
+def _bump(model, key, **deltas):
+    """Adds `deltas` to the rollup row for `key`, creating it on first use.
+
+    UPDATE ... SET n = n + delta keeps concurrent writers from losing counts;
+    two writers creating the same new row race on the insert, and the loser
+    falls back to the update inside a savepoint.
+    """
+    where = [getattr(model, column) == value for column, value in key.items()]
+    values = {column: getattr(model, column) + delta for column, delta in deltas.items()}
+    if db.session.execute(db.update(model).where(*where).values(**values)).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(db.insert(model).values(**key, **deltas))
+    except IntegrityError:
+        db.session.execute(db.update(model).where(*where).values(**values))
+
+
+def _apply(day, status, revenue, item_ids, sign):
+    _bump(sales_daily, {'day': day, 'status': status}, order_count=sign, revenue=sign * revenue)
+    for item_id, units in Counter(item_ids).items():
+        _bump(sales_daily_items, {'day': day, 'status': status, 'item_id': item_id}, units=sign * units)
+
+
+def record_order(order, item_ids):
+    """Counts a new order in the rollups; call in the same transaction that inserts it."""
+    _apply(order_day(order.order_date), order.status or "Pending", order.total_price or 0, item_ids, 1)
+
+
+def move_order(order, old_status, item_ids=None):
+    """Moves an order between status rollups; call in the same transaction as the status change."""
+    new_status = order.status or "Pending"
+    old_status = old_status or "Pending"
+    if new_status == old_status:
+        return
+    if item_ids is None:
+        item_ids = db.session.execute(order_lines.item_ids(order.id)).scalars().all()
+    day = order_day(order.order_date)
+    _apply(day, old_status, order.total_price or 0, item_ids, -1)
+    _apply(day, new_status, order.total_price or 0, item_ids, 1)
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE):
+    """Recomputes both rollup tables from orders and order_lines; returns (orders, lines without an item)."""
+    totals = defaultdict(lambda: [0, 0.0])
+    units = Counter()
+    count = unmatched = 0
+    last_id = 0
+    columns = (orders.id, orders.order_date, orders.status, orders.total_price)
+    while True:
+        rows = db.session.execute(
+            db.select(*columns).where(orders.id > last_id).order_by(orders.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        keys = {}
+        for order_id, order_date, status, total_price in rows:
+            key = keys[order_id] = (order_day(order_date), status or "Pending")
+            totals[key][0] += 1
+            totals[key][1] += total_price or 0
+        lines = db.session.execute(
+            db.select(order_lines.order_id, order_lines.item_id).where(order_lines.order_id.between(rows[0][0], rows[-1][0]))
+        ).all()
+        for order_id, item_id in lines:
+            if item_id is None:
+                unmatched += 1
+            elif order_id in keys:
+                units[keys[order_id] + (item_id,)] += 1
+        count += len(rows)
+        last_id = rows[-1][0]
+
+    db.session.execute(db.delete(sales_daily_items))
+    db.session.execute(db.delete(sales_daily))
+    if totals:
+        db.session.execute(db.insert(sales_daily), [
+            {'day': day, 'status': status, 'order_count': n, 'revenue': revenue}
+            for (day, status), (n, revenue) in totals.items()
+        ])
+    if units:
+        db.session.execute(db.insert(sales_daily_items), [
+            {'day': day, 'status': status, 'item_id': item_id, 'units': n}
+            for (day, status, item_id), n in units.items()
+        ])
+    db.session.commit()
+    return count, unmatched
+
+
+def summary(days=30, today=None):
+    """Dashboard figures for the last `days` days, read from the rollup tables only."""
+    today = today or datetime.utcnow().date()
+    since = today - timedelta(days=days - 1)
+    counted = sales_daily.status.not_in(EXCLUDED_STATUSES)
+
+    by_status = db.session.execute(
+        db.select(sales_daily.status, db.func.sum(sales_daily.order_count), db.func.sum(sales_daily.revenue))
+        .where(sales_daily.day >= since)
+        .group_by(sales_daily.status)
+        .order_by(sales_daily.status)
+    ).all()
+    daily = {day: (n, revenue) for day, n, revenue in db.session.execute(
+        db.select(sales_daily.day, db.func.sum(sales_daily.order_count), db.func.sum(sales_daily.revenue))
+        .where(sales_daily.day >= since, counted)
+        .group_by(sales_daily.day)
+    ).all()}
+    units = db.func.sum(sales_daily_items.units)
+    top = db.session.execute(
+        db.select(sales_daily_items.item_id, units)
+        .where(sales_daily_items.day >= since, sales_daily_items.status.not_in(EXCLUDED_STATUSES))
+        .group_by(sales_daily_items.item_id)
+        .having(units > 0)
+        .order_by(units.desc(), sales_daily_items.item_id)
+        .limit(TOP_ITEMS)
+    ).all()
+
+    snapshot = catalog.get_catalog()
+    series = [(since + timedelta(days=offset),) + daily.get(since + timedelta(days=offset), (0, 0.0))
+              for offset in range(days)]
+    return {
+        'days': days,
+        'since': since,
+        'orders': sum(n for _day, n, _revenue in series),
+        'revenue': sum(revenue for _day, _n, revenue in series),
+        'by_status': [(status, n, revenue) for status, n, revenue in by_status if n],
+        'daily': series,
+        'top_items': [(snapshot.get(item_id), item_id, n) for item_id, n in top],
+    }
+
+
+def init_app(app):
+    @app.cli.command("sales-rebuild")
+    def sales_rebuild_command():
+        """Recompute the daily sales rollups from the full order history (backfill or repair)."""
+        import click
+        count, unmatched = rebuild()
+        click.echo(f"Rebuilt sales rollups from {count} orders ({unmatched} order lines have no item).")
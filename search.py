@@ -0,0 +1,111 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+import catalog
+import item_names
+from item_names import trigrams
+
+SHOP_PAGE_SIZE = 48
+
+_token_re = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    return _token_re.findall((text or "").lower())
+
+
+class SearchIndex:
+    """Token and trigram postings over item names for one catalog version."""
+
+    def __init__(self, snapshot):
+        self.version = snapshot.version
+        self.entries = snapshot.items
+        self.names = [entry.name.lower() for entry in self.entries]
+        self.trigram_postings = defaultdict(set)
+        self.token_postings = defaultdict(set)
+        self.category_postings = defaultdict(list)
+        self.position = {entry.id: pos for pos, entry in enumerate(self.entries)}
+        for pos, (entry, name) in enumerate(zip(self.entries, self.names)):
+            for gram in trigrams(name):
+                self.trigram_postings[gram].add(pos)
+            for token in tokenize(name):
+                self.token_postings[token].add(pos)
+            for category in entry.categories:
+                self.category_postings[category].append(pos)
+        self.vocabulary = sorted(self.token_postings)
+
+    def _substring_matches(self, query):
+        """Positions whose lowercased name contains `query`, like the old client-side filter."""
+        grams = trigrams(query)
+        if not grams:
+            # One or two characters: too short for trigrams, a scan is cheap
+            return {pos for pos, name in enumerate(self.names) if query in name}
+        postings = sorted((self.trigram_postings.get(gram, set()) for gram in grams), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return candidates
+        return {pos for pos in candidates if query in self.names[pos]}
+
+    def _token_matches(self, query):
+        """Positions where every query word is a prefix of some word in the name."""
+        positions = None
+        for token in tokenize(query):
+            lo = bisect_left(self.vocabulary, token)
+            hi = bisect_left(self.vocabulary, token + "\x7f")
+            matches = set()
+            for word in self.vocabulary[lo:hi]:
+                matches |= self.token_postings[word]
+            positions = matches if positions is None else positions & matches
+            if not positions:
+                return set()
+        return positions or set()
+
+    def _fuzzy_matches(self, query):
+        """Fallback for misspellings and abbreviations ("physcs u2", "p1") via the shared name matcher."""
+        matcher = item_names.get_matcher()
+        return {self.position[entry.id] for _score, entry in matcher.rank(query, limit=SHOP_PAGE_SIZE)
+                if entry.id in self.position}
+
+    def search(self, query="", category="all"):
+        """Returns matching catalog entries in catalog order."""
+        query = (query or "").strip().lower()
+        positions = None
+        if category and category != "all":
+            positions = set(self.category_postings.get(category, ()))
+        if query:
+            matches = self._substring_matches(query) | self._token_matches(query)
+            if not matches:
+                matches = self._fuzzy_matches(query)
+            positions = matches if positions is None else positions & matches
+        if positions is None:
+            return list(self.entries)
+        return [self.entries[pos] for pos in sorted(positions)]
+
+
+def paginate(results, page, per_page=SHOP_PAGE_SIZE):
+    """Returns (page_results, page, page_count) with `page` clamped into range."""
+    page_count = max(1, -(-len(results) // per_page))
+    page = min(max(page or 1, 1), page_count)
+    start = (page - 1) * per_page
+    return results[start:start + per_page], page, page_count
+
+
+_lock = threading.Lock()
+_index = None
+
+
+def get_index():
+    """Returns the SearchIndex for the current catalog version."""
+    global _index
+    snapshot = catalog.get_catalog()
+    index = _index
+    if index is not None and index.version == snapshot.version:
+        return index
+    with _lock:
+        if _index is None or _index.version != snapshot.version:
+            _index = SearchIndex(snapshot)
+        return _index
@@ -0,0 +1,113 @@
+import gzip
+import hashlib
+import threading
+import zlib
+from datetime import datetime, timezone
+from itertools import islice
+from xml.sax.saxutils import escape
+
+import catalog
+
+BASE_URL = "https://papergenius.vercel.app"
+
+# Sitemap protocol limit per file; above it /sitemap.xml becomes an index
+SITEMAP_MAX_URLS = 50000
+
+STATIC_PAGES = [
+    ("/", "1.0"),
+    ("/Shop", "0.9"),
+    ("/About", "0.8"),
+    ("/Contact", "0.7"),
+]
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>'
+URLSET_OPEN = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+INDEX_OPEN = '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+
+
+class RenderedSitemap:
+    """One catalog version's sitemap, rendered and compressed once."""
+
+    def __init__(self, version, body, fingerprint, last_modified, page_count):
+        self.version = version
+        self.body = body.encode('utf-8')
+        self.gzipped = gzip.compress(self.body)
+        self.etag = fingerprint
+        self.last_modified = last_modified
+        self.page_count = page_count
+
+    def page_etag(self, page):
+        return f"{self.etag}-{page}"
+
+
+_lock = threading.Lock()
+_rendered = None
+
+
+def iter_urls(snapshot):
+    for path, priority in STATIC_PAGES:
+        yield f"{BASE_URL}{path}", priority
+    for item in snapshot:
+        # SEO UPDATE: Include the name in the URL
+        yield f"{BASE_URL}/Product/{item.id}/{item.slug}", "0.8"
+
+
+def iter_urlset(urls):
+    yield XML_HEADER
+    yield URLSET_OPEN
+    for loc, priority in urls:
+        yield f"<url><loc>{escape(loc)}</loc><priority>{priority}</priority></url>"
+    yield '</urlset>'
+
+
+def iter_page(snapshot, page):
+    """Streams child sitemap number `page` (1-based) of a sharded sitemap."""
+    start = (page - 1) * SITEMAP_MAX_URLS
+    return iter_urlset(islice(iter_urls(snapshot), start, start + SITEMAP_MAX_URLS))
+
+
+def iter_gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _render(snapshot):
+    url_count = len(STATIC_PAGES) + len(snapshot)
+    page_count = -(-url_count // SITEMAP_MAX_URLS)
+
+    digest = hashlib.sha1()
+    for loc, priority in iter_urls(snapshot):
+        digest.update(f"{loc} {priority}\n".encode('utf-8'))
+    fingerprint = digest.hexdigest()
+
+    last_modified = datetime.fromtimestamp(int(snapshot.built_at), tz=timezone.utc)
+
+    if page_count <= 1:
+        body = "".join(iter_urlset(iter_urls(snapshot)))
+    else:
+        lastmod = last_modified.strftime('%Y-%m-%d')
+        parts = [XML_HEADER, INDEX_OPEN]
+        for page in range(1, page_count + 1):
+            parts.append(f"<sitemap><loc>{BASE_URL}/sitemap-{page}.xml</loc><lastmod>{lastmod}</lastmod></sitemap>")
+        parts.append('</sitemapindex>')
+        body = "".join(parts)
+
+    return RenderedSitemap(snapshot.version, body, fingerprint, last_modified, page_count)
+
+
+def get_sitemap(snapshot=None):
+    """Returns the RenderedSitemap for the current catalog version."""
+    global _rendered
+    if snapshot is None:
+        snapshot = catalog.get_catalog()
+    rendered = _rendered
+    if rendered is not None and rendered.version == snapshot.version:
+        return rendered
+    with _lock:
+        if _rendered is None or _rendered.version != snapshot.version:
+            _rendered = _render(snapshot)
+        return _rendered
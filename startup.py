@@ -0,0 +1,125 @@
+import os
+import re
+import subprocess
+import sys
+from collections import namedtuple
+
+# Cold start (imports + app setup + first request) a fresh process may take, in ms
+STARTUP_BUDGET_MS = float(os.getenv('STARTUP_BUDGET_MS', '1000'))
+# Loaded on first use; importing any of them at startup is a regression
+LAZY_MODULES = ('cloudinary', 'groq', 'requests', 'flask_migrate', 'alembic', 'PIL', 'redis')
+
+# "import time:  self [us] | cumulative | imported package" lines written by -X importtime
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+RESULT_LINE = re.compile(r'^STARTUP (\w+) ([\d.]+)$')
+
+# Runs in a fresh interpreter so nothing is already imported
+PROBE = """
+import time
+started = time.perf_counter()
+import {module} as target
+imported = time.perf_counter()
+target.app.test_client().get('/robots.txt')
+served = time.perf_counter()
+print('STARTUP import_ms', (imported - started) * 1000)
+print('STARTUP first_request_ms', (served - imported) * 1000)
+"""
+
+ImportCost = namedtuple('ImportCost', 'name depth self_ms cumulative_ms')
+
+
+class StartupProfile:
+    """One cold start of the app: import costs, wall times, and lazy modules that loaded anyway."""
+
+    def __init__(self, imports, import_ms, first_request_ms):
+        self.imports = imports
+        self.import_ms = import_ms
+        self.first_request_ms = first_request_ms
+        self.total_ms = import_ms + first_request_ms
+        loaded = {cost.name.split('.')[0] for cost in imports}
+        self.eager = [name for name in LAZY_MODULES if name in loaded]
+
+    def cost_of(self, name):
+        return next((cost for cost in self.imports if cost.name == name), None)
+
+    def direct_imports(self, name, count):
+        """Most expensive modules first imported by `name` itself, by cumulative time."""
+        # -X importtime lists a module's imports just above it, one level deeper
+        at = next((i for i, cost in enumerate(self.imports) if cost.name == name), None)
+        if at is None:
+            return []
+        depth = self.imports[at].depth
+        rows = []
+        for cost in reversed(self.imports[:at]):
+            if cost.depth <= depth:
+                break
+            if cost.depth == depth + 1:
+                rows.append(cost)
+        return sorted(rows, key=lambda cost: cost.cumulative_ms, reverse=True)[:count]
+
+    def by_package(self, count):
+        """Self time summed per top-level package, most expensive first."""
+        totals = {}
+        for cost in self.imports:
+            package = cost.name.split('.')[0]
+            totals[package] = totals.get(package, 0.0) + cost.self_ms
+        return sorted(totals.items(), key=lambda pair: pair[1], reverse=True)[:count]
+
+
+def parse_importtime(stderr):
+    costs = []
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            costs.append(ImportCost(name, len(indent) // 2, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return costs
+
+
+def profile(module='app', python=sys.executable, cwd=None):
+    """Starts a fresh interpreter under -X importtime, imports `module` and serves one request."""
+    env = dict(os.environ)
+    # Set by the flask command; the child must start like a web worker, not the CLI
+    env.pop('FLASK_RUN_FROM_CLI', None)
+    env.setdefault('WABOT_WORKERS', '0')
+    result = subprocess.run(
+        [python, '-X', 'importtime', '-c', PROBE.format(module=module)],
+        capture_output=True, text=True, env=env, cwd=cwd or os.path.dirname(os.path.abspath(__file__)),
+    )
+    timings = dict((match.group(1), float(match.group(2)))
+                   for match in map(RESULT_LINE.match, result.stdout.splitlines()) if match)
+    if result.returncode != 0 or len(timings) != 2:
+        raise RuntimeError(f"Startup probe failed:\n{result.stderr[-2000:]}")
+    return StartupProfile(parse_importtime(result.stderr), timings['import_ms'], timings['first_request_ms'])
+
+
+def best_of(runs, module='app'):
+    """Fastest of several cold starts; the minimum is the least noisy estimate."""
+    return min((profile(module) for _ in range(runs)), key=lambda result: result.total_ms)
+
+
+def report(result, module='app', top=15):
+    own = result.cost_of(module)
+    lines = [
+        f"cold start {result.total_ms:.0f} ms: import {module} {result.import_ms:.0f} ms"
+        f" ({module}.py itself {own.self_ms if own else 0:.0f} ms), first request {result.first_request_ms:.0f} ms",
+        "",
+        f"{'imported by ' + module:<32} {'cumulative ms':>14}",
+    ]
+    lines += [f"{cost.name:<32} {cost.cumulative_ms:14.1f}" for cost in result.direct_imports(module, top)]
+    lines += ["", f"{'package (self time)':<32} {'ms':>14}"]
+    lines += [f"{package:<32} {ms:14.1f}" for package, ms in result.by_package(top)]
+    if result.eager:
+        lines += ["", f"imported at startup but meant to be lazy: {', '.join(result.eager)}"]
+    return "\n".join(lines)
+
+
+def init_app(app):
+    @app.cli.command("startup-profile")
+    def startup_profile_command():
+        """Profile a cold start (python -X importtime) and compare it to STARTUP_BUDGET_MS."""
+        import click
+        result = best_of(3)
+        click.echo(report(result))
+        over = result.total_ms > STARTUP_BUDGET_MS
+        click.echo(f"\nbudget {STARTUP_BUDGET_MS:.0f} ms: {'OVER' if over else 'ok'}")
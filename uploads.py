@@ -0,0 +1,305 @@
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import catalog
+from models import db, items, image_uploads
+from outbox import Outbox, DeliveryError, serverless
+
+# Where spooled covers wait for the worker. It must outlive the request and be
+# visible to whoever runs `flask uploads-flush`, so background mode is only the
+# default when it is configured explicitly.
+UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR') or os.path.join(tempfile.gettempdir(), 'papergenius-uploads')
+# 'background': spool the file and upload after the response (needs a long-lived
+# process for the worker thread); 'sync': upload inside the request
+UPLOAD_MODE = os.getenv('UPLOAD_MODE') or ('background' if os.getenv('UPLOAD_SPOOL_DIR') else 'sync')
+if UPLOAD_MODE == 'background' and serverless():
+    # The instance freezes after the response: the worker would never run and
+    # the spool file would be stranded in this instance's /tmp
+    print("WARNING: UPLOAD_MODE=background needs a long-lived worker; using sync uploads on serverless.")
+    UPLOAD_MODE = 'sync'
+# Shown on the item until its upload finishes
+UPLOADING_IMG = "https://placehold.co/400x600?text=Uploading"
+
+# Files at least this big go through Cloudinary's chunked upload_large, in chunks of this size
+LARGE_UPLOAD_BYTES = int(os.getenv('LARGE_UPLOAD_BYTES', str(20 * 1024 * 1024)))
+CLOUDINARY_CHUNK_BYTES = int(os.getenv('CLOUDINARY_CHUNK_BYTES', str(20 * 1024 * 1024)))
+# Browser-side chunking for big scans: files over the threshold are sent in pieces of
+# BROWSER_CHUNK_BYTES, which keeps each request under proxy body limits (e.g. 4.5 MB on Vercel)
+BROWSER_CHUNK_THRESHOLD = int(os.getenv('BROWSER_CHUNK_THRESHOLD', str(4 * 1024 * 1024)))
+BROWSER_CHUNK_BYTES = int(os.getenv('BROWSER_CHUNK_BYTES', str(2 * 1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', str(200 * 1024 * 1024)))
+# Unfinished chunked uploads (.part) and interrupted spool writes (.tmp) older than this are deleted
+UPLOAD_PART_MAX_AGE = int(os.getenv('UPLOAD_PART_MAX_AGE', str(6 * 3600)))
+COPY_BUFFER_BYTES = 1024 * 1024
+
+UPLOAD_MAX_ATTEMPTS = int(os.getenv('UPLOAD_MAX_ATTEMPTS', '3'))
+UPLOAD_BACKOFF_BASE = float(os.getenv('UPLOAD_BACKOFF_BASE', '2.0'))
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '1'))
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.heic', '.tif', '.tiff', '.bmp', '.pdf'}
+UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+_uploader = None
+
+
+class UploadError(Exception):
+    """Raised for rejected spool writes and failed uploads."""
+
+
+class CloudinaryUploader:
+    """Uploads a file path or file object and returns its secure_url."""
+
+    def __init__(self):
+        # Imported on first upload, not at startup: most requests never touch Cloudinary
+        import cloudinary
+        cloudinary.config(secure=True)
+
+    def upload(self, source, size=None):
+        import cloudinary.exceptions
+        import cloudinary.uploader
+        try:
+            if size is not None and size >= LARGE_UPLOAD_BYTES:
+                result = cloudinary.uploader.upload_large(source, chunk_size=CLOUDINARY_CHUNK_BYTES)
+            else:
+                result = cloudinary.uploader.upload(source)
+        except cloudinary.exceptions.Error as e:
+            raise UploadError(str(e))
+        return result['secure_url']
+
+
+class FakeUploader:
+    """Stand-in for Cloudinary in tests and local runs: no network, records each call.
+
+    Waits `delay` seconds per upload and fails the first `fail_times` calls,
+    so slow and flaky uploads can be reproduced. Select it with
+    UPLOADER=fake (FAKE_UPLOAD_DELAY, FAKE_UPLOAD_FAILURES) or set_uploader().
+    """
+
+    def __init__(self, delay=0.0, fail_times=0):
+        self.delay = delay
+        self.fail_times = fail_times
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def upload(self, source, size=None):
+        time.sleep(self.delay)
+        name = os.path.basename(source) if isinstance(source, str) else getattr(source, 'filename', 'stream')
+        large = size is not None and size >= LARGE_UPLOAD_BYTES
+        with self._lock:
+            self.calls.append((name, size, large))
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise UploadError("fake upload failure")
+        return f"https://res.cloudinary.com/fake/image/upload/v{int(time.time())}/{os.path.splitext(name)[0]}.jpg"
+
+
+def get_uploader():
+    global _uploader
+    if _uploader is None:
+        if os.getenv('UPLOADER') == 'fake':
+            _uploader = FakeUploader(float(os.getenv('FAKE_UPLOAD_DELAY', '0')), int(os.getenv('FAKE_UPLOAD_FAILURES', '0')))
+        else:
+            _uploader = CloudinaryUploader()
+    return _uploader
+
+
+def set_uploader(uploader):
+    """Swaps the uploader (tests, benchmarks); returns the previous one."""
+    global _uploader
+    previous, _uploader = _uploader, uploader
+    return previous
+
+
+def _spool_path(name):
+    return os.path.join(UPLOAD_SPOOL_DIR, name)
+
+
+def _extension(filename):
+    extension = os.path.splitext(filename or '')[1].lower()
+    return extension if extension in IMAGE_EXTENSIONS else '.bin'
+
+
+def spool_file(file):
+    """Streams an uploaded FileStorage to the spool; returns (spool_name, size)."""
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    name = uuid.uuid4().hex + _extension(file.filename)
+    partial = _spool_path(name + '.tmp')
+    size = 0
+    with open(partial, 'wb') as out:
+        while True:
+            chunk = file.stream.read(COPY_BUFFER_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                out.close()
+                os.remove(partial)
+                raise UploadError(f"File is larger than {MAX_UPLOAD_BYTES} bytes")
+            out.write(chunk)
+    os.replace(partial, _spool_path(name))
+    return name, size
+
+
+def append_chunk(upload_id, offset, stream):
+    """Appends one browser chunk to a partial spool file; returns (bytes received so far, written).
+
+    A chunk whose offset doesn't match what is on disk is not written (the
+    caller answers 409 with the current size so the browser resumes from there),
+    which makes retried chunks harmless.
+    """
+    if not UPLOAD_ID.match(upload_id or ''):
+        raise UploadError("Invalid upload id")
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    partial = _spool_path(upload_id + '.part')
+    if not os.path.exists(partial):
+        # A new upload starts: clear out the ones abandoned before it
+        sweep_partials()
+    received = os.path.getsize(partial) if os.path.exists(partial) else 0
+    if offset != received:
+        return received, False
+    with open(partial, 'ab') as out:
+        while True:
+            chunk = stream.read(COPY_BUFFER_BYTES)
+            if not chunk:
+                break
+            received += len(chunk)
+            if received > MAX_UPLOAD_BYTES:
+                out.close()
+                os.remove(partial)
+                raise UploadError(f"File is larger than {MAX_UPLOAD_BYTES} bytes")
+            out.write(chunk)
+    return received, True
+
+
+def claim_chunked(upload_id, filename):
+    """Turns a finished chunked upload into a spool file; returns (spool_name, size)."""
+    if not UPLOAD_ID.match(upload_id or ''):
+        raise UploadError("Invalid upload id")
+    partial = _spool_path(upload_id + '.part')
+    if not os.path.exists(partial):
+        raise UploadError("Upload not found")
+    name = upload_id + _extension(filename)
+    os.replace(partial, _spool_path(name))
+    return name, os.path.getsize(_spool_path(name))
+
+
+def sweep_partials(max_age=UPLOAD_PART_MAX_AGE):
+    """Deletes .part/.tmp files nobody has written to for max_age seconds; returns how many."""
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        names = os.listdir(UPLOAD_SPOOL_DIR)
+    except OSError:
+        return 0
+    for name in names:
+        if not name.endswith(('.part', '.tmp')):
+            continue
+        path = _spool_path(name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass  # finished or removed by another worker meanwhile
+    return removed
+
+
+def discard(spool_name):
+    try:
+        os.remove(_spool_path(spool_name))
+    except OSError:
+        pass
+
+
+def queue_upload(item_id, spool_name, size):
+    """
+    Adds an upload job for a spooled file in the current DB session and returns its id.
+
+    Nothing is uploaded until the caller commits and passes the id to dispatch(),
+    so a rolled back item never gets an upload.
+    """
+    job = image_uploads(item_id=item_id, spool_name=spool_name, size=size, status="pending", attempts=0)
+    db.session.add(job)
+    db.session.flush()
+    return job.id
+
+
+def _send(payload):
+    spool_name, size = payload
+    path = _spool_path(spool_name)
+    if not os.path.exists(path):
+        # Not a DeliveryError: retrying can't bring the file back
+        raise UploadError("Spool file is missing")
+    try:
+        return get_uploader().upload(path, size)
+    except (UploadError, OSError) as e:
+        raise DeliveryError(str(e))
+
+
+def _mark_sent(job, url):
+    job.secure_url = url
+    job.finished_at = datetime.utcnow()
+    item = db.session.get(items, job.item_id)
+    # Leave the image alone if an admin changed it while the upload ran
+    if item is not None and item.img == UPLOADING_IMG:
+        item.img = url
+
+
+def _after_commit(payload, sent):
+    if sent:
+        catalog.invalidate()
+        discard(payload[0])
+
+
+outbox = Outbox(
+    "image-upload", image_uploads,
+    load=lambda job: (job.spool_name, job.size),
+    send=_send,
+    claimed_status="uploading",
+    on_sent=_mark_sent,
+    after_commit=_after_commit,
+    mode='thread' if UPLOAD_WORKERS > 0 else 'queue',
+    workers=UPLOAD_WORKERS,
+    max_attempts=UPLOAD_MAX_ATTEMPTS,
+    backoff_base=UPLOAD_BACKOFF_BASE,
+)
+
+
+def dispatch(*job_ids):
+    """Hands committed upload job ids to the background workers."""
+    outbox.dispatch(*job_ids)
+
+
+def deliver(job_id, max_attempts=UPLOAD_MAX_ATTEMPTS, sleep=time.sleep):
+    """Claims and uploads one spooled file, then points its item at the result. Needs an app context."""
+    return outbox.deliver(job_id, max_attempts, sleep)
+
+
+def wait_for_dispatch():
+    """Blocks until every queued upload has been attempted (CLI and test use)."""
+    outbox.wait()
+
+
+def flush_uploads(include_failed=False, limit=100):
+    """Uploads pending (and optionally failed) jobs synchronously. Needs an app context.
+
+    Also deletes chunked uploads the browser never finished (see sweep_partials).
+    """
+    sweep_partials()
+    return outbox.flush(include_failed, limit)
+
+
+def init_app(app):
+    outbox.app = app
+
+    @app.cli.command("uploads-flush")
+    def uploads_flush_command():
+        """Retry cover uploads still waiting in the spool (e.g. after a restart)."""
+        import click
+        sent, total = flush_uploads(include_failed=True)
+        click.echo(f"Uploaded {sent} of {total} spooled cover images.")
@@ -1,16 +1,149 @@
-import requests
 import os
+import threading
+import time
+from datetime import datetime
+
+from models import db, wa_outbox
+from outbox import Outbox, DeliveryError, serverless
 
 ADMIN_WHATSAPP = os.getenv('ADMIN_WHATSAPP', '94766226039')
 WABOT_URL = 'https://app.wabot.my/api/send'
 WABOT_INSTANCE_ID = os.getenv('WABOT_INSTANCE_ID')
 WABOT_ACCESS_TOKEN = os.getenv('WABOT_ACCESS_TOKEN')
 
-def send_admin_order_alert(order_id, customer_name, customer_phone, cart_items, total_price, user_comments):
+# Delivery tuning: (connect, read) timeout, attempts per dispatch and pool size
+WABOT_TIMEOUT = (3.05, 10)
+WABOT_MAX_ATTEMPTS = int(os.getenv('WABOT_MAX_ATTEMPTS', '4'))
+WABOT_BACKOFF_BASE = float(os.getenv('WABOT_BACKOFF_BASE', '1.0'))
+WABOT_WORKERS = int(os.getenv('WABOT_WORKERS', '2'))
+# thread | inline | queue (see outbox.MODES). Serverless instances freeze after the
+# response and checkout must not wait on wabot.my, so there messages stay queued
+# for the /api/cron/outbox flush; WABOT_WORKERS=0 does the same (tests, load tests)
+WABOT_DELIVERY = os.getenv('WABOT_DELIVERY') or (
+    'queue' if serverless() or WABOT_WORKERS <= 0 else 'thread')
+
+_http = None
+_http_lock = threading.Lock()
+
+
+def _build_session():
+    # requests is imported on the first send rather than at startup
+    import requests
+    from requests.adapters import HTTPAdapter
+    http = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(WABOT_WORKERS, 1))
+    http.mount('https://', adapter)
+    http.mount('http://', adapter)
+    return http
+
+
+def get_http_session():
+    """Shared keep-alive session, so repeated sends reuse the TLS connection."""
+    global _http
+    if _http is None:
+        with _http_lock:
+            if _http is None:
+                _http = _build_session()
+    return _http
+
+
+def post_message(number, message_body):
+    """Sends one WhatsApp text synchronously. Raises requests.RequestException on failure."""
+    payload = {
+        "number": number,
+        "type": "text",
+        "message": message_body,
+        "instance_id": WABOT_INSTANCE_ID,
+        "access_token": WABOT_ACCESS_TOKEN
+    }
+    response = get_http_session().post(WABOT_URL, json=payload, timeout=WABOT_TIMEOUT)
+    response.raise_for_status()
+    return response
+
+
+def _send(payload):
+    import requests
+    try:
+        post_message(*payload)
+    except requests.exceptions.RequestException as e:
+        raise DeliveryError(str(e))
+
+
+def _mark_sent(row, _response):
+    row.sent_at = datetime.utcnow()
+
+
+outbox = Outbox(
+    "wa-outbox", wa_outbox,
+    load=lambda row: (row.number, row.message),
+    send=_send,
+    on_sent=_mark_sent,
+    mode=WABOT_DELIVERY,
+    workers=WABOT_WORKERS,
+    max_attempts=WABOT_MAX_ATTEMPTS,
+    backoff_base=WABOT_BACKOFF_BASE,
+)
+
+
+def queue_message(number, message_body):
+    """
+    Adds a message to the wa_outbox in the current DB session and returns its id.
+
+    Nothing is sent until the caller commits and passes the id to dispatch(),
+    so a rolled back order never produces a notification.
+    """
+    row = wa_outbox(number=number, message=message_body, status="pending", attempts=0)
+    db.session.add(row)
+    db.session.flush()
+    return row.id
+
+
+def dispatch(*outbox_ids):
+    """Delivers committed outbox ids (worker threads, inline or left for the flush; see WABOT_DELIVERY)."""
+    outbox.dispatch(*outbox_ids)
+
+
+def deliver(outbox_id, max_attempts=WABOT_MAX_ATTEMPTS, sleep=time.sleep):
+    """Claims and delivers one outbox row with exponential backoff. Needs an app context."""
+    return outbox.deliver(outbox_id, max_attempts, sleep)
+
+
+def wait_for_dispatch():
+    """Blocks until every queued message has been attempted (CLI and shutdown use)."""
+    outbox.wait()
+
+
+def waiting_query(status, limit):
+    """Oldest outbox ids in one status; one status per query so it stays an index search."""
+    return outbox.waiting_query(status, limit)
+
+
+def flush_outbox(include_failed=False, limit=500):
+    """Sends pending (and optionally failed) outbox rows synchronously. Needs an app context."""
+    return outbox.flush(include_failed, limit)
+
+
+def init_app(app):
+    outbox.app = app
+
+    @app.cli.command("wa-flush")
+    def wa_flush_command():
+        """Retry WhatsApp messages still waiting in the outbox (e.g. after a restart)."""
+        import click
+        sent, total = flush_outbox(include_failed=True)
+        click.echo(f"Sent {sent} of {total} queued WhatsApp messages.")
+
+
+def _cart_items_text(cart_items):
     items_str = ""
     for item in cart_items:
         years = f"{item.selected_years[0]}-{item.selected_years[-1]}" if hasattr(item, 'selected_years') and item.selected_years else "N/A"
         items_str += f"- {item.name} ({years}) [{item.design_type}]\n"
+    return items_str
+
+
+def queue_admin_order_alert(order_id, customer_name, customer_phone, cart_items, total_price, user_comments):
+    items_str = _cart_items_text(cart_items)
 
     if not user_comments:
         user_comments = "None"
@@ -27,26 +160,11 @@ def send_admin_order_alert(order_id, customer_name, customer_phone, cart_items,
         f"💰 *Total:* LKR {total_price:.2f}\n"
         f"-----------------------------"
     )
-    
-    payload = {
-        "number": ADMIN_WHATSAPP,
-        "type": "text",
-        "message": message_body,
-        "instance_id": WABOT_INSTANCE_ID,
-        "access_token": WABOT_ACCESS_TOKEN
-    }
 
-    try:
-        requests.post(WABOT_URL, json=payload)
-        return True
-    except requests.exceptions.RequestException:
-        return False
+    return queue_message(ADMIN_WHATSAPP, message_body)
 
-def send_customer_order_confirmation(customer_phone, cart_items, total_price):
-    items_str = ""
-    for item in cart_items:
-        years = f"{item.selected_years[0]}-{item.selected_years[-1]}" if hasattr(item, 'selected_years') and item.selected_years else "N/A"
-        items_str += f"- {item.name} ({years}) [{item.design_type}]\n"
+def queue_customer_order_confirmation(customer_phone, cart_items, total_price):
+    items_str = _cart_items_text(cart_items)
 
     message_body = (
         f"🎉 *Order Confirmation - Thank You!* 🎉\n\n"
@@ -64,22 +182,10 @@ def send_customer_order_confirmation(customer_phone, cart_items, total_price):
         f"We will begin processing your order once payment is confirmed.\n"
         f"Thank you for choosing us!"
     )
-    
-    payload = {
-        "number": customer_phone,
-        "type": "text",
-        "message": message_body,
-        "instance_id": WABOT_INSTANCE_ID,
-        "access_token": WABOT_ACCESS_TOKEN
-    }
 
-    try:
-        requests.post(WABOT_URL, json=payload)
-        return True
-    except requests.exceptions.RequestException:
-        return False
+    return queue_message(customer_phone, message_body)
 
-def send_contact_message(name, email, subject, user_message):
+def queue_contact_message(name, email, subject, user_message):
     message_body = (
         f"📨 *NEW CONTACT INQUIRY* 📨\n"
         f"👤 *Name:* {name}\n"
@@ -87,17 +193,5 @@ def send_contact_message(name, email, subject, user_message):
         f"📌 *Subject:* {subject}\n"
         f"📝 *Message:* {user_message}\n"
     )
-    
-    payload = {
-        "number": ADMIN_WHATSAPP,
-        "type": "text",
-        "message": message_body,
-        "instance_id": WABOT_INSTANCE_ID,
-        "access_token": WABOT_ACCESS_TOKEN
-    }
 
-    try:
-        requests.post(WABOT_URL, json=payload)
-        return True
-    except Exception:
-        return False
\ No newline at end of file
+    return queue_message(ADMIN_WHATSAPP, message_body)
@@ -0,0 +1,104 @@
+import re
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+FULL_MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+               "august", "september", "october", "november", "december"]
+
+# Every accepted month spelling -> month number
+MONTH_NUMBERS = {}
+for _number, (_short, _full) in enumerate(zip(MONTHS, FULL_MONTHS), start=1):
+    MONTH_NUMBERS[_short] = _number
+    MONTH_NUMBERS[_full] = _number
+    MONTH_NUMBERS[str(_number)] = _number
+    MONTH_NUMBERS[f"{_number:02d}"] = _number
+MONTH_NUMBERS["sept"] = 9
+
+_separators = re.compile(r"[\s\-/,.:_]+")
+_year = re.compile(r"^(19|20)\d\d$")
+
+
+def normalize(value):
+    """'January, 2019' -> 'january 2019'"""
+    return _separators.sub(" ", (value or "").strip().lower()).strip()
+
+
+def parse_year_month(value):
+    """Returns (year, month) from any accepted spelling, (year, None) for a bare year, or None."""
+    tokens = normalize(value).split()
+    years = [t for t in tokens if _year.match(t)]
+    if len(years) != 1:
+        return None
+    others = [t for t in tokens if t != years[0]]
+    if not others:
+        return int(years[0]), None
+    if len(others) != 1:
+        return None
+    month = MONTH_NUMBERS.get(others[0])
+    if month is None:
+        return None
+    return int(years[0]), month
+
+
+class YearKeyResolver:
+    """Maps user/AI spellings of a session ("Jan 2019", "2019-01", "2019 january") to an item's canonical year key."""
+
+    def __init__(self, years):
+        self.years = tuple(years)
+        self.position = {}
+        self.exact = {}
+        self.by_year_month = {}
+        self.by_year = {}
+        sessions = {}
+        for pos, key in enumerate(self.years):
+            self.position[key] = pos
+            self.exact.setdefault(normalize(key), key)
+            parsed = parse_year_month(key)
+            if parsed is None:
+                continue
+            year, month = parsed
+            if month is not None:
+                self.by_year_month.setdefault((year, month), key)
+            sessions.setdefault(year, []).append((month or 0, pos, key))
+        # First and last session of each year by calendar month, not by key order
+        for year, entries in sessions.items():
+            entries.sort()
+            self.by_year[year] = (entries[0][2], entries[-1][2])
+
+    def resolve(self, value, prefer="start"):
+        """
+        Returns the canonical key for `value`, or None if it can't be matched.
+
+        A bare year ("2019") resolves to that year's first session when
+        prefer="start" and to its last session when prefer="end".
+        """
+        if not value:
+            return None
+        key = self.exact.get(normalize(value))
+        if key is not None:
+            return key
+        parsed = parse_year_month(value)
+        if parsed is None:
+            return None
+        year, month = parsed
+        if month is not None:
+            return self.by_year_month.get((year, month))
+        span = self.by_year.get(year)
+        if span is None:
+            return None
+        return span[0] if prefer == "start" else span[1]
+
+    def resolve_position(self, value, prefer="start"):
+        """Index of the resolved key in sorted order, for range slicing."""
+        key = self.resolve(value, prefer)
+        return None if key is None else self.position[key]
+
+    def resolve_range(self, start_value, end_value):
+        """Returns (start_key, end_key, s_idx, e_idx) in sorted order, or None."""
+        start_key = self.resolve(start_value, "start")
+        end_key = self.resolve(end_value, "end")
+        if start_key is None or end_key is None:
+            return None
+        s_idx, e_idx = self.position[start_key], self.position[end_key]
+        if s_idx > e_idx:
+            start_key, end_key, s_idx, e_idx = end_key, start_key, e_idx, s_idx
+        return start_key, end_key, s_idx, e_idx